@@ -33,6 +33,8 @@ export function TradingChatbot({ className }: TradingChatbotProps) {
   const [traderId, setTraderId] = useState("");
   const [isLoading, setIsLoading] = useState(false);
   const [hasSetTraderId, setHasSetTraderId] = useState(false);
+  // One id per chat session and trader; the backend keeps a rolling summary of it
+  const [conversationId, setConversationId] = useState(() => crypto.randomUUID());
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   const scrollToBottom = () => {
@@ -86,6 +88,7 @@ export function TradingChatbot({ className }: TradingChatbotProps) {
               query,
               symbols: ["AAPL", "GOOGL", "MSFT", "TSLA", "NVDA"],
               include_stock_recommendations: true,
+              conversation_id: conversationId,
             }),
           }
         );
@@ -182,6 +185,7 @@ export function TradingChatbot({ className }: TradingChatbotProps) {
 
         if (isValid) {
           setTraderId(traderId);
+          setConversationId(crypto.randomUUID());
           setHasSetTraderId(true);
           updateMessage(
             loadingMessageId,
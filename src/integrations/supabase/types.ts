@@ -58,6 +58,39 @@ export type Database = {
           },
         ]
       }
+      chat_conversations: {
+        Row: {
+          created_at: string
+          id: string
+          recent_turns: Json
+          summarized_turns: number
+          summary: string
+          trader_id: string | null
+          turn_count: number
+          updated_at: string
+        }
+        Insert: {
+          created_at?: string
+          id: string
+          recent_turns?: Json
+          summarized_turns?: number
+          summary?: string
+          trader_id?: string | null
+          turn_count?: number
+          updated_at?: string
+        }
+        Update: {
+          created_at?: string
+          id?: string
+          recent_turns?: Json
+          summarized_turns?: number
+          summary?: string
+          trader_id?: string | null
+          turn_count?: number
+          updated_at?: string
+        }
+        Relationships: []
+      }
       comments: {
         Row: {
           content: string
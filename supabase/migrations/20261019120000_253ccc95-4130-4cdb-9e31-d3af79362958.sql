@@ -0,0 +1,25 @@
+-- Create table for trading chatbot memory: a rolling summary plus the unsummarized recent turns
+CREATE TABLE public.chat_conversations (
+  id UUID NOT NULL PRIMARY KEY,
+  trader_id TEXT,
+  summary TEXT NOT NULL DEFAULT '',
+  recent_turns JSONB NOT NULL DEFAULT '[]'::jsonb,
+  summarized_turns INTEGER NOT NULL DEFAULT 0,
+  turn_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_chat_conversations_trader_id ON public.chat_conversations(trader_id);
+
+-- Enable Row Level Security with no policies: summaries and turns hold holdings, risk
+-- preferences and advice, so only the trading backends (service role, which bypasses RLS)
+-- may read or write them; the public anon key gets nothing
+ALTER TABLE public.chat_conversations ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON public.chat_conversations FROM anon, authenticated;
+
+-- Create trigger for automatic timestamp updates
+CREATE TRIGGER update_chat_conversations_updated_at
+BEFORE UPDATE ON public.chat_conversations
+FOR EACH ROW
+EXECUTE FUNCTION public.update_updated_at_column();
@@ -11,14 +11,33 @@ from datetime import datetime, timedelta
 import json
 from functools import wraps
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed, wait
 from typing import Dict, List, Optional
 import requests
+from utils.indicators import compute_indicators
+from utils.streaming_indicators import IndicatorState
+from services.llm_cache import generate_cached
+from services.market_briefs import REFRESH_TOKEN_HEADER, get_brief_scheduler
+from utils.prompt_builder import PromptBuilder, compact_json
 
 # Enhanced TradingAssistant class with more features
 class AdvancedTradingAssistant:
     def __init__(self):
         self.supabase = supabase
         self.model = model
+        # Per-symbol incremental indicator state for signal evaluation
+        self.indicator_states: Dict[str, IndicatorState] = {}
+        self._state_locks: Dict[str, threading.Lock] = {}
+        self._state_locks_guard = threading.Lock()
+        # Signal generation fans out per symbol: downloads and indicator math on
+        # one pool, Gemini commentary on a smaller one
+        self.data_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SIGNAL_DATA_CONCURRENCY', '8')),
+                                                thread_name_prefix='signal-data')
+        self.llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SIGNAL_LLM_CONCURRENCY', '4')),
+                                               thread_name_prefix='signal-llm')
+        self.signal_deadline = float(os.getenv('SIGNAL_REQUEST_DEADLINE', '10'))
         
     def get_technical_indicators(self, symbol: str, period: str = "3mo") -> Dict:
         """Calculate comprehensive technical indicators"""
@@ -35,35 +54,19 @@ class AdvancedTradingAssistant:
             low = data['Low']
             volume = data['Volume']
             
-            # Moving Averages
-            ma_20 = close.rolling(window=20).mean().iloc[-1]
-            ma_50 = close.rolling(window=50).mean().iloc[-1]
-            ma_200 = close.rolling(window=200).mean().iloc[-1]
-            
-            # RSI
-            delta = close.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs)).iloc[-1]
-            
-            # MACD
-            ema_12 = close.ewm(span=12).mean()
-            ema_26 = close.ewm(span=26).mean()
-            macd = (ema_12 - ema_26).iloc[-1]
-            macd_signal = (ema_12 - ema_26).ewm(span=9).mean().iloc[-1]
-            macd_histogram = macd - macd_signal
-            
-            # Bollinger Bands
-            bb_period = 20
-            bb_std = close.rolling(window=bb_period).std()
-            bb_middle = close.rolling(window=bb_period).mean()
-            bb_upper = (bb_middle + (bb_std * 2)).iloc[-1]
-            bb_lower = (bb_middle - (bb_std * 2)).iloc[-1]
-            bb_middle = bb_middle.iloc[-1]
+            # Moving averages, RSI, MACD, Bollinger Bands and volume in one pass
+            # (NaN while an indicator is still warming up)
+            series = compute_indicators(close.to_numpy(), volume.to_numpy())
+            latest = {name: float(values[-1, 0]) for name, values in series.items()}
+            ma_20, ma_50, ma_200 = latest['ma_20'], latest['ma_50'], latest['ma_200']
+            rsi = latest['rsi']
+            macd = latest['macd']
+            macd_signal = latest['macd_signal']
+            macd_histogram = latest['macd_histogram']
+            bb_upper, bb_middle, bb_lower = latest['bb_upper'], latest['bb_middle'], latest['bb_lower']
             
             # Volume indicators
-            avg_volume = volume.rolling(window=20).mean().iloc[-1]
+            avg_volume = latest['avg_volume']
             current_volume = volume.iloc[-1]
             volume_ratio = current_volume / avg_volume if avg_volume > 0 else 0
             
@@ -110,6 +113,81 @@ class AdvancedTradingAssistant:
             print(f"Error calculating technical indicators for {symbol}: {e}")
             return {}
     
+    def get_signal_technicals(self, symbol: str) -> Dict:
+        """Technical data for signal evaluation from incremental indicator state.
+
+        The first call seeds the state from 3 months of daily bars; later calls
+        download enough days to cover the gap since the last committed bar and
+        apply only the bars closed since then. Today's bar is still forming, so
+        it is previewed rather than committed.
+        """
+        try:
+            # Concurrent requests for the same symbol must not apply its bars twice
+            with self._state_lock(symbol):
+                state = self.indicator_states.get(symbol)
+                period = self._update_period(state)
+                if period == "3mo":
+                    # Too long unrequested to bridge: rebuild from scratch
+                    state = None
+                data = yf.Ticker(symbol).history(period=period)
+                if data.empty:
+                    return {}
+
+                close = data['Close']
+                volume = data['Volume']
+                bar_times = data.index.asi8 / 1e9
+                if state is None:
+                    state = IndicatorState()
+                    state.seed(close.iloc[:-1], volume.iloc[:-1], bar_times[:-1])
+                    self.indicator_states[symbol] = state
+                else:
+                    for price, vol, bar_time in zip(close.iloc[:-1], volume.iloc[:-1], bar_times[:-1]):
+                        if state.last_bar_time is None or bar_time > state.last_bar_time:
+                            state.update(price, vol, bar_time)
+
+                current_price = float(close.iloc[-1])
+                latest = state.snapshot(current_price)
+            nan = float('nan')
+            value = lambda name: latest[name] if latest[name] is not None else nan
+            avg_volume = value('avg_volume')
+            current_volume = float(volume.iloc[-1])
+            return {
+                'symbol': symbol,
+                'current_price': current_price,
+                'moving_averages': {'ma_20': value('ma_20'), 'ma_50': value('ma_50'), 'ma_200': value('ma_200')},
+                'rsi': value('rsi'),
+                'macd': {'macd': value('macd'), 'signal': value('macd_signal'), 'histogram': value('macd_histogram')},
+                'bollinger_bands': {'upper': value('bb_upper'), 'middle': value('bb_middle'), 'lower': value('bb_lower')},
+                'volume': {
+                    'current': current_volume,
+                    'average': avg_volume,
+                    'ratio': current_volume / avg_volume if avg_volume > 0 else 0
+                },
+                'trend_analysis': {
+                    'trend': self._determine_trend(value('ma_20'), value('ma_50'), value('ma_200')),
+                    'strength': self._calculate_trend_strength(pd.Series(state.recent_closes(current_price)))
+                }
+            }
+        except Exception as e:
+            print(f"Error updating signal indicators for {symbol}: {e}")
+            return {}
+
+    def _update_period(self, state: Optional[IndicatorState]) -> str:
+        """yfinance period that reaches back past ``state``'s last committed bar"""
+        if state is None or state.last_bar_time is None:
+            return "3mo"
+        days_behind = (time.time() - state.last_bar_time) / 86400
+        # "5d" is today plus the 4 sessions before it: enough for any gap under 6 calendar days
+        if days_behind < 6:
+            return "5d"
+        if days_behind < 25:
+            return "1mo"
+        return "3mo"
+
+    def _state_lock(self, symbol: str) -> threading.Lock:
+        with self._state_locks_guard:
+            return self._state_locks.setdefault(symbol, threading.Lock())
+
     def _determine_trend(self, ma_20: float, ma_50: float, ma_200: float) -> str:
         """Determine overall trend based on moving averages"""
         if ma_20 > ma_50 > ma_200:
@@ -230,36 +308,70 @@ class AdvancedTradingAssistant:
         
         return recommendations
     
-    def generate_trading_signals(self, symbols: List[str]) -> Dict:
-        """Generate AI-powered trading signals for given symbols"""
+    def generate_trading_signals(self, symbols: List[str], deadline: float = None) -> Dict:
+        """Generate AI-powered trading signals for given symbols.
+
+        Symbols run concurrently: data and indicators on the data pool, then
+        the Gemini commentary on the LLM pool as soon as each symbol's signal
+        is ready. At the deadline the technical signals are returned; symbols
+        whose commentary has not arrived get ``ai_analysis`` None and
+        ``ai_status`` 'timeout' (generations already running still finish
+        into the LLM cache, queued ones are cancelled).
+        """
+        deadline_at = time.monotonic() + (deadline or self.signal_deadline)
+        remaining = lambda: max(0.0, deadline_at - time.monotonic())
+        symbols = list(dict.fromkeys(symbols))
+
+        data_futures = {self.data_executor.submit(self._technical_signal, symbol): symbol for symbol in symbols}
+        technicals = {}
+        llm_futures = {}
+        try:
+            for future in as_completed(data_futures, timeout=remaining()):
+                symbol = data_futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error generating signal for {symbol}: {e}")
+                    continue
+                if not result:
+                    continue
+                tech_data, signal = result
+                technicals[symbol] = result
+                llm_futures[symbol] = self.llm_executor.submit(self._get_ai_signal_analysis, symbol, tech_data, signal,
+                                                               remaining())
+        except FuturesTimeout:
+            late = [symbol for future, symbol in data_futures.items() if not future.done()]
+            print(f"Market data for {late} missed the signal deadline")
+
+        wait(list(llm_futures.values()), timeout=remaining())
+
         signals = {}
-        
         for symbol in symbols:
-            try:
-                # Get technical indicators
-                tech_data = self.get_technical_indicators(symbol)
-                if not tech_data:
-                    continue
-                
-                # Generate signal based on technical analysis
-                signal = self._calculate_trading_signal(tech_data)
-                
-                # Get AI analysis for the signal
-                ai_analysis = self._get_ai_signal_analysis(symbol, tech_data, signal)
-                
-                signals[symbol] = {
-                    'signal': signal['action'],
-                    'strength': signal['strength'],
-                    'confidence': signal['confidence'],
-                    'technical_data': tech_data,
-                    'ai_analysis': ai_analysis,
-                    'timestamp': datetime.now().isoformat()
-                }
-            except Exception as e:
-                print(f"Error generating signal for {symbol}: {e}")
+            if symbol not in technicals:
                 continue
-        
+            tech_data, signal = technicals[symbol]
+            future = llm_futures[symbol]
+            if not future.done():
+                # Queued calls are dropped; one already running still fills the cache
+                future.cancel()
+            done = future.done() and not future.cancelled()
+            signals[symbol] = {
+                'signal': signal['action'],
+                'strength': signal['strength'],
+                'confidence': signal['confidence'],
+                'technical_data': tech_data,
+                'ai_analysis': future.result() if done else None,
+                'ai_status': 'ok' if done else 'timeout',
+                'timestamp': datetime.now().isoformat()
+            }
         return signals
+
+    def _technical_signal(self, symbol: str):
+        """(technical data, signal) for one symbol, or None without data"""
+        tech_data = self.get_signal_technicals(symbol)
+        if not tech_data:
+            return None
+        return tech_data, self._calculate_trading_signal(tech_data)
     
     def _calculate_trading_signal(self, tech_data: Dict) -> Dict:
         """Calculate trading signal based on technical indicators"""
@@ -331,7 +443,7 @@ class AdvancedTradingAssistant:
             'factors': factors
         }
     
-    def _get_ai_signal_analysis(self, symbol: str, tech_data: Dict, signal: Dict) -> str:
+    def _get_ai_signal_analysis(self, symbol: str, tech_data: Dict, signal: Dict, deadline: float = None) -> str:
         """Get AI analysis for the trading signal"""
         prompt = f"""
         As a professional trading analyst, provide a brief analysis of the trading signal for {symbol}:
@@ -351,9 +463,16 @@ class AdvancedTradingAssistant:
         Provide a 2-3 sentence analysis explaining the reasoning behind this signal and any important considerations.
         """
         
+        inputs = {
+            'symbol': symbol,
+            'current_price': tech_data.get('current_price', 0),
+            'rsi': tech_data.get('rsi', 0),
+            'macd': tech_data.get('macd', {}).get('macd', 0),
+            'trend': tech_data.get('trend_analysis', {}).get('trend', 'unknown'),
+            'signal': signal,
+        }
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return generate_cached(self.model, 'signal_analysis', inputs, prompt, deadline=deadline)
         except Exception as e:
             return f"Analysis unavailable: {str(e)}"
 
@@ -391,7 +510,8 @@ def trading_signals():
         if not symbols:
             return jsonify({'success': False, 'error': 'No symbols provided'}), 400
         
-        signals = enhanced_assistant.generate_trading_signals(symbols)
+        deadline = data.get('deadline')
+        signals = enhanced_assistant.generate_trading_signals(symbols, float(deadline) if deadline else None)
         
         return jsonify({
             'success': True,
@@ -445,14 +565,14 @@ def portfolio_optimization(trader_id):
         - Risk Level: {risk_analysis.get('risk_level', 'Unknown')}
         
         Current Sector Allocation:
-        {json.dumps(risk_analysis.get('sector_allocation', {}), indent=2)}
+        {compact_json(risk_analysis.get('sector_allocation', {}))}
         
         Risk Factors:
-        {json.dumps(risk_analysis.get('risk_factors', {}), indent=2)}
+        {compact_json(risk_analysis.get('risk_factors', {}))}
         
         Trader Profile:
         - Risk Tolerance: {risk_tolerance}
-        - Target Allocation: {json.dumps(target_allocation, indent=2)}
+        - Target Allocation: {compact_json(target_allocation)}
         
         Provide specific recommendations for:
         1. Position sizing adjustments
@@ -464,59 +584,160 @@ def portfolio_optimization(trader_id):
         Be specific with percentages and reasoning.
         """
         
-        response = model.generate_content(optimization_prompt)
+        optimization_inputs = {
+            'trader_id': trader_id,
+            'positions': portfolio_data['positions'],
+            'risk_analysis': risk_analysis,
+            'risk_tolerance': risk_tolerance,
+            'target_allocation': target_allocation,
+        }
+        optimization_text = generate_cached(model, 'portfolio_optimization', optimization_inputs, optimization_prompt)
         
         return jsonify({
             'success': True,
             'trader_id': trader_id,
             'current_risk_analysis': risk_analysis,
-            'optimization_recommendations': response.text,
+            'optimization_recommendations': optimization_text,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def index_sentiment_brief():
+    """Overall market sentiment from the major indices (a shared market brief)"""
+    # Get data for major market indicators
+    major_symbols = ['SPY', 'QQQ', 'IWM', 'VIX', '^GSPC', '^IXIC', '^RUT']
+    market_data = assistant.get_market_data(major_symbols)
+    
+    # Get additional market indicators
+    sentiment_data = {
+        'market_indices': market_data,
+        'fear_greed_index': 'VIX' in market_data and market_data['VIX']['current_price'] or 'N/A',
+        'analysis_timestamp': datetime.now().isoformat()
+    }
+    
+    builder = PromptBuilder('index_sentiment').add_quotes('market_data', market_data, min_items=1)
+    sentiment_prompt = builder.build(lambda sections: f"""
+    As a market analyst, provide a comprehensive market sentiment analysis based on current data:
+    
+    Market Data (one row per symbol):
+    {sections['market_data']}
+    
+    Please analyze:
+    1. Overall market sentiment (Bullish/Bearish/Neutral)
+    2. Key market drivers and concerns
+    3. Sector rotation trends
+    4. Volatility assessment
+    5. Short-term and medium-term outlook
+    6. Key levels to watch
+    7. Risk factors for traders
+    
+    Provide actionable insights for different trading styles (day trading, swing trading, long-term investing).
+    """)
+    
+    sentiment_text = generate_cached(model, 'index_sentiment', market_data, sentiment_prompt)
+    
+    return {'market_sentiment': sentiment_text, 'market_data': sentiment_data}
+
+def earnings_brief(symbols):
+    """Upcoming earnings for ``symbols`` and their potential impact (a shared market brief)"""
+    # This would typically integrate with financial data APIs
+    # For demo purposes, we'll use a simple implementation
+    earnings_info = {}
+    for symbol in symbols:
+        try:
+            ticker = yf.Ticker(symbol)
+            calendar = ticker.calendar
+            if calendar is not None and not calendar.empty:
+                earnings_info[symbol] = {
+                    'next_earnings_date': calendar.index[0].strftime('%Y-%m-%d') if len(calendar.index) > 0 else 'N/A',
+                    'earnings_estimate': 'Available in calendar data'
+                }
+            else:
+                earnings_info[symbol] = {
+                    'next_earnings_date': 'N/A',
+                    'earnings_estimate': 'N/A'
+                }
+        except:
+            earnings_info[symbol] = {
+                'next_earnings_date': 'N/A',
+                'earnings_estimate': 'N/A'
+            }
+    
+    # Generate AI analysis of earnings impact
+    earnings_prompt = f"""
+    As an earnings analyst, provide insights on upcoming earnings for these stocks:
+    
+    {compact_json(earnings_info)}
+    
+    Analyze:
+    1. Which earnings are most likely to move markets
+    2. Sector implications of these earnings
+    3. Trading strategies around earnings dates
+    4. Risk management for earnings plays
+    5. Historical earnings patterns for these stocks
+    
+    Provide actionable advice for traders holding or considering these positions.
+    """
+    
+    # Earnings dates move slowly; an hour-long cache is plenty
+    earnings_text = generate_cached(model, 'earnings_calendar', earnings_info, earnings_prompt, ttl=3600)
+    
+    return {'earnings_calendar': earnings_info, 'ai_analysis': earnings_text}
+
+def news_sentiment_brief(symbol):
+    """News sentiment analysis for ``symbol`` (a shared market brief)"""
+    # This would integrate with news APIs in production
+    # For demo, we'll provide a framework
+    
+    news_prompt = f"""
+    Analyze the current news sentiment for {symbol.upper()}. Based on recent market conditions and typical news patterns for this stock, provide:
+    
+    1. Overall news sentiment (Positive/Negative/Neutral)
+    2. Key themes in recent news
+    3. Potential catalysts or concerns
+    4. Impact on stock price direction
+    5. Recommendations for traders
+    
+    Consider factors like:
+    - Earnings reports and guidance
+    - Product launches or updates  
+    - Regulatory changes
+    - Market sector trends
+    - Analyst upgrades/downgrades
+    
+    Provide a balanced analysis with specific trading implications.
+    """
+    
+    news_text = generate_cached(model, 'news_sentiment', {'symbol': symbol.upper()}, news_prompt)
+    
+    return {'symbol': symbol.upper(), 'news_sentiment_analysis': news_text}
+
+# Market-wide briefs are regenerated on a schedule and served to every user from the stored copy
+DEFAULT_EARNINGS_SYMBOLS = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA']
+brief_scheduler = get_brief_scheduler()
+brief_scheduler.register('index_sentiment', index_sentiment_brief, defaults=[{}])
+brief_scheduler.register('earnings_calendar', earnings_brief, defaults=[{'symbols': DEFAULT_EARNINGS_SYMBOLS}])
+brief_scheduler.register('news_sentiment', news_sentiment_brief)
+
+def serve_brief(name, **params):
+    """Stored market brief; ?refresh=true regenerates it for callers sending the refresh token"""
+    refresh = request.args.get('refresh', 'false').lower() == 'true'
+    brief = brief_scheduler.serve(name, refresh=refresh, token=request.headers.get(REFRESH_TOKEN_HEADER), **params)
+    return jsonify({
+        'success': True,
+        **brief['data'],
+        'brief': {key: value for key, value in brief.items() if key != 'data'},
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/api/market-sentiment', methods=['GET'])
 def market_sentiment():
     """Get AI-powered overall market sentiment analysis"""
     try:
-        # Get data for major market indicators
-        major_symbols = ['SPY', 'QQQ', 'IWM', 'VIX', '^GSPC', '^IXIC', '^RUT']
-        market_data = assistant.get_market_data(major_symbols)
-        
-        # Get additional market indicators
-        sentiment_data = {
-            'market_indices': market_data,
-            'fear_greed_index': 'VIX' in market_data and market_data['VIX']['current_price'] or 'N/A',
-            'analysis_timestamp': datetime.now().isoformat()
-        }
-        
-        sentiment_prompt = f"""
-        As a market analyst, provide a comprehensive market sentiment analysis based on current data:
-        
-        Market Data:
-        {json.dumps(market_data, indent=2, default=str)}
-        
-        Please analyze:
-        1. Overall market sentiment (Bullish/Bearish/Neutral)
-        2. Key market drivers and concerns
-        3. Sector rotation trends
-        4. Volatility assessment
-        5. Short-term and medium-term outlook
-        6. Key levels to watch
-        7. Risk factors for traders
-        
-        Provide actionable insights for different trading styles (day trading, swing trading, long-term investing).
-        """
-        
-        response = model.generate_content(sentiment_prompt)
-        
-        return jsonify({
-            'success': True,
-            'market_sentiment': response.text,
-            'market_data': sentiment_data,
-            'timestamp': datetime.now().isoformat()
-        })
+        return serve_brief('index_sentiment')
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -524,55 +745,10 @@ def market_sentiment():
 def earnings_calendar():
     """Get upcoming earnings and their potential impact"""
     try:
-        # This would typically integrate with financial data APIs
-        # For demo purposes, we'll use a simple implementation
-        symbols = request.args.get('symbols', 'AAPL,GOOGL,MSFT,AMZN,TSLA').split(',')
-        
-        earnings_info = {}
-        for symbol in symbols:
-            try:
-                ticker = yf.Ticker(symbol)
-                calendar = ticker.calendar
-                if calendar is not None and not calendar.empty:
-                    earnings_info[symbol] = {
-                        'next_earnings_date': calendar.index[0].strftime('%Y-%m-%d') if len(calendar.index) > 0 else 'N/A',
-                        'earnings_estimate': 'Available in calendar data'
-                    }
-                else:
-                    earnings_info[symbol] = {
-                        'next_earnings_date': 'N/A',
-                        'earnings_estimate': 'N/A'
-                    }
-            except:
-                earnings_info[symbol] = {
-                    'next_earnings_date': 'N/A',
-                    'earnings_estimate': 'N/A'
-                }
-        
-        # Generate AI analysis of earnings impact
-        earnings_prompt = f"""
-        As an earnings analyst, provide insights on upcoming earnings for these stocks:
-        
-        {json.dumps(earnings_info, indent=2)}
-        
-        Analyze:
-        1. Which earnings are most likely to move markets
-        2. Sector implications of these earnings
-        3. Trading strategies around earnings dates
-        4. Risk management for earnings plays
-        5. Historical earnings patterns for these stocks
-        
-        Provide actionable advice for traders holding or considering these positions.
-        """
-        
-        response = model.generate_content(earnings_prompt)
-        
-        return jsonify({
-            'success': True,
-            'earnings_calendar': earnings_info,
-            'ai_analysis': response.text,
-            'timestamp': datetime.now().isoformat()
-        })
+        symbols = request.args.get('symbols', ','.join(DEFAULT_EARNINGS_SYMBOLS)).split(',')
+        return serve_brief('earnings_calendar', symbols=[s.strip().upper() for s in symbols if s.strip()])
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -580,36 +756,9 @@ def earnings_calendar():
 def news_sentiment(symbol):
     """Get news sentiment analysis for a specific symbol"""
     try:
-        # This would integrate with news APIs in production
-        # For demo, we'll provide a framework
-        
-        news_prompt = f"""
-        Analyze the current news sentiment for {symbol.upper()}. Based on recent market conditions and typical news patterns for this stock, provide:
-        
-        1. Overall news sentiment (Positive/Negative/Neutral)
-        2. Key themes in recent news
-        3. Potential catalysts or concerns
-        4. Impact on stock price direction
-        5. Recommendations for traders
-        
-        Consider factors like:
-        - Earnings reports and guidance
-        - Product launches or updates  
-        - Regulatory changes
-        - Market sector trends
-        - Analyst upgrades/downgrades
-        
-        Provide a balanced analysis with specific trading implications.
-        """
-        
-        response = model.generate_content(news_prompt)
-        
-        return jsonify({
-            'success': True,
-            'symbol': symbol.upper(),
-            'news_sentiment_analysis': response.text,
-            'timestamp': datetime.now().isoformat()
-        })
+        return serve_brief('news_sentiment', symbol=symbol.upper())
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -668,11 +817,11 @@ def backtesting(trader_id):
         backtest_prompt = f"""
         Analyze these backtesting results for trader {trader_id}:
         
-        Strategy Parameters: {json.dumps(strategy_params, indent=2)}
+        Strategy Parameters: {compact_json(strategy_params)}
         Period: {start_date} to {end_date}
         
         Results by Symbol:
-        {json.dumps(backtest_results, indent=2)}
+        {compact_json(backtest_results)}
         
         Provide analysis on:
         1. Strategy performance assessment
@@ -685,13 +834,20 @@ def backtesting(trader_id):
         Be specific about strengths and weaknesses of the strategy.
         """
         
-        response = model.generate_content(backtest_prompt)
+        backtest_inputs = {
+            'trader_id': trader_id,
+            'strategy_params': strategy_params,
+            'period': [start_date, end_date],
+            'results': backtest_results,
+        }
+        # Backtests over a fixed period are deterministic, so keep their analysis for a day
+        backtest_text = generate_cached(model, 'backtest_analysis', backtest_inputs, backtest_prompt, ttl=86400)
         
         return jsonify({
             'success': True,
             'trader_id': trader_id,
             'backtest_results': backtest_results,
-            'strategy_analysis': response.text,
+            'strategy_analysis': backtest_text,
             'period': f"{start_date} to {end_date}",
             'timestamp': datetime.now().isoformat()
         })
@@ -1,15 +1,26 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import google.generativeai as genai
 import os
 from supabase import create_client, Client
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from market_data_service import MarketDataService  # Import our enhanced service
+from services.warmup import CacheWarmer, DEFAULT_WARM_UNIVERSE
+from services.request_context import RequestDataContext
+from utils.cache_stats import CACHE_NAMESPACES, split_cache_key
+from services.llm_backend import create_llm_model, get_backend_stats
+from services.llm_cache import generate_cached, get_llm_cache, stream_cached
+from services.llm_dispatcher import get_dispatcher
+from services.market_briefs import REFRESH_TOKEN_HEADER, get_brief_scheduler
+from services.conversation_memory import ConversationMemory
+from services.portfolio_loader import PortfolioLoader
+from utils.prompt_builder import POSITION_FIELDS, TRADE_FIELDS, PromptBuilder, compact_json, get_prompt_stats, round_value
 import logging
 
 load_dotenv()
@@ -24,62 +35,58 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
 # Initialize clients
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Gemini, or the deterministic local stand-in with LLM_BACKEND=local (offline benchmarks)
+model = create_llm_model(GEMINI_API_KEY)
 
 # Initialize enhanced market data service (use Finnhub primary with provided key if env missing)
 FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY') or 'd31talhr01qsprr2hh0gd31talhr01qsprr2hh10'
 market_service = MarketDataService(gemini_api_key=GEMINI_API_KEY, finnhub_api_key=FINNHUB_API_KEY)
+# Upper bound on symbols per recommendations request (they are batched into a few Gemini calls)
+MAX_RECOMMENDATION_SYMBOLS = int(os.getenv('MAX_RECOMMENDATION_SYMBOLS', '20'))
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def load_position_symbols():
+    """Symbols currently held in any trader's positions"""
+    response = supabase.table('positions').select('symbol').execute()
+    return {row['symbol'] for row in response.data or [] if row.get('symbol')}
+
+# Warm the market data cache in the background so the first users after a deploy hit it
+WARM_UNIVERSE = [s.strip() for s in os.getenv('MARKET_DATA_WARM_SYMBOLS', ','.join(DEFAULT_WARM_UNIVERSE)).split(',') if s.strip()]
+WARMUP_ENABLED = os.getenv('MARKET_DATA_WARMUP', 'true').lower() == 'true'
+cache_warmer = CacheWarmer(market_service, universe=WARM_UNIVERSE, symbol_sources=[load_position_symbols],
+                           chunk_size=int(os.getenv('MARKET_DATA_WARM_CHUNK_SIZE', '5')))
+if WARMUP_ENABLED:
+    cache_warmer.start()
+
 class EnhancedTradingAssistant:
     def __init__(self):
         self.supabase = supabase
         self.model = model
         self.market_service = market_service
+        self.portfolio_loader = PortfolioLoader.from_env(supabase)
     
     def get_trader_portfolio(self, trader_id):
-        """Fetch trader's portfolio data"""
+        """Fetch trader's portfolio data (queried in parallel, cached for a short TTL)"""
         try:
-            # Get trader basic info
-            trader_response = self.supabase.table('traders').select('*').eq('trader_id', trader_id).execute()
-            if not trader_response.data:
-                return None
-            
-            trader = trader_response.data[0]
-            
-            # Get positions
-            positions_response = self.supabase.table('positions').select('*').eq('trader_id', trader_id).execute()
-            positions = positions_response.data
-            
-            # Get recent trades
-            trades_response = self.supabase.table('trades').select('*').eq('trader_id', trader_id).order('trade_date', desc=True).limit(50).execute()
-            trades = trades_response.data
-            
-            # Calculate P&L
-            total_pnl = sum(trade['realized_pnl'] for trade in trades if trade['realized_pnl'])
-            
-            return {
-                'trader': trader,
-                'positions': positions,
-                'trades': trades,
-                'total_pnl': total_pnl
-            }
+            return self.portfolio_loader.load(trader_id)
         except Exception as e:
             logger.error(f"Error fetching portfolio: {e}")
             return None
     
-    def get_enhanced_market_data(self, symbols, period="1d"):
-        """Get market data using the enhanced service with fallbacks"""
+    def get_enhanced_market_data(self, symbols, period="1d", context=None):
+        """Get market data using the enhanced service with fallbacks (from ``context`` if given)"""
         try:
             if isinstance(symbols, str):
                 symbols = [symbols]
             
             logger.info(f"Fetching enhanced market data for: {symbols}")
-            market_data = self.market_service.get_multiple_stocks_data(symbols, period)
+            if context is not None:
+                market_data = context.get(symbols)
+            else:
+                market_data = self.market_service.get_multiple_stocks_data(symbols, period)
             
             # Transform data for compatibility with existing code
             transformed_data = {}
@@ -94,7 +101,8 @@ class EnhancedTradingAssistant:
                     'technical_indicators': data.get('technical_indicators', {}),
                     'source': data.get('source', 'unknown'),
                     'timestamp': data.get('timestamp'),
-                    'error': data.get('error')  # Include error info if present
+                    'error': data.get('error'),  # Include error info if present
+                    'stale': data.get('stale', False)
                 }
                 
                 # Add AI insights if available (from Gemini)
@@ -143,8 +151,8 @@ class EnhancedTradingAssistant:
             'profit_factor': abs(avg_win / avg_loss) if avg_loss != 0 else 0
         }
     
-    def generate_enhanced_analysis(self, market_data):
-        """Generate AI-powered market analysis with enhanced data"""
+    def _enhanced_analysis_prompt(self, market_data):
+        """Prompt for the market analysis over ``market_data``"""
         # Check data sources and quality
         data_sources = [data.get('source', 'unknown') for data in market_data.values()]
         has_errors = any(data.get('error') for data in market_data.values())
@@ -153,12 +161,14 @@ class EnhancedTradingAssistant:
         if has_errors:
             source_info += " (Some data sources experienced issues - analysis may be limited)"
         
-        prompt = f"""
+        builder = PromptBuilder('enhanced_analysis').add_quotes('market_data', market_data, min_items=1)
+        prompt = builder.build(lambda sections: f"""
         As an expert trading analyst, provide a comprehensive market analysis based on the following enhanced data:
         
         {source_info}
         
-        Market Data: {json.dumps(market_data, indent=2, default=str)}
+        Market Data (one row per symbol):
+        {sections['market_data']}
         
         Please provide:
         1. Overall market sentiment and trend analysis
@@ -170,18 +180,33 @@ class EnhancedTradingAssistant:
         
         Consider the data sources used and note any limitations in your analysis.
         Keep the analysis concise but actionable.
-        """
-        
+        """)
+        return prompt
+    
+    def generate_enhanced_analysis(self, market_data):
+        """Generate AI-powered market analysis with enhanced data"""
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            prompt = self._enhanced_analysis_prompt(market_data)
+            return generate_cached(self.model, 'enhanced_analysis', market_data, prompt)
         except Exception as e:
             logger.error(f"Error generating enhanced analysis: {e}")
             return f"Error generating market analysis: {e}"
     
-    def generate_personalized_recommendations(self, trader_id, portfolio_data, market_data, user_query=""):
-        """Generate personalized trading recommendations with enhanced market data"""
-        metrics = self.calculate_portfolio_metrics(portfolio_data)
+    def stream_enhanced_analysis(self, market_data):
+        """Market analysis text chunks as Gemini produces them"""
+        try:
+            prompt = self._enhanced_analysis_prompt(market_data)
+            yield from stream_cached(self.model, 'enhanced_analysis', market_data, prompt)
+        except Exception as e:
+            logger.error(f"Error streaming enhanced analysis: {e}")
+            yield f"Error generating market analysis: {e}"
+    
+    def _personalized_prompt(self, trader_id, portfolio_data, market_data, user_query="", conversation_id=None,
+                             metrics=None):
+        """(prompt, cache inputs) for personalized recommendations, with the conversation so far"""
+        memory = conversation_memory.render(conversation_id, trader_id)
+        # Callers that already computed the metrics for this request pass them in
+        metrics = metrics if metrics is not None else self.calculate_portfolio_metrics(portfolio_data)
         
         # Check data quality
         data_quality_note = ""
@@ -189,7 +214,14 @@ class EnhancedTradingAssistant:
         if error_symbols:
             data_quality_note = f"Note: Limited data available for {', '.join(error_symbols)} due to API issues."
         
-        prompt = f"""
+        # Market data outranks old trades when the prompt has to shrink
+        builder = (PromptBuilder('personalized_recommendations')
+                   .add_table('positions', portfolio_data['positions'][:5], POSITION_FIELDS, priority=2)
+                   .add_table('trades', portfolio_data['trades'][:10], TRADE_FIELDS, priority=3)
+                   .add_quotes('market_data', market_data, priority=1, min_items=1)
+                   .add('sectors', compact_json({k: round_value(v) for k, v in metrics.get('sector_allocation', {}).items()}), priority=0)
+                   .add_memory(memory))
+        prompt = builder.build(lambda sections: f"""
         As a personalized AI trading advisor, analyze the following trader's portfolio and provide recommendations:
         
         Trader ID: {trader_id}
@@ -200,12 +232,19 @@ class EnhancedTradingAssistant:
         - Total Trades: {metrics.get('total_trades', 0)}
         - Profit Factor: {metrics.get('profit_factor', 0):.2f}
         
-        Current Positions: {json.dumps(portfolio_data['positions'][:5], indent=2)}
-        Recent Trades: {json.dumps(portfolio_data['trades'][:10], indent=2)}
+        Current Positions:
+        {sections['positions']}
+        Recent Trades (newest first):
+        {sections['trades']}
+        
+        Enhanced Market Data (one row per symbol):
+        {sections['market_data']}
         
-        Enhanced Market Data: {json.dumps(market_data, indent=2, default=str)}
+        Sector Allocation: {sections['sectors']}
         
-        Sector Allocation: {json.dumps(metrics.get('sector_allocation', {}), indent=2)}
+        Conversation So Far: {sections['conversation_summary'] or 'none'}
+        Recent Turns:
+        {sections['recent_turns'] or 'none'}
         
         Trader's Question: "{user_query}"
         
@@ -220,17 +259,76 @@ class EnhancedTradingAssistant:
         6. Market timing considerations
         
         Make recommendations specific to their trading patterns, risk profile, and current market data quality.
-        """
+        """)
         
+        inputs = {
+            'trader_id': trader_id,
+            'total_pnl': portfolio_data.get('total_pnl', 0),
+            'metrics': metrics,
+            'positions': portfolio_data['positions'][:5],
+            'trades': portfolio_data['trades'][:10],
+            'market_data': market_data,
+            'user_query': user_query,
+            'conversation': memory,
+        }
+        return prompt, inputs
+    
+    def generate_personalized_recommendations(self, trader_id, portfolio_data, market_data, user_query="",
+                                              conversation_id=None, metrics=None):
+        """Generate personalized trading recommendations with enhanced market data"""
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            prompt, inputs = self._personalized_prompt(trader_id, portfolio_data, market_data, user_query,
+                                                       conversation_id, metrics)
+            return generate_cached(self.model, 'personalized_recommendations', inputs, prompt)
         except Exception as e:
             logger.error(f"Error generating personalized recommendations: {e}")
             return f"Error generating recommendations: {e}"
+    
+    def stream_personalized_recommendations(self, trader_id, portfolio_data, market_data, user_query="",
+                                            conversation_id=None, metrics=None):
+        """Personalized recommendation text chunks as Gemini produces them"""
+        try:
+            prompt, inputs = self._personalized_prompt(trader_id, portfolio_data, market_data, user_query,
+                                                       conversation_id, metrics)
+            yield from stream_cached(self.model, 'personalized_recommendations', inputs, prompt)
+        except Exception as e:
+            logger.error(f"Error streaming personalized recommendations: {e}")
+            yield f"Error generating recommendations: {e}"
 
 # Initialize enhanced assistant
 assistant = EnhancedTradingAssistant()
+# Rolling summary plus recent turns per chat session, persisted in chat_conversations
+conversation_memory = ConversationMemory.from_env(model)
+
+# Independent pieces of one request run here side by side (LLM calls, work alongside
+# a streamed answer). Tasks may fan out on the service's LLM pool, so they must not
+# run on that pool themselves
+request_executor = ThreadPoolExecutor(max_workers=int(os.getenv('REQUEST_CONCURRENCY', '8')),
+                                      thread_name_prefix='request')
+
+def wants_stream():
+    """Client asked for server-sent events (?stream=true or Accept: text/event-stream)"""
+    return (request.args.get('stream', 'false').lower() == 'true'
+            or 'text/event-stream' in request.headers.get('Accept', ''))
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sse_response(events):
+    """Stream ``events`` to the client unbuffered, keeping the request context alive"""
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 once the cache warm-up has finished, 503 with progress before that"""
+    status = cache_warmer.get_status()
+    ready = not WARMUP_ENABLED or cache_warmer.ready
+    return jsonify({
+        'ready': ready,
+        'warmup': status if WARMUP_ENABLED else {'state': 'disabled'},
+        'timestamp': datetime.now().isoformat()
+    }), (200 if ready else 503)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -245,13 +343,26 @@ def health_check():
             'services': {
                 'supabase': 'connected' if supabase else 'error',
                 'gemini': 'connected' if GEMINI_API_KEY else 'missing_key',
+                'llm_backend': get_backend_stats(model),
                 'market_data': 'working' if test_data and not test_data.get('error') else 'limited',
                 'market_data_source': test_data.get('source', 'unknown') if test_data else 'none'
             },
             'cache_stats': {
                 'cached_items': len(market_service.cache),
                 'cache_timeout': market_service.cache_timeout
-            }
+            },
+            'upstream_http': market_service.get_http_metrics(),
+            'rate_limits': market_service.get_rate_limit_stats(),
+            'circuit_breakers': market_service.get_circuit_stats(),
+            'hedging': market_service.get_hedging_stats(),
+            'streaming': market_service.get_streaming_stats(),
+            'warmup': cache_warmer.get_status(),
+            'llm_cache': get_llm_cache().get_stats(),
+            'llm_dispatcher': get_dispatcher().get_stats(),
+            'market_briefs': brief_scheduler.get_status(),
+            'conversation_memory': conversation_memory.get_stats(),
+            'portfolio_cache': assistant.portfolio_loader.get_stats(),
+            'prompt_sizes': get_prompt_stats()
         })
     except Exception as e:
         return jsonify({
@@ -262,7 +373,7 @@ def health_check():
 
 @app.route('/api/market-analysis', methods=['GET'])
 def enhanced_market_analysis():
-    """Get enhanced AI-powered market analysis with multiple data sources"""
+    """Get enhanced AI-powered market analysis with multiple data sources (SSE with ?stream=true)"""
     try:
         # Get symbols from request or use defaults
         symbols = request.args.get('symbols', 'AAPL,GOOGL,MSFT,TSLA,NVDA').split(',')
@@ -270,8 +381,9 @@ def enhanced_market_analysis():
         
         logger.info(f"Fetching enhanced market analysis for: {symbols}")
         
-        # Get enhanced market data
-        market_data = assistant.get_enhanced_market_data(symbols)
+        # One data fetch per request, shared by the analysis and the sentiment prompt
+        context = RequestDataContext(market_service)
+        market_data = assistant.get_enhanced_market_data(symbols, context=context)
         
         if not market_data:
             return jsonify({
@@ -279,16 +391,15 @@ def enhanced_market_analysis():
                 'error': 'Unable to fetch market data from any source'
             }), 503
         
+        # The sentiment call does not depend on the analysis, so it runs alongside it
+        sentiment_future = request_executor.submit(sentiment_or_error, symbols, context)
+        
+        if wants_stream():
+            return sse_response(stream_market_analysis(market_data, sentiment_future))
+        
         # Generate enhanced analysis
         analysis = assistant.generate_enhanced_analysis(market_data)
-        
-        # Get market sentiment if Gemini is available
-        sentiment_analysis = {}
-        try:
-            sentiment_analysis = market_service.get_market_sentiment_analysis(symbols)
-        except Exception as e:
-            logger.warning(f"Could not get sentiment analysis: {e}")
-            sentiment_analysis = {'error': str(e)}
+        sentiment_analysis = sentiment_future.result()
         
         return jsonify({
             'success': True,
@@ -302,13 +413,78 @@ def enhanced_market_analysis():
         logger.error(f"Error in enhanced market analysis: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def sentiment_or_error(symbols, context=None):
+    """Market sentiment if Gemini is available, an error dict otherwise"""
+    try:
+        return market_service.get_market_sentiment_analysis(symbols, context=context)
+    except Exception as e:
+        logger.warning(f"Could not get sentiment analysis: {e}")
+        return {'error': str(e)}
+
+def stream_market_analysis(market_data, sentiment_future):
+    """SSE events: market data, analysis tokens, sentiment analysis, done"""
+    try:
+        yield sse_event('market_data', {
+            'market_data': market_data,
+            'data_sources': list(set(data.get('source', 'unknown') for data in market_data.values()))
+        })
+        
+        chunks = []
+        for chunk in assistant.stream_enhanced_analysis(market_data):
+            chunks.append(chunk)
+            yield sse_event('token', {'text': chunk})
+        
+        yield sse_event('sentiment_analysis', sentiment_future.result())
+        
+        yield sse_event('done', {
+            'success': True,
+            'analysis': ''.join(chunks),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error streaming market analysis: {e}")
+        yield sse_event('error', {'success': False, 'error': str(e)})
+
+def stock_recommendation_profile(portfolio_data, portfolio_metrics):
+    """Trader profile passed to the per-symbol recommendation prompt"""
+    trader_profile = portfolio_data['trader']
+    return {
+        'risk_tolerance': trader_profile.get('risk_tolerance', 'medium'),
+        'investment_horizon': trader_profile.get('investment_horizon', 'medium'),
+        'trading_style': trader_profile.get('trading_style', 'swing'),
+        'portfolio_value': portfolio_metrics.get('total_portfolio_value', 10000)
+    }
+
+def market_data_summary(market_data):
+    return {
+        'symbols_analyzed': list(market_data.keys()),
+        'data_sources': list(set(data.get('source', 'unknown') for data in market_data.values())),
+        'data_quality': 'good' if not any(data.get('error') for data in market_data.values()) else 'limited'
+    }
+
+def store_query(trader_id, user_query, recommendations, market_data):
+    """Store the query in database for learning"""
+    try:
+        supabase.table('queries').insert({
+            'trader_id': trader_id,
+            'query': user_query,
+            'response': recommendations,
+            'market_data_snapshot': market_data,
+            'timestamp': datetime.now().isoformat()
+        }).execute()
+    except Exception as e:
+        logger.warning(f"Could not store query: {e}")
+
 @app.route('/api/recommendations/<trader_id>', methods=['POST'])
 def get_enhanced_recommendations(trader_id):
-    """Get enhanced personalized trading recommendations"""
+    """Get enhanced personalized trading recommendations (SSE with ?stream=true)"""
     try:
         data = request.json or {}
         user_query = data.get('query', '')
         symbols = data.get('symbols', ['AAPL', 'GOOGL', 'MSFT'])
+        include_stock_recommendations = data.get('include_stock_recommendations', True)
+        # Chat clients send one id per session so follow-up questions keep their context
+        conversation_id = data.get('conversation_id')
         
         logger.info(f"Getting enhanced recommendations for trader {trader_id}")
         
@@ -316,61 +492,82 @@ def get_enhanced_recommendations(trader_id):
         portfolio_data = assistant.get_trader_portfolio(trader_id)
         if not portfolio_data:
             return jsonify({'success': False, 'error': 'Trader not found'}), 404
+        portfolio_metrics = assistant.calculate_portfolio_metrics(portfolio_data)
+        
+        if wants_stream():
+            return sse_response(stream_recommendations(trader_id, portfolio_data, portfolio_metrics, symbols,
+                                                       user_query, include_stock_recommendations, conversation_id))
         
         # Get enhanced market data for relevant symbols
         market_data = assistant.get_enhanced_market_data(symbols)
         
         # Generate enhanced recommendations
         recommendations = assistant.generate_personalized_recommendations(
-            trader_id, portfolio_data, market_data, user_query
+            trader_id, portfolio_data, market_data, user_query, conversation_id, portfolio_metrics
         )
         
         # Get individual stock recommendations if requested
         stock_recommendations = {}
-        if data.get('include_stock_recommendations', True):
-            for symbol in symbols[:3]:  # Limit to avoid rate limits
-                try:
-                    trader_profile = portfolio_data['trader']
-                    stock_rec = market_service.get_stock_recommendations(symbol, {
-                        'risk_tolerance': trader_profile.get('risk_tolerance', 'medium'),
-                        'investment_horizon': trader_profile.get('investment_horizon', 'medium'),
-                        'trading_style': trader_profile.get('trading_style', 'swing'),
-                        'portfolio_value': assistant.calculate_portfolio_metrics(portfolio_data).get('total_portfolio_value', 10000)
-                    })
-                    stock_recommendations[symbol] = stock_rec
-                except Exception as e:
-                    logger.warning(f"Could not get recommendations for {symbol}: {e}")
-                    stock_recommendations[symbol] = {'error': str(e)}
-        
-        # Store the query in database for learning
-        try:
-            supabase.table('queries').insert({
-                'trader_id': trader_id,
-                'query': user_query,
-                'response': recommendations,
-                'market_data_snapshot': market_data,
-                'timestamp': datetime.now().isoformat()
-            }).execute()
-        except Exception as e:
-            logger.warning(f"Could not store query: {e}")
+        if include_stock_recommendations:
+            stock_recommendations = market_service.get_batch_recommendations(
+                symbols[:MAX_RECOMMENDATION_SYMBOLS], stock_recommendation_profile(portfolio_data, portfolio_metrics))
+        
+        store_query(trader_id, user_query, recommendations, market_data)
+        conversation_memory.add_turn(conversation_id, user_query, recommendations, trader_id)
         
         return jsonify({
             'success': True,
             'trader_id': trader_id,
+            'conversation_id': conversation_id,
             'recommendations': recommendations,
             'stock_recommendations': stock_recommendations,
-            'portfolio_summary': assistant.calculate_portfolio_metrics(portfolio_data),
-            'market_data_summary': {
-                'symbols_analyzed': list(market_data.keys()),
-                'data_sources': list(set(data.get('source', 'unknown') for data in market_data.values())),
-                'data_quality': 'good' if not any(data.get('error') for data in market_data.values()) else 'limited'
-            },
+            'portfolio_summary': portfolio_metrics,
+            'market_data_summary': market_data_summary(market_data),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         logger.error(f"Error getting enhanced recommendations: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def stream_recommendations(trader_id, portfolio_data, portfolio_metrics, symbols, user_query, include_stock_recommendations,
+                           conversation_id=None):
+    """SSE events: portfolio summary, market data, recommendation tokens, stock recommendations, done"""
+    try:
+        yield sse_event('portfolio_summary', portfolio_metrics)
+        
+        market_data = assistant.get_enhanced_market_data(symbols)
+        yield sse_event('market_data', {'market_data': market_data, 'market_data_summary': market_data_summary(market_data)})
+        
+        # Per-symbol recommendations run while the main answer streams
+        stock_future = None
+        if include_stock_recommendations:
+            stock_future = request_executor.submit(
+                market_service.get_batch_recommendations, symbols[:MAX_RECOMMENDATION_SYMBOLS],
+                stock_recommendation_profile(portfolio_data, portfolio_metrics))
+        
+        chunks = []
+        for chunk in assistant.stream_personalized_recommendations(trader_id, portfolio_data, market_data, user_query,
+                                                                   conversation_id, portfolio_metrics):
+            chunks.append(chunk)
+            yield sse_event('token', {'text': chunk})
+        recommendations = ''.join(chunks)
+        
+        if stock_future is not None:
+            yield sse_event('stock_recommendations', stock_future.result())
+        
+        store_query(trader_id, user_query, recommendations, market_data)
+        conversation_memory.add_turn(conversation_id, user_query, recommendations, trader_id)
+        yield sse_event('done', {
+            'success': True,
+            'trader_id': trader_id,
+            'conversation_id': conversation_id,
+            'recommendations': recommendations,
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error streaming recommendations: {e}")
+        yield sse_event('error', {'success': False, 'error': str(e)})
+
 @app.route('/api/stock-data/<symbol>', methods=['GET'])
 def get_stock_data(symbol):
     """Get detailed stock data with multiple sources"""
@@ -408,29 +605,46 @@ def get_stock_data(symbol):
         logger.error(f"Error fetching stock data for {symbol}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def market_sentiment_brief(symbols):
+    """Market data plus Gemini sentiment for ``symbols``, shared by every caller as a market brief"""
+    # Fetch once; the sentiment prompt and the response share the data
+    context = RequestDataContext(market_service)
+    market_data = assistant.get_enhanced_market_data(symbols, context=context)
+    sentiment_data = market_service.get_market_sentiment_analysis(symbols, context=context)
+    if sentiment_data.get('error'):
+        # Keep serving the previous brief instead of storing a failed one
+        raise RuntimeError(sentiment_data['error'])
+    return {'sentiment_analysis': sentiment_data, 'market_data': market_data, 'analyzed_symbols': symbols}
+
+DEFAULT_SENTIMENT_SYMBOLS = ['SPY', 'QQQ', 'DIA', 'IWM', 'VIX']
+brief_scheduler = get_brief_scheduler()
+brief_scheduler.register('market_sentiment', market_sentiment_brief, defaults=[{'symbols': DEFAULT_SENTIMENT_SYMBOLS}])
+if os.getenv('MARKET_BRIEFS', 'true').lower() == 'true':
+    brief_scheduler.start()
+
+def serve_brief(name, **params):
+    """Stored market brief; ?refresh=true regenerates it for callers sending the refresh token"""
+    refresh = request.args.get('refresh', 'false').lower() == 'true'
+    brief = brief_scheduler.serve(name, refresh=refresh, token=request.headers.get(REFRESH_TOKEN_HEADER), **params)
+    return jsonify({
+        'success': True,
+        **brief['data'],
+        'brief': {key: value for key, value in brief.items() if key != 'data'},
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/api/market-sentiment', methods=['GET'])
 def get_market_sentiment():
-    """Get AI-powered market sentiment analysis"""
+    """Get AI-powered market sentiment analysis (the scheduled brief for these symbols)"""
     try:
-        symbols = request.args.get('symbols', 'SPY,QQQ,DIA,IWM,VIX').split(',')
-        symbols = [s.strip().upper() for s in symbols]
+        symbols = request.args.get('symbols', ','.join(DEFAULT_SENTIMENT_SYMBOLS)).split(',')
+        symbols = [s.strip().upper() for s in symbols if s.strip()]
         
         logger.info(f"Getting market sentiment for: {symbols}")
+        return serve_brief('market_sentiment', symbols=symbols)
         
-        # Get sentiment analysis
-        sentiment_data = market_service.get_market_sentiment_analysis(symbols)
-        
-        # Get basic market data for context
-        market_data = assistant.get_enhanced_market_data(symbols)
-        
-        return jsonify({
-            'success': True,
-            'sentiment_analysis': sentiment_data,
-            'market_data': market_data,
-            'analyzed_symbols': symbols,
-            'timestamp': datetime.now().isoformat()
-        })
-        
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
     except Exception as e:
         logger.error(f"Error getting market sentiment: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -474,31 +688,87 @@ def get_portfolio(trader_id):
         logger.error(f"Error fetching portfolio for {trader_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/portfolio/<trader_id>/invalidate', methods=['POST'])
+def invalidate_portfolio(trader_id):
+    """Drop a trader's cached portfolio; call after writing their traders/positions/trades rows"""
+    try:
+        removed = assistant.portfolio_loader.invalidate(trader_id)
+        return jsonify({
+            'success': True,
+            'trader_id': trader_id,
+            'invalidated': bool(removed),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/live/<symbol>', methods=['GET'])
+def get_live_data(symbol):
+    """Latest streamed price and intraday OHLCV bars from the in-memory tick store"""
+    try:
+        symbol = symbol.upper()
+        interval = request.args.get('interval', '1m')
+        limit = int(request.args.get('limit', 60))
+        market_service.subscribe_symbol(symbol)
+        return jsonify({
+            'success': True,
+            'symbol': symbol,
+            'live_price': market_service.get_live_price(symbol),
+            'interval': interval,
+            'bars': market_service.get_intraday_bars(symbol, interval, limit),
+            'timestamp': datetime.now().isoformat()
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/provider-stats', methods=['GET'])
+def get_provider_stats():
+    """Per-provider latency/error/quota statistics and recent routing decisions"""
+    try:
+        limit = int(request.args.get('decisions', 20))
+        return jsonify({
+            'success': True,
+            'routing': market_service.router.get_stats(recent_decisions=limit),
+            'hedging': market_service.get_hedging_stats(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/cache-status', methods=['GET'])
 def get_cache_status():
     """Get cache status and statistics"""
     try:
+        top_n = int(request.args.get('top', 10))
+        stats = market_service.get_cache_statistics(top_n=top_n)
+        now = time.time()
         cache_stats = {
-            'total_cached_items': len(market_service.cache),
+            'total_cached_items': stats['total_entries'],
+            'total_bytes': stats['total_bytes'],
             'cache_timeout_seconds': market_service.cache_timeout,
+            'namespaces': stats['namespaces'],
+            'hottest_keys': stats['hottest_keys'],
             'cached_symbols': [],
             'cache_hit_info': {}
         }
         
-        for cache_key, cache_data in market_service.cache.items():
-            parts = cache_key.split('_')
-            if len(parts) >= 2:
-                source = parts[0]
-                symbol = parts[1]
-                cache_stats['cached_symbols'].append(f"{symbol} ({source})")
-                cache_stats['cache_hit_info'][cache_key] = {
-                    'timestamp': cache_data.get('timestamp', 0),
-                    'age_seconds': time.time() - cache_data.get('timestamp', 0)
-                }
+        for cache_key, cache_data in list(market_service.cache.items()):
+            namespace, symbol = split_cache_key(cache_key)
+            if symbol:
+                cache_stats['cached_symbols'].append(f"{symbol} ({namespace})")
+            cache_stats['cache_hit_info'][cache_key] = {
+                'timestamp': cache_data.get('timestamp', 0),
+                'age_seconds': round(now - cache_data.get('timestamp', 0), 1),
+                'bytes': cache_data.get('size_bytes', 0)
+            }
         
         return jsonify({
             'success': True,
             'cache_statistics': cache_stats,
+            'history_memory': market_service.get_history_memory_report(),
+            'llm_cache': get_llm_cache().get_stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -506,14 +776,24 @@ def get_cache_status():
 
 @app.route('/api/clear-cache', methods=['POST'])
 def clear_cache():
-    """Clear the market data cache"""
+    """Clear the market data cache, optionally only one namespace and/or symbol"""
     try:
-        cache_size_before = len(market_service.cache)
-        market_service.cache.clear()
+        data = request.get_json(silent=True) or {}
+        namespace = data.get('namespace') or request.args.get('namespace')
+        symbol = data.get('symbol') or request.args.get('symbol')
+        if namespace and namespace not in CACHE_NAMESPACES:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown namespace '{namespace}'. Use one of: {', '.join(CACHE_NAMESPACES)}"
+            }), 400
+        
+        removed = market_service.clear_cache(namespace=namespace, symbol=symbol)
+        scope = ' '.join(part for part in (namespace, symbol.upper() if symbol else None) if part) or 'all'
         
         return jsonify({
             'success': True,
-            'message': f'Cache cleared. Removed {cache_size_before} items.',
+            'message': f'Cache cleared ({scope}). Removed {removed} items.',
+            'removed': removed,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -4,27 +4,46 @@ import json
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
 from functools import wraps
-import google.generativeai as genai
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import os
+import random
+import threading
+from collections import Counter
+from services.http_client import ProviderHTTPClient, RequestCancelled, cancellation_scope
+from services.async_market_data import AsyncMarketDataService
+from services.provider_router import ProviderRouter
+from services.streaming import FinnhubStreamClient, TickStore
+from services.history_store import CompactHistory, HistoryStore
+from utils.indicators import IndicatorPanel, compute_indicators, latest_row
+from utils.streaming_indicators import IndicatorState
+from utils.cache_stats import CacheStats, split_cache_key
+from services.llm_backend import create_llm_model
+from services.llm_cache import generate_cached
+from utils.prompt_builder import PromptBuilder, compact_json, compact_quote
+from utils.rate_limiter import RateLimitedError, get_rate_limiter
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
 
 class MarketDataService:
     """Enhanced market data service with multiple data sources and fallbacks"""
     
-    def __init__(self, gemini_api_key: str = None, alpha_vantage_api_key: str = None, finnhub_api_key: str = None):
+    def __init__(self, gemini_api_key: str = None, alpha_vantage_api_key: str = None, finnhub_api_key: str = None,
+                 http_pool_size: int = None, http_connect_timeout: float = None, http_read_timeout: float = None,
+                 provider_limits: Dict[str, int] = None, rate_limits: Dict[str, Dict] = None,
+                 rate_limit_wait: float = None, stale_max_age: float = None,
+                 circuit_breaker_config: Dict = None, request_deadline: float = None,
+                 hedging: bool = None, pinned_provider: str = None):
         self.gemini_api_key = gemini_api_key
-        if gemini_api_key:
-            genai.configure(api_key=gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+        # Gemini, or the local stand-in with LLM_BACKEND=local; None without either
+        self.gemini_model = create_llm_model(gemini_api_key)
         
         # Alpha Vantage configuration (kept for compatibility, not primary)
         env_alpha_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         self.alpha_vantage_api_key = alpha_vantage_api_key or env_alpha_key
         self.alpha_base_url = 'https://www.alphavantage.co/query'
-        self._last_alpha_call_ts = 0.0
 
         # Finnhub configuration (primary)
         env_finnhub_key = os.getenv('FINNHUB_API_KEY')
@@ -40,21 +59,149 @@ class MarketDataService:
         # Cache for reducing API calls
         self.cache = {}
         self.cache_timeout = 300  # 5 minutes
+        self.profile_cache_timeout = 86400  # fundamentals barely move intraday
+        # Expired entries younger than this are served stale while a background
+        # refresh runs; older ones make the caller wait for upstream
+        self.stale_max_age = stale_max_age or float(os.getenv('MARKET_DATA_STALE_MAX_AGE', '900'))
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Hit/miss/eviction accounting, plus when each outstanding miss started
+        self.cache_stats = CacheStats()
+        self._miss_started: Dict[str, float] = {}
+        # How often each symbol is asked for; drives predictive prefetch
+        self._symbol_demand = Counter()
+        self._demand_lock = threading.Lock()
+        # Price history lives apart from quotes as compact float arrays
+        self.history_store = HistoryStore(ttl=self.cache_timeout,
+                                          max_entries=int(os.getenv('HISTORY_CACHE_MAX_ENTRIES', '1000')))
+
+        # Side fetches (profiles, prefetches) run here so they never compete with
+        # the request workers that are waiting on them
+        self.background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='market-data-bg')
+        # Cold-miss profile fetches on the request path get their own pool: the
+        # background one can be tied up by prefetches waiting on rate-limit tokens
+        self.profile_fetch_workers = int(os.getenv('PROFILE_FETCH_CONCURRENCY', '4'))
+        self.profile_executor = ThreadPoolExecutor(max_workers=self.profile_fetch_workers,
+                                                   thread_name_prefix='market-data-profile')
+        self._profile_fetches = 0
+        self._profile_fetch_lock = threading.Lock()
+        # Batched Gemini prompts: symbols per prompt, and how many prompts run at once
+        self.recommendation_batch_size = int(os.getenv('RECOMMENDATION_BATCH_SIZE', '5'))
+        self.llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_BATCH_CONCURRENCY', '4')),
+                                               thread_name_prefix='llm-batch')
+
+        # Circuit breakers let the fallback chain skip a failing provider immediately
+        breaker_config = {
+            'failure_threshold': int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+            'error_rate_threshold': float(os.getenv('CIRCUIT_ERROR_RATE_THRESHOLD', '0.5')),
+            'cooldown': float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '30')),
+        }
+        breaker_config.update(circuit_breaker_config or {})
+        self.circuit_breakers = {
+            name: CircuitBreaker(name, **breaker_config)
+            for name in ('finnhub', 'alpha_vantage', 'yahoo_finance')
+        }
+        # Upper bound on time a single provider call spends retrying
+        self.request_deadline = request_deadline or float(os.getenv('MARKET_DATA_REQUEST_DEADLINE', '5'))
+
+        # Pooled keep-alive HTTP clients, one per provider, shared across threads
+        pool_size = http_pool_size or int(os.getenv('MARKET_DATA_HTTP_POOL_SIZE', '10'))
+        connect_timeout = http_connect_timeout or float(os.getenv('MARKET_DATA_HTTP_CONNECT_TIMEOUT', '3.05'))
+        read_timeout = http_read_timeout or float(os.getenv('MARKET_DATA_HTTP_READ_TIMEOUT', '10'))
+        self.http_clients = {
+            'finnhub': ProviderHTTPClient('finnhub', pool_size, connect_timeout, read_timeout,
+                                          breaker=self.circuit_breakers['finnhub']),
+            'alpha_vantage': ProviderHTTPClient('alpha_vantage', pool_size, connect_timeout, read_timeout,
+                                                breaker=self.circuit_breakers['alpha_vantage']),
+            'yahoo_finance': ProviderHTTPClient('yahoo_finance', pool_size, connect_timeout, read_timeout, headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            }, breaker=self.circuit_breakers['yahoo_finance']),
+        }
+
+        # Token-bucket limiters shared by every thread (and service instance) per provider
+        limits = {
+            'finnhub': {
+                'per_minute': float(os.getenv('FINNHUB_RATE_PER_MIN', '60')),
+                'burst': int(os.getenv('FINNHUB_RATE_BURST', '10')),
+            },
+            'alpha_vantage': {
+                'per_minute': float(os.getenv('ALPHA_VANTAGE_RATE_PER_MIN', '5')),
+                'burst': int(os.getenv('ALPHA_VANTAGE_RATE_BURST', '2')),
+            },
+        }
+        for provider, config in (rate_limits or {}).items():
+            limits.setdefault(provider, {}).update(config)
+        self.rate_limiters = {
+            provider: get_rate_limiter(provider, config['per_minute'], config['burst'])
+            for provider, config in limits.items()
+        }
+        # Longest a request will wait for a token before failing fast as rate limited
+        self.rate_limit_wait = rate_limit_wait if rate_limit_wait is not None else float(os.getenv('RATE_LIMIT_MAX_WAIT', '2'))
+
+        # Adaptive routing: pick the primary per request from live latency,
+        # error-rate and quota statistics (pinning overrides)
+        self.router = ProviderRouter(
+            self.http_clients, self.circuit_breakers, self.rate_limiters,
+            pinned=pinned_provider or os.getenv('MARKET_DATA_PINNED_PROVIDER') or None
+        )
+
+        # Hedged requests: if the primary is slower than its recent p95, ask the
+        # secondary too and take whichever answers first
+        if hedging is None:
+            hedging = os.getenv('MARKET_DATA_HEDGING', 'false').lower() == 'true'
+        self.hedging_enabled = hedging
+        self.hedge_min_delay = float(os.getenv('MARKET_DATA_HEDGE_MIN_DELAY', '0.05'))
+        self.hedge_max_delay = float(os.getenv('MARKET_DATA_HEDGE_MAX_DELAY', '2'))
+        self.hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='market-data-hedge')
+        self._hedge_counts = {}
+        self._hedge_lock = threading.Lock()
+
+        # Async engine used to fan multi-symbol requests out concurrently
+        self.async_service = AsyncMarketDataService(self, provider_limits=provider_limits)
+
+        # Streamed trades kept in memory: live prices and intraday bars without REST calls
+        self.tick_store = TickStore(capacity=int(os.getenv('TICK_STORE_CAPACITY', '4096')))
+        # A streamed price older than this is not trusted over the REST quote
+        self.live_price_max_age = float(os.getenv('LIVE_PRICE_MAX_AGE', '15'))
+        self.stream_feed = None
+        # Incremental indicators per symbol, advanced one closed 1m bar at a time
+        self.live_indicators: Dict[str, IndicatorState] = {}
+        self._indicator_lock = threading.Lock()
+        self.indicator_checkpoint_path = os.getenv('INDICATOR_CHECKPOINT_PATH')
+        if self.indicator_checkpoint_path and os.path.exists(self.indicator_checkpoint_path):
+            self.restore_indicators(self.indicator_checkpoint_path)
+        if os.getenv('MARKET_DATA_STREAMING', 'false').lower() == 'true':
+            symbols = [s.strip() for s in os.getenv('MARKET_DATA_STREAM_SYMBOLS', '').split(',') if s.strip()]
+            self.start_streaming(symbols)
         
-    def retry_on_failure(max_retries=3, delay=1):
-        """Decorator for retry logic"""
+    def retry_on_failure(max_retries=3, delay=0.5, max_delay=4.0):
+        """Decorator for retry logic with jittered exponential backoff.
+
+        Each wait is drawn uniformly from [0, min(max_delay, delay * 2**attempt)]
+        and retries stop once the next wait would overrun the service's
+        per-request deadline. Rate-limited and open-circuit errors are raised
+        straight away so the caller can fail over.
+        """
         def decorator(func):
             @wraps(func)
             def wrapper(self, *args, **kwargs):
+                deadline = time.monotonic() + self.request_deadline
                 for attempt in range(max_retries):
                     try:
                         return func(self, *args, **kwargs)
+                    except (RateLimitedError, CircuitOpenError, RequestCancelled):
+                        # Retrying straight away would only hit the same wall
+                        raise
                     except Exception as e:
                         if attempt == max_retries - 1:
                             self.logger.error(f"Failed after {max_retries} attempts: {e}")
                             raise e
-                        self.logger.warning(f"Attempt {attempt + 1} failed: {e}, retrying...")
-                        time.sleep(delay * (attempt + 1))
+                        backoff = random.uniform(0, min(max_delay, delay * (2 ** attempt)))
+                        if time.monotonic() + backoff >= deadline:
+                            self.logger.error(f"Giving up after {attempt + 1} attempts (request deadline): {e}")
+                            raise e
+                        self.logger.warning(f"Attempt {attempt + 1} failed: {e}, retrying in {backoff:.2f}s...")
+                        time.sleep(backoff)
                 return None
             return wrapper
         return decorator
@@ -64,34 +211,328 @@ class MarketDataService:
         if cache_key not in self.cache:
             return False
         
-        cached_time = self.cache[cache_key].get('timestamp', 0)
-        return time.time() - cached_time < self.cache_timeout
+        entry = self.cache[cache_key]
+        cached_time = entry.get('timestamp', 0)
+        return time.time() - cached_time < entry.get('ttl', self.cache_timeout)
     
-    def _cache_data(self, cache_key: str, data: Dict) -> None:
-        """Cache data with timestamp"""
+    def _cache_data(self, cache_key: str, data: Dict, ttl: float = None, max_age: float = None) -> None:
+        """Cache data with timestamp (and optional per-entry TTL / stale max age)"""
+        ttl = ttl or self.cache_timeout
+        started = self._miss_started.pop(cache_key, None)
+        fetch_latency = time.perf_counter() - started if started is not None else None
+        previous = self.cache.get(cache_key)
+        if fetch_latency is None and previous:
+            fetch_latency = previous.get('fetch_latency')
+        try:
+            size_bytes = len(json.dumps(data, default=str))
+        except Exception:
+            size_bytes = 0
         self.cache[cache_key] = {
             'data': data,
-            'timestamp': time.time()
+            'timestamp': time.time(),
+            'ttl': ttl,
+            'max_age': max(max_age or self.stale_max_age, ttl),
+            'fetch_latency': fetch_latency,
+            'size_bytes': size_bytes,
         }
-    
+        self.cache_stats.record_store(cache_key, fetch_latency)
+
+    def _record_miss(self, cache_key: str) -> None:
+        self.cache_stats.record_miss(cache_key)
+        self._miss_started[cache_key] = time.perf_counter()
+
     def _get_cached_data(self, cache_key: str) -> Optional[Dict]:
         """Get cached data if valid"""
         if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]['data']
+            entry = self.cache[cache_key]
+            self.cache_stats.record_hit(cache_key, entry.get('fetch_latency'))
+            return entry['data']
+        self._record_miss(cache_key)
+        return None
+
+    def _get_cached_or_stale(self, cache_key: str, refresh: Callable[[], Dict]) -> Optional[Dict]:
+        """Stale-while-revalidate lookup.
+
+        Returns fresh data as-is. Expired data still within the entry's max age
+        is returned as a copy flagged ``stale`` and ``refresh`` is scheduled in
+        the background (once per key). Anything older is evicted and None is
+        returned so the caller fetches synchronously.
+        """
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            self._record_miss(cache_key)
+            return None
+        age = time.time() - entry.get('timestamp', 0)
+        if age < entry.get('ttl', self.cache_timeout):
+            self.cache_stats.record_hit(cache_key, entry.get('fetch_latency'))
+            return entry['data']
+        if age < entry.get('max_age', self.stale_max_age):
+            self.cache_stats.record_hit(cache_key, entry.get('fetch_latency'), stale=True)
+            self._schedule_refresh(cache_key, refresh)
+            stale = dict(entry['data'])
+            stale['stale'] = True
+            stale['age_seconds'] = round(age, 1)
+            return stale
+        if self.cache.pop(cache_key, None) is not None:
+            self.cache_stats.record_eviction(cache_key)
+        self._record_miss(cache_key)
         return None
-    def _alpha_rate_limit(self):
-        """Simple client-side throttle for Alpha Vantage free tier (~5 req/min)."""
+
+    def get_cache_statistics(self, top_n: int = 10) -> Dict:
+        """Per-namespace hit/miss/stale/eviction counts, bytes and hottest keys"""
+        self.purge_expired()
+        return self.cache_stats.report(dict(self.cache), top_n)
+
+    def purge_expired(self) -> int:
+        """Evict entries past their stale max age (they can never be served again)"""
+        now = time.time()
+        expired = [key for key, entry in list(self.cache.items())
+                   if now - entry.get('timestamp', 0) >= entry.get('max_age', self.stale_max_age)]
+        for key in expired:
+            if self.cache.pop(key, None) is not None:
+                self.cache_stats.record_eviction(key)
+        # Misses whose fetch failed never get stored; forget them
+        cutoff = time.perf_counter() - 60
+        for key, started in list(self._miss_started.items()):
+            if started < cutoff:
+                self._miss_started.pop(key, None)
+        return len(expired)
+
+    def clear_cache(self, namespace: str = None, symbol: str = None) -> int:
+        """Remove cached entries, optionally only one namespace and/or symbol; returns the count"""
+        symbol = symbol.upper() if symbol else None
+        removed = []
+        for key in list(self.cache):
+            key_namespace, key_symbol = split_cache_key(key)
+            if namespace and key_namespace != namespace:
+                continue
+            if symbol and key_symbol != symbol:
+                continue
+            if self.cache.pop(key, None) is not None:
+                removed.append(key)
+                self.cache_stats.record_eviction(key)
+        self.cache_stats.forget_keys(removed)
+        if namespace in (None, 'yf'):
+            self.history_store.clear(symbol)
+        return len(removed)
+
+    def _schedule_refresh(self, cache_key: str, refresh: Callable[[], Dict]) -> None:
+        """Run ``refresh`` on the background executor unless one is already in flight"""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def run():
+            self._miss_started[cache_key] = time.perf_counter()
+            try:
+                refresh()
+            except Exception as e:
+                self.logger.warning(f"Background refresh failed for {cache_key}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+
         try:
-            now = time.time()
-            min_interval = 12.5  # seconds between calls
-            if now - self._last_alpha_call_ts < min_interval:
-                time.sleep(min_interval - (now - self._last_alpha_call_ts))
-            self._last_alpha_call_ts = time.time()
-        except Exception:
-            # Best-effort; never block on throttle errors
-            pass
+            self.background_executor.submit(run)
+        except RuntimeError:
+            with self._refresh_lock:
+                self._refreshing.discard(cache_key)
+    def _record_demand(self, symbol: str) -> None:
+        with self._demand_lock:
+            self._symbol_demand[symbol.upper()] += 1
+
+    def get_symbol_demand(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Most requested symbols with their request counts"""
+        with self._demand_lock:
+            return self._symbol_demand.most_common(n)
+
+    def get_http_metrics(self) -> Dict[str, Dict]:
+        """Per-provider request latency and connection reuse statistics"""
+        return {name: client.get_stats() for name, client in self.http_clients.items()}
+
+    def close(self) -> None:
+        """Release pooled upstream connections"""
+        self.stop_streaming()
+        if self.indicator_checkpoint_path:
+            self.checkpoint_indicators(self.indicator_checkpoint_path)
+        self.async_service.close()
+        self.background_executor.shutdown(wait=False)
+        self.profile_executor.shutdown(wait=False)
+        self.hedge_executor.shutdown(wait=False)
+        self.llm_executor.shutdown(wait=False)
+        for client in self.http_clients.values():
+            client.close()
+
+    def start_streaming(self, symbols: List[str] = ()) -> None:
+        """Start the Finnhub trade websocket feeding the tick store"""
+        if self.stream_feed is None:
+            self.stream_feed = FinnhubStreamClient(self.finnhub_api_key, self.tick_store, symbols).start()
+        else:
+            for symbol in symbols:
+                self.subscribe_symbol(symbol)
+
+    def attach_feed(self, feed) -> None:
+        """Use an already-built feed (e.g. a ReplayFeed) writing into ``self.tick_store``"""
+        self.stop_streaming()
+        self.stream_feed = feed
+
+    def stop_streaming(self) -> None:
+        if self.stream_feed is not None:
+            self.stream_feed.stop()
+            self.stream_feed = None
+
+    def subscribe_symbol(self, symbol: str) -> None:
+        """Add a symbol to the live stream (no-op for feeds without subscriptions)"""
+        if hasattr(self.stream_feed, 'subscribe'):
+            self.stream_feed.subscribe(symbol)
+
+    def get_live_price(self, symbol: str, max_age: float = None) -> Optional[Dict]:
+        """Latest streamed trade for a symbol, None if absent or older than ``max_age``"""
+        last = self.tick_store.last_price(symbol)
+        if last is None:
+            return None
+        price, ts = last
+        age = time.time() - ts
+        if age > (max_age if max_age is not None else self.live_price_max_age):
+            return None
+        return {'symbol': symbol.upper(), 'price': price, 'timestamp': ts, 'age_seconds': round(age, 3)}
+
+    def get_intraday_bars(self, symbol: str, interval: str = '1m', limit: int = 60) -> List[Dict]:
+        """1s / 1m OHLCV bars aggregated from streamed trades"""
+        return self.tick_store.get_bars(symbol, interval, limit)
+
+    def get_streaming_stats(self) -> Dict:
+        stats = self.tick_store.get_stats()
+        stats['feed'] = self.stream_feed.get_stats() if self.stream_feed is not None else None
+        return stats
+
+    def _indicator_state(self, symbol: str, seed: bool = True) -> Optional[IndicatorState]:
+        """Live indicator state for a symbol, caught up with the stream's closed 1m bars.
+
+        A new state is seeded from intraday history (fetched only if ``seed``);
+        after that each call applies just the bars that closed since the last.
+        """
+        symbol = symbol.upper()
+        state = self.live_indicators.get(symbol)
+        if state is None:
+            history = self.history_store.get(symbol, '1d')
+            if history is None and seed:
+                try:
+                    history = self.get_history(symbol, '1d')
+                except Exception as e:
+                    self.logger.warning(f"Cannot seed live indicators for {symbol}: {e}")
+            if history is None:
+                return None
+            fresh = IndicatorState()
+            # The final history bar is still forming, so it is not committed
+            fresh.seed(history.close[:-1], history.volume[:-1], history.index[:-1] / 1e9)
+            with self._indicator_lock:
+                state = self.live_indicators.setdefault(symbol, fresh)
+
+        with self._indicator_lock:
+            behind = 2 if state.last_bar_time is None else int((time.time() - state.last_bar_time) // 60) + 2
+            bars = self.tick_store.get_bars(symbol, '1m', limit=min(behind, self.tick_store.max_bars))
+            for bar in bars[:-1]:
+                if state.last_bar_time is None or bar['time'] > state.last_bar_time:
+                    state.update(bar['close'], bar['volume'], bar['time'])
+        return state
+
+    def get_live_indicators(self, symbol: str, seed: bool = True) -> Optional[Dict]:
+        """Indicators as of the latest streamed price, in O(1) per new bar"""
+        state = self._indicator_state(symbol, seed=seed)
+        if state is None:
+            return None
+        live = self.get_live_price(symbol)
+        with self._indicator_lock:
+            snapshot = state.snapshot(live['price'] if live else None)
+        snapshot['live'] = live is not None
+        return snapshot
+
+    def checkpoint_indicators(self, path: str = None) -> Dict[str, Dict]:
+        """Serialisable live indicator state for every symbol (also written to ``path``)"""
+        with self._indicator_lock:
+            checkpoint = {symbol: state.checkpoint() for symbol, state in self.live_indicators.items()}
+        if path:
+            try:
+                with open(path, 'w') as f:
+                    json.dump(checkpoint, f)
+            except Exception as e:
+                self.logger.error(f"Failed to write indicator checkpoint {path}: {e}")
+        return checkpoint
+
+    def restore_indicators(self, source) -> None:
+        """Load live indicator state from a checkpoint dict or a file written by checkpoint_indicators"""
+        try:
+            if isinstance(source, str):
+                with open(source) as f:
+                    source = json.load(f)
+            restored = {symbol: IndicatorState.restore(state) for symbol, state in source.items()}
+        except Exception as e:
+            self.logger.error(f"Failed to restore indicator checkpoint: {e}")
+            return
+        with self._indicator_lock:
+            self.live_indicators.update(restored)
+
+    def _overlay_live_price(self, data: Dict) -> Dict:
+        """Replace a REST snapshot's price with a fresher streamed trade, if there is one"""
+        live = self.get_live_price(data.get('symbol', ''))
+        if live is None or data.get('source') == 'mock_data':
+            return data
+        data = dict(data)
+        data['current_price'] = live['price']
+        prev_close = data.get('previous_close')
+        if prev_close:
+            data['change'] = live['price'] - prev_close
+            data['change_percent'] = (live['price'] - prev_close) / prev_close * 100
+        data['live_price'] = True
+        data['live_price_age_seconds'] = live['age_seconds']
+
+        # Refresh indicators at the live price too, but never fetch history on this path
+        indicators = self.get_live_indicators(data['symbol'], seed=False)
+        if indicators:
+            merged = dict(data.get('technical_indicators') or {})
+            for name in ('rsi', 'macd', 'macd_signal', 'ma_20', 'ma_50', 'ma_200', 'bb_upper', 'bb_middle', 'bb_lower'):
+                if indicators.get(name) is not None:
+                    merged[name] = indicators[name]
+            data['technical_indicators'] = merged
+        return data
+
+    def _throttle(self, provider: str, wait: float = None) -> None:
+        """Take a request token for a provider or raise RateLimitedError.
+
+        Waits at most ``wait`` seconds (defaults to ``rate_limit_wait``); pass 0
+        to fail fast for best-effort calls.
+        """
+        # Don't spend budget on a provider we already know is down
+        breaker = self.circuit_breakers.get(provider)
+        if breaker is not None and breaker.state == CircuitBreaker.OPEN:
+            raise CircuitOpenError(provider, breaker.retry_after())
+        limiter = self.rate_limiters.get(provider)
+        if limiter is None:
+            return
+        wait = self.rate_limit_wait if wait is None else wait
+        if not limiter.acquire(timeout=wait):
+            raise RateLimitedError(provider, limiter.time_until_available())
 
-    @retry_on_failure(max_retries=3, delay=2)
+    def _raise_if_throttled(self, provider: str, response) -> None:
+        """Translate an upstream 429 into RateLimitedError and drain the local bucket"""
+        if response.status_code == 429:
+            limiter = self.rate_limiters.get(provider)
+            if limiter is not None:
+                limiter.drain()
+            retry_after = float(response.headers.get('Retry-After') or 0)
+            raise RateLimitedError(provider, retry_after, f"{provider} returned 429 Too Many Requests")
+
+    def get_circuit_stats(self) -> Dict[str, Dict]:
+        """Circuit breaker state per provider"""
+        return {name: breaker.get_stats() for name, breaker in self.circuit_breakers.items()}
+
+    def get_rate_limit_stats(self) -> Dict[str, Dict]:
+        """Current token-bucket state per provider"""
+        return {name: limiter.get_stats() for name, limiter in self.rate_limiters.items()}
+
+    @retry_on_failure(max_retries=3, delay=0.5)
     def get_alpha_vantage_data(self, symbol: str, interval: str = "1min") -> Dict:
         """Fetch real-time stock data from Alpha Vantage only.
 
@@ -104,10 +545,15 @@ class MarketDataService:
 
         # Check cache first
         cache_key = f"alpha_{symbol}_{interval}"
-        cached = self._get_cached_data(cache_key)
+        cached = self._get_cached_or_stale(cache_key, lambda: self._fetch_alpha_vantage_data(symbol, interval))
         if cached:
             return cached
 
+        return self._fetch_alpha_vantage_data(symbol, interval)
+
+    def _fetch_alpha_vantage_data(self, symbol: str, interval: str = "1min") -> Dict:
+        """Fetch Alpha Vantage quote, indicators and fundamentals, bypassing the cache"""
+        cache_key = f"alpha_{symbol}_{interval}"
         params_quote = {
             'function': 'GLOBAL_QUOTE',
             'symbol': symbol.upper(),
@@ -115,14 +561,18 @@ class MarketDataService:
         }
 
         # Throttle per Alpha Vantage policy
-        self._alpha_rate_limit()
-        resp_q = requests.get(self.alpha_base_url, params=params_quote, timeout=30)
+        self._throttle('alpha_vantage')
+        resp_q = self.http_clients['alpha_vantage'].get(self.alpha_base_url, params=params_quote)
+        self._raise_if_throttled('alpha_vantage', resp_q)
         if resp_q.status_code != 200:
             raise RuntimeError(f"Alpha Vantage error {resp_q.status_code}: {resp_q.text[:200]}")
         quote = resp_q.json().get('Global Quote', {})
         if not quote:
             # Alpha often returns note when throttled
             note = resp_q.json().get('Note') or resp_q.json().get('Information')
+            if note and ('call frequency' in note or 'rate limit' in note.lower()):
+                self.rate_limiters['alpha_vantage'].drain()
+                raise RateLimitedError('alpha_vantage', message=note)
             raise RuntimeError(note or 'No quote data returned')
 
         # Parse quote fields
@@ -153,26 +603,21 @@ class MarketDataService:
                 'outputsize': 'compact',
                 'apikey': self.alpha_vantage_api_key,
             }
-            self._alpha_rate_limit()
-            resp_ts = requests.get(self.alpha_base_url, params=params_ts, timeout=30)
+            # Indicators are best-effort: skip rather than wait for budget
+            self._throttle('alpha_vantage', wait=0)
+            resp_ts = self.http_clients['alpha_vantage'].get(self.alpha_base_url, params=params_ts)
             ts_json = resp_ts.json()
             key = next((k for k in ts_json.keys() if 'Time Series' in k), None)
             if key and isinstance(ts_json.get(key), dict):
-                df = pd.DataFrame(ts_json[key]).T
-                df = df.astype(float)
-                close = df['4. close']
+                # Alpha Vantage lists bars newest first; indicators need oldest first
+                df = pd.DataFrame(ts_json[key]).T.sort_index()
+                close = df['4. close'].astype(float).to_numpy()
+                latest = latest_row(compute_indicators(close))
                 if len(close) >= 14:
-                    delta = close.diff()
-                    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                    rs = gain / loss
-                    indicators['rsi'] = float(100 - (100 / (1 + rs.iloc[-1]))) if loss.iloc[-1] != 0 else 50.0
+                    indicators['rsi'] = latest['rsi'] if latest['rsi'] is not None else 50.0
                 if len(close) >= 26:
-                    ema_12 = close.ewm(span=12).mean()
-                    ema_26 = close.ewm(span=26).mean()
-                    macd = ema_12 - ema_26
-                    indicators['macd'] = float(macd.iloc[-1])
-                    indicators['macd_signal'] = float(macd.ewm(span=9).mean().iloc[-1])
+                    indicators['macd'] = latest['macd']
+                    indicators['macd_signal'] = latest['macd_signal']
         except Exception:
             # Ignore indicator errors
             pass
@@ -190,12 +635,12 @@ class MarketDataService:
                     'symbol': symbol.upper(),
                     'apikey': self.alpha_vantage_api_key,
                 }
-                self._alpha_rate_limit()
-                resp_o = requests.get(self.alpha_base_url, params=params_overview, timeout=30)
+                self._throttle('alpha_vantage', wait=0)
+                resp_o = self.http_clients['alpha_vantage'].get(self.alpha_base_url, params=params_overview)
                 if resp_o.status_code == 200:
                     overview = resp_o.json()
                     # Cache fundamentals for 1 day separately
-                    self.cache[overview_cache_key] = {'data': overview, 'timestamp': time.time() - (self.cache_timeout - 86400)}
+                    self._cache_data(overview_cache_key, overview, ttl=self.profile_cache_timeout)
             if isinstance(overview, dict):
                 market_cap = float(overview.get('MarketCapitalization')) if overview.get('MarketCapitalization') else None
                 pe_ratio = float(overview.get('PERatio')) if overview.get('PERatio') else None
@@ -221,27 +666,15 @@ class MarketDataService:
         self._cache_data(cache_key, data)
         return data
     
-    @retry_on_failure(max_retries=3, delay=2)
-    def get_finnhub_data(self, symbol: str) -> Dict:
-        """Fetch real-time stock data from Finnhub.
-
-        Uses /quote for price fields and /stock/profile2 for fundamentals.
-        """
-        if not self.finnhub_api_key:
-            raise ValueError("FINNHUB_API_KEY not provided")
-
-        # Check cache
-        cache_key = f"finnhub_{symbol}"
-        cached = self._get_cached_data(cache_key)
-        if cached:
-            return cached
-
-        # Quote endpoint
+    def _fetch_finnhub_quote(self, symbol: str) -> Dict:
+        """Fetch and cache price fields from Finnhub /quote (short TTL)"""
         params_quote = {
             'symbol': symbol.upper(),
             'token': self.finnhub_api_key,
         }
-        resp_q = requests.get(f"{self.finnhub_base_url}/quote", params=params_quote, timeout=30)
+        self._throttle('finnhub')
+        resp_q = self.http_clients['finnhub'].get(f"{self.finnhub_base_url}/quote", params=params_quote)
+        self._raise_if_throttled('finnhub', resp_q)
         if resp_q.status_code != 200:
             raise RuntimeError(f"Finnhub error {resp_q.status_code}: {resp_q.text[:200]}")
         q = resp_q.json() or {}
@@ -250,165 +683,259 @@ class MarketDataService:
         change = float(q.get('d') or 0.0)
         change_percent = float(q.get('dp') or 0.0)
         prev_close = float(q.get('pc') or (current_price - change)) if current_price else float(q.get('pc') or 0.0)
-        volume = 0  # Finnhub /quote does not include volume
 
-        # Company profile for fundamentals
-        market_cap = None
-        pe_ratio = None
-        sector = 'Unknown'
+        quote = {
+            'current_price': current_price,
+            'previous_close': prev_close,
+            'change': float(change if change != 0.0 else (current_price - prev_close)),
+            'change_percent': float(change_percent if change_percent != 0.0 else ((current_price - prev_close) / prev_close * 100 if prev_close else 0.0)),
+            'volume': 0,  # Finnhub /quote does not include volume
+            'timestamp': datetime.now().isoformat(),
+        }
+        self._cache_data(f"finnhub_quote_{symbol.upper()}", quote)
+        return quote
+
+    def get_finnhub_profile(self, symbol: str, wait: float = None) -> Dict:
+        """Company fundamentals from Finnhub /stock/profile2, cached for a day.
+
+        Best-effort: returns an empty dict when the profile cannot be fetched.
+        """
+        cache_key = f"finnhub_profile_{symbol.upper()}"
+        cached = self._get_cached_or_stale(cache_key, lambda: self._fetch_finnhub_profile(symbol))
+        if cached is not None:
+            return cached
+        return self._fetch_finnhub_profile(symbol, wait)
+
+    def _fetch_finnhub_profile(self, symbol: str, wait: float = None) -> Dict:
+        """Fetch and cache /stock/profile2, bypassing the cache"""
+        cache_key = f"finnhub_profile_{symbol.upper()}"
         try:
             params_profile = {
                 'symbol': symbol.upper(),
                 'token': self.finnhub_api_key,
             }
-            resp_p = requests.get(f"{self.finnhub_base_url}/stock/profile2", params=params_profile, timeout=30)
-            if resp_p.status_code == 200:
-                prof = resp_p.json() or {}
-                # marketCapitalization in billions according to Finnhub docs
-                if prof.get('marketCapitalization') is not None:
-                    market_cap = float(prof.get('marketCapitalization')) * 1_000_000_000
-                sector = prof.get('finnhubIndustry') or prof.get('industry') or sector
-        except Exception:
-            pass
+            self._throttle('finnhub', wait)
+            resp_p = self.http_clients['finnhub'].get(f"{self.finnhub_base_url}/stock/profile2", params=params_profile)
+            if resp_p.status_code != 200:
+                return {}
+            prof = resp_p.json() or {}
+        except Exception as e:
+            self.logger.warning(f"Finnhub profile unavailable for {symbol}: {e}")
+            return {}
+
+        profile = {'market_cap': None, 'pe_ratio': None, 'sector': 'Unknown'}
+        # marketCapitalization in billions according to Finnhub docs
+        if prof.get('marketCapitalization') is not None:
+            profile['market_cap'] = float(prof.get('marketCapitalization')) * 1_000_000_000
+        profile['sector'] = prof.get('finnhubIndustry') or prof.get('industry') or profile['sector']
+        self._cache_data(cache_key, profile, ttl=self.profile_cache_timeout, max_age=7 * 86400)
+        return profile
+
+    def prefetch_finnhub_profiles(self, symbols: List[str], wait: float = 30.0) -> Dict[str, Dict]:
+        """Warm the profile cache for a list of symbols concurrently"""
+        missing = [s for s in symbols if not self._is_cache_valid(f"finnhub_profile_{s.upper()}")]
+        futures = {s: self.background_executor.submit(self.get_finnhub_profile, s, wait) for s in missing}
+        return {s: future.result() for s, future in futures.items()}
+
+    def _submit_profile_fetch(self, symbol: str):
+        """Future for a request-path profile fetch, or None when every profile worker is busy"""
+        with self._profile_fetch_lock:
+            if self._profile_fetches >= self.profile_fetch_workers:
+                return None
+            self._profile_fetches += 1
+
+        def run():
+            try:
+                return self._fetch_finnhub_profile(symbol)
+            finally:
+                with self._profile_fetch_lock:
+                    self._profile_fetches -= 1
+
+        return self.profile_executor.submit(run)
+
+    @retry_on_failure(max_retries=3, delay=0.5)
+    def get_finnhub_data(self, symbol: str) -> Dict:
+        """Fetch real-time stock data from Finnhub.
+
+        Uses /quote for price fields (short TTL) and /stock/profile2 for
+        fundamentals (cached for a day). On a cold miss both are fetched
+        concurrently, the profile on a dedicated pool (inline when it is
+        saturated); recently expired entries are served with ``stale: True``
+        while they refresh in the background.
+        """
+        if not self.finnhub_api_key:
+            raise ValueError("FINNHUB_API_KEY not provided")
+
+        quote = self._get_cached_or_stale(f"finnhub_quote_{symbol.upper()}", lambda: self._fetch_finnhub_quote(symbol))
+        profile = self._get_cached_or_stale(f"finnhub_profile_{symbol.upper()}", lambda: self._fetch_finnhub_profile(symbol))
+
+        profile_future = None
+        if profile is None:
+            profile_future = self._submit_profile_fetch(symbol)
+        if quote is None:
+            quote = self._fetch_finnhub_quote(symbol)
+        if profile_future is not None:
+            profile = profile_future.result()
+        elif profile is None:
+            # Profile pool saturated: fetch inline rather than queue behind other requests
+            profile = self._fetch_finnhub_profile(symbol)
 
         data = {
             'symbol': symbol.upper(),
-            'current_price': float(current_price),
-            'previous_close': float(prev_close),
-            'change': float(change if change != 0.0 else (current_price - prev_close)),
-            'change_percent': float(change_percent if change_percent != 0.0 else ((current_price - prev_close) / prev_close * 100 if prev_close else 0.0)),
-            'volume': int(volume),
-            'market_cap': market_cap,
-            'pe_ratio': pe_ratio,
-            'sector': sector,
+            **quote,
+            'market_cap': profile.get('market_cap'),
+            'pe_ratio': profile.get('pe_ratio'),
+            'sector': profile.get('sector', 'Unknown'),
             'technical_indicators': {},
-            'timestamp': datetime.now().isoformat(),
             'source': 'finnhub'
         }
-
-        self._cache_data(cache_key, data)
         return data
     
-    @retry_on_failure(max_retries=3, delay=2)
+    @retry_on_failure(max_retries=3, delay=0.5)
     def get_yahoo_finance_data(self, symbol: str, period: str = "1d") -> Dict:
         """Enhanced Yahoo Finance data fetching with better error handling"""
         try:
             # Check cache first
             cache_key = f"yf_{symbol}_{period}"
-            cached_data = self._get_cached_data(cache_key)
+            cached_data = self._get_cached_or_stale(cache_key, lambda: self._fetch_yahoo_finance_data(symbol, period))
             if cached_data:
                 self.logger.info(f"Using cached data for {symbol}")
                 return cached_data
             
-            # Create ticker with session for better reliability
-            session = requests.Session()
-            session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
+            return self._fetch_yahoo_finance_data(symbol, period)
             
-            ticker = yf.Ticker(symbol, session=session)
-            
-            # Get different types of data
+        except Exception as e:
+            self.logger.error(f"Yahoo Finance API error for {symbol}: {e}")
+            raise e
+    
+    def _fetch_yahoo_finance_data(self, symbol: str, period: str = "1d") -> Dict:
+        """Fetch Yahoo Finance quote, history and indicators, bypassing the cache"""
+        cache_key = f"yf_{symbol}_{period}"
+
+        # Reuse the pooled Yahoo session so repeat lookups skip TCP/TLS setup
+        yahoo_client = self.http_clients['yahoo_finance']
+        ticker = yf.Ticker(symbol, session=yahoo_client.session)
+        
+        # Get different types of data
+        try:
+            # Current data
+            yahoo_client.before_request()
+            fetch_start = time.perf_counter()
             try:
-                # Current data
                 info = ticker.info
                 hist = ticker.history(period=period, interval="1m" if period == "1d" else "1d")
-                
-                if hist.empty:
-                    raise ValueError(f"No historical data available for {symbol}")
-                
-                # Calculate technical indicators
-                close = hist['Close']
-                high = hist['High']
-                low = hist['Low']
-                volume = hist['Volume']
-                
-                # Moving averages
-                hist['MA_20'] = close.rolling(window=min(20, len(close))).mean()
-                hist['MA_50'] = close.rolling(window=min(50, len(close))).mean()
-                hist['MA_200'] = close.rolling(window=min(200, len(close))).mean()
-                
-                # RSI calculation
-                if len(close) >= 14:
-                    delta = close.diff()
-                    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                    rs = gain / loss
-                    hist['RSI'] = 100 - (100 / (1 + rs))
-                else:
-                    hist['RSI'] = 50  # Neutral RSI for insufficient data
-                
-                # MACD
-                if len(close) >= 26:
-                    ema_12 = close.ewm(span=12).mean()
-                    ema_26 = close.ewm(span=26).mean()
-                    hist['MACD'] = ema_12 - ema_26
-                    hist['MACD_Signal'] = hist['MACD'].ewm(span=9).mean()
-                    hist['MACD_Histogram'] = hist['MACD'] - hist['MACD_Signal']
-                
-                # Bollinger Bands
-                bb_period = min(20, len(close))
-                bb_std = close.rolling(window=bb_period).std()
-                bb_middle = close.rolling(window=bb_period).mean()
-                hist['BB_Upper'] = bb_middle + (bb_std * 2)
-                hist['BB_Lower'] = bb_middle - (bb_std * 2)
-                hist['BB_Middle'] = bb_middle
-                
-                # Calculate change
-                current_price = close.iloc[-1]
-                prev_price = close.iloc[-2] if len(close) > 1 else current_price
-                change_pct = ((current_price - prev_price) / prev_price * 100) if prev_price != 0 else 0
-                
-                # Volume analysis
-                avg_volume = volume.rolling(window=min(20, len(volume))).mean().iloc[-1]
-                volume_ratio = volume.iloc[-1] / avg_volume if avg_volume > 0 else 1
-                
-                data = {
-                    'symbol': symbol.upper(),
-                    'current_price': float(current_price),
-                    'previous_close': float(prev_price),
-                    'change': float(current_price - prev_price),
-                    'change_percent': float(change_pct),
-                    'volume': int(volume.iloc[-1]) if not pd.isna(volume.iloc[-1]) else 0,
-                    'avg_volume': int(avg_volume) if not pd.isna(avg_volume) else 0,
-                    'volume_ratio': float(volume_ratio),
-                    'market_cap': info.get('marketCap', 0),
-                    'pe_ratio': info.get('trailingPE'),
-                    'sector': info.get('sector', 'Unknown'),
-                    'industry': info.get('industry', 'Unknown'),
-                    'technical_indicators': {
-                        'rsi': float(hist['RSI'].iloc[-1]) if 'RSI' in hist.columns and not pd.isna(hist['RSI'].iloc[-1]) else 50,
-                        'macd': float(hist['MACD'].iloc[-1]) if 'MACD' in hist.columns and not pd.isna(hist['MACD'].iloc[-1]) else 0,
-                        'macd_signal': float(hist['MACD_Signal'].iloc[-1]) if 'MACD_Signal' in hist.columns and not pd.isna(hist['MACD_Signal'].iloc[-1]) else 0,
-                        'ma_20': float(hist['MA_20'].iloc[-1]) if 'MA_20' in hist.columns and not pd.isna(hist['MA_20'].iloc[-1]) else current_price,
-                        'ma_50': float(hist['MA_50'].iloc[-1]) if 'MA_50' in hist.columns and not pd.isna(hist['MA_50'].iloc[-1]) else current_price,
-                        'ma_200': float(hist['MA_200'].iloc[-1]) if 'MA_200' in hist.columns and not pd.isna(hist['MA_200'].iloc[-1]) else current_price,
-                        'bb_upper': float(hist['BB_Upper'].iloc[-1]) if 'BB_Upper' in hist.columns and not pd.isna(hist['BB_Upper'].iloc[-1]) else current_price * 1.02,
-                        'bb_lower': float(hist['BB_Lower'].iloc[-1]) if 'BB_Lower' in hist.columns and not pd.isna(hist['BB_Lower'].iloc[-1]) else current_price * 0.98,
-                        'bb_middle': float(hist['BB_Middle'].iloc[-1]) if 'BB_Middle' in hist.columns and not pd.isna(hist['BB_Middle'].iloc[-1]) else current_price,
-                    },
-                    'historical_data': hist,
-                    'info': info,
-                    'timestamp': datetime.now().isoformat(),
-                    'source': 'yahoo_finance'
-                }
-                
-                # Cache the data
-                self._cache_data(cache_key, data)
-                self.logger.info(f"Successfully fetched Yahoo Finance data for {symbol}")
-                return data
-                
-            except Exception as e:
-                self.logger.error(f"Error processing Yahoo Finance data for {symbol}: {e}")
-                raise e
-                
+            except Exception:
+                yahoo_client.record_request(time.perf_counter() - fetch_start, ok=False)
+                raise
+            yahoo_client.record_request(time.perf_counter() - fetch_start, ok=True)
+            
+            if hist.empty:
+                raise ValueError(f"No historical data available for {symbol}")
+            
+            # Calculate technical indicators (moving-average windows shrink to short histories)
+            close = hist['Close']
+            volume = hist['Volume']
+            series = compute_indicators(close.to_numpy(), volume.to_numpy(), clip_windows=True)
+            indicators = latest_row(series)
+            if len(close) < 26:
+                # Too few bars for a meaningful MACD
+                indicators['macd'] = indicators['macd_signal'] = None
+
+            # Calculate change
+            current_price = close.iloc[-1]
+            prev_price = close.iloc[-2] if len(close) > 1 else current_price
+            change_pct = ((current_price - prev_price) / prev_price * 100) if prev_price != 0 else 0
+
+            # Keep OHLCV history compactly on its own; quotes no longer carry it
+            derived_bytes = sum(values.nbytes for values in series.values())
+            self.history_store.put(symbol, period, hist, extra_bytes=derived_bytes + len(json.dumps(info, default=str)))
+
+            # Volume analysis
+            avg_volume = indicators['avg_volume']
+            volume_ratio = volume.iloc[-1] / avg_volume if avg_volume else 1
+
+            def indicator(name, default):
+                value = indicators.get(name)
+                return value if value is not None else default
+
+            data = {
+                'symbol': symbol.upper(),
+                'current_price': float(current_price),
+                'previous_close': float(prev_price),
+                'change': float(current_price - prev_price),
+                'change_percent': float(change_pct),
+                'volume': int(volume.iloc[-1]) if not pd.isna(volume.iloc[-1]) else 0,
+                'avg_volume': int(avg_volume) if avg_volume is not None else 0,
+                'volume_ratio': float(volume_ratio),
+                'market_cap': info.get('marketCap', 0),
+                'pe_ratio': info.get('trailingPE'),
+                'sector': info.get('sector', 'Unknown'),
+                'industry': info.get('industry', 'Unknown'),
+                'technical_indicators': {
+                    'rsi': indicator('rsi', 50),
+                    'macd': indicator('macd', 0),
+                    'macd_signal': indicator('macd_signal', 0),
+                    'ma_20': indicator('ma_20', float(current_price)),
+                    'ma_50': indicator('ma_50', float(current_price)),
+                    'ma_200': indicator('ma_200', float(current_price)),
+                    'bb_upper': indicator('bb_upper', float(current_price) * 1.02),
+                    'bb_lower': indicator('bb_lower', float(current_price) * 0.98),
+                    'bb_middle': indicator('bb_middle', float(current_price)),
+                },
+                'timestamp': datetime.now().isoformat(),
+                'source': 'yahoo_finance'
+            }
+            
+            # Cache the data
+            self._cache_data(cache_key, data)
+            self.logger.info(f"Successfully fetched Yahoo Finance data for {symbol}")
+            return data
+            
         except Exception as e:
-            self.logger.error(f"Yahoo Finance API error for {symbol}: {e}")
+            self.logger.error(f"Error processing Yahoo Finance data for {symbol}: {e}")
             raise e
     
+    def get_history(self, symbol: str, period: str = "1mo") -> CompactHistory:
+        """Compact OHLCV history for a symbol (``.to_frame()`` for a DataFrame)"""
+        history = self.history_store.get(symbol, period)
+        if history is not None:
+            return history
+
+        yahoo_client = self.http_clients['yahoo_finance']
+        ticker = yf.Ticker(symbol, session=yahoo_client.session)
+        yahoo_client.before_request()
+        fetch_start = time.perf_counter()
+        try:
+            hist = ticker.history(period=period, interval="1m" if period == "1d" else "1d")
+        except Exception:
+            yahoo_client.record_request(time.perf_counter() - fetch_start, ok=False)
+            raise
+        yahoo_client.record_request(time.perf_counter() - fetch_start, ok=True)
+        if hist.empty:
+            raise ValueError(f"No historical data available for {symbol}")
+        return self.history_store.put(symbol, period, hist)
+
+    def get_indicator_panel(self, symbols: List[str], period: str = "3mo") -> IndicatorPanel:
+        """Indicators for many symbols in one vectorized pass over their aligned history"""
+        def load(symbol):
+            try:
+                return self.get_history(symbol, period).to_frame()
+            except Exception as e:
+                self.logger.error(f"No history for {symbol}: {e}")
+                return None
+
+        frames = dict(zip(symbols, self.background_executor.map(load, symbols)))
+        if not any(frame is not None for frame in frames.values()):
+            raise ValueError("No history available for any requested symbol")
+        return IndicatorPanel.from_frames(frames)
+
+    def get_history_memory_report(self) -> Dict:
+        """Bytes held by cached history versus the DataFrames it replaced"""
+        return self.history_store.memory_report()
+
     def get_gemini_market_data(self, symbol: str) -> Dict:
         """Get market data and analysis using Gemini AI"""
-        if not self.gemini_api_key:
+        if not self.gemini_model:
             raise ValueError("Gemini API key not provided")
         
         try:
@@ -455,8 +982,7 @@ class MarketDataService:
             Return only the JSON, no additional text.
             """
             
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = generate_cached(self.gemini_model, 'gemini_market_data', {'symbol': symbol.upper()}, prompt).strip()
             
             # Clean the response to ensure it's valid JSON
             if response_text.startswith('```json'):
@@ -496,21 +1022,129 @@ class MarketDataService:
             self.logger.error(f"Gemini API error for {symbol}: {e}")
             raise e
     
-    def get_market_data_with_fallback(self, symbol: str, period: str = "1d") -> Dict:
-        """Fetch market data using Finnhub as primary source."""
-        self.logger.info(f"Fetching Finnhub data for {symbol}")
-        try:
-            return self.get_finnhub_data(symbol)
-        except Exception as e:
-            self.logger.error(f"Finnhub failed for {symbol}: {e}")
-            # Optional secondary: try Alpha Vantage if configured
+    def _provider_chain(self, symbol: str = None) -> List[Tuple[str, callable]]:
+        """Ordered (provider, fetch function) pairs tried for a quote, best first"""
+        fetchers = {
+            'finnhub': self.get_finnhub_data,
+            'yahoo_finance': self.get_yahoo_finance_data,
+        }
+        # Alpha Vantage only if configured
+        if self.alpha_vantage_api_key:
+            fetchers['alpha_vantage'] = self.get_alpha_vantage_data
+        order = self.router.rank(list(fetchers), symbol)
+        return [(provider, fetchers[provider]) for provider in order]
+
+    def get_routing_stats(self) -> Dict:
+        """Provider statistics and recent routing decisions with their reasons"""
+        return self.router.get_stats()
+
+    def get_market_data_with_fallback(self, symbol: str, period: str = "1d", track_demand: bool = True) -> Dict:
+        """Fetch market data from the best-ranked provider, falling back down the chain."""
+        if track_demand:
+            self._record_demand(symbol)
+        if self.hedging_enabled:
+            return self._overlay_live_price(self._get_hedged_market_data(symbol))
+
+        chain = self._provider_chain(symbol)
+        self.logger.info(f"Fetching {symbol} via {' -> '.join(p for p, _ in chain)}")
+        first_error = None
+        for provider, fetch in chain:
             try:
-                if self.alpha_vantage_api_key:
-                    self.logger.info(f"Falling back to Alpha Vantage for {symbol}")
-                    return self.get_alpha_vantage_data(symbol)
-            except Exception as e2:
-                self.logger.error(f"Alpha Vantage fallback failed for {symbol}: {e2}")
-            return self._get_mock_data(symbol, str(e))
+                return self._overlay_live_price(fetch(symbol))
+            except Exception as e:
+                first_error = first_error or e
+                self.logger.error(f"{provider} failed for {symbol}: {e}")
+        return self._fallback_result(symbol, first_error)
+
+    def _hedge_delay(self, provider: str) -> float:
+        """How long to wait on the primary before hedging: its recent p95, clamped"""
+        client = self.http_clients.get(provider)
+        p95 = client.latency_percentile(95) if client else None
+        delay = self.hedge_max_delay if p95 is None else p95
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, delay))
+
+    def _count_hedge(self, provider: str, counter: str) -> None:
+        with self._hedge_lock:
+            counts = self._hedge_counts.setdefault(provider, {
+                'primary_calls': 0, 'hedges_sent': 0, 'wins': 0, 'cancelled': 0
+            })
+            counts[counter] += 1
+
+    def get_hedging_stats(self) -> Dict:
+        """Per-provider hedge/win counters and the current hedge delay"""
+        with self._hedge_lock:
+            counts = {name: dict(c) for name, c in self._hedge_counts.items()}
+        return {
+            'enabled': self.hedging_enabled,
+            'hedge_delay_ms': {name: round(self._hedge_delay(name) * 1000, 2) for name in self.http_clients},
+            'providers': counts,
+        }
+
+    def _run_cancellable(self, fetch: Callable, symbol: str, event: threading.Event) -> Dict:
+        with cancellation_scope(event):
+            return fetch(symbol)
+
+    def _get_hedged_market_data(self, symbol: str) -> Dict:
+        """Race the primary against a delayed secondary; the first good answer wins.
+
+        The secondary is only asked once the primary has been outstanding for
+        its p95 latency. The loser is cancelled: queued work is dropped and a
+        running call aborts before its next upstream request.
+        """
+        chain = self._provider_chain(symbol)
+        primary, primary_fetch = chain[0]
+        secondary, secondary_fetch = chain[1]
+
+        events = {primary: threading.Event()}
+        futures = {self.hedge_executor.submit(self._run_cancellable, primary_fetch, symbol, events[primary]): primary}
+        self._count_hedge(primary, 'primary_calls')
+
+        done, _ = wait(futures, timeout=self._hedge_delay(primary))
+        if not done:
+            self.logger.info(f"Hedging {symbol}: {primary} is slow, also asking {secondary}")
+            events[secondary] = threading.Event()
+            futures[self.hedge_executor.submit(self._run_cancellable, secondary_fetch, symbol, events[secondary])] = secondary
+            self._count_hedge(secondary, 'hedges_sent')
+
+        first_error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    self.logger.error(f"{provider} failed for {symbol}: {e}")
+                    continue
+                for other in pending:
+                    events[futures[other]].set()
+                    other.cancel()
+                    self._count_hedge(futures[other], 'cancelled')
+                if len(futures) > 1:
+                    self._count_hedge(provider, 'wins')
+                return data
+
+        # Nothing raced successfully; try whatever is left of the chain in order
+        tried = set(futures.values())
+        for provider, fetch in chain:
+            if provider in tried:
+                continue
+            try:
+                return fetch(symbol)
+            except Exception as e:
+                first_error = first_error or e
+                self.logger.error(f"{provider} failed for {symbol}: {e}")
+        return self._fallback_result(symbol, first_error)
+
+    def _fallback_result(self, symbol: str, error: Exception) -> Dict:
+        """Mock data once every provider failed, flagging rate limiting explicitly"""
+        data = self._get_mock_data(symbol, str(error))
+        if isinstance(error, RateLimitedError):
+            data['rate_limited'] = True
+            data['retry_after'] = round(error.retry_after, 1)
+        return data
     
     def _get_mock_data(self, symbol: str, error_msg: str) -> Dict:
         """Generate mock data when all APIs fail"""
@@ -534,39 +1168,51 @@ class MarketDataService:
             'note': 'This is mock data due to API failures'
         }
     
-    def get_multiple_stocks_data(self, symbols: List[str], period: str = "1d") -> Dict[str, Dict]:
-        """Get market data for multiple symbols efficiently"""
+    def get_multiple_stocks_data(self, symbols: List[str], period: str = "1d",
+                                 track_demand: bool = True) -> Dict[str, Dict]:
+        """Get market data for multiple symbols concurrently"""
+        try:
+            return self.async_service.get_multiple_stocks_data_sync(symbols, period, track_demand)
+        except Exception as e:
+            self.logger.error(f"Concurrent fetch failed, falling back to sequential: {e}")
+
         results = {}
-        
         for symbol in symbols:
             try:
-                results[symbol] = self.get_market_data_with_fallback(symbol, period)
+                results[symbol] = self.get_market_data_with_fallback(symbol, period, track_demand)
             except Exception as e:
                 self.logger.error(f"Failed to get data for {symbol}: {e}")
                 results[symbol] = self._get_mock_data(symbol, str(e))
         
         return results
     
-    def get_market_sentiment_analysis(self, symbols: List[str]) -> Dict:
-        """Get AI-powered market sentiment analysis"""
-        if not self.gemini_api_key:
+    def get_market_sentiment_analysis(self, symbols: List[str], context=None) -> Dict:
+        """Get AI-powered market sentiment analysis.
+
+        With a ``RequestDataContext`` the market data already fetched for the
+        request is reused instead of being fetched again.
+        """
+        if not self.gemini_model:
             return {'error': 'Gemini API key required for sentiment analysis'}
         
         try:
             # Get basic data for symbols
-            market_data = self.get_multiple_stocks_data(symbols)
+            market_data = context.get(symbols) if context is not None else self.get_multiple_stocks_data(symbols)
             
-            prompt = f"""
-            As a market analyst, provide a comprehensive market sentiment analysis based on this data:
-            
-            Market Data:
-            {json.dumps({k: {
+            sentiment_inputs = {k: {
                 'symbol': v.get('symbol', k),
                 'current_price': v.get('current_price', 0),
                 'change_percent': v.get('change_percent', 0),
                 'volume': v.get('volume', 0),
                 'sector': v.get('sector', 'Unknown')
-            } for k, v in market_data.items()}, indent=2)}
+            } for k, v in market_data.items()}
+            
+            builder = PromptBuilder('market_sentiment').add_quotes('market_data', sentiment_inputs, min_items=1)
+            prompt = builder.build(lambda sections: f"""
+            As a market analyst, provide a comprehensive market sentiment analysis based on this data:
+            
+            Market Data (one row per symbol):
+            {sections['market_data']}
             
             Provide analysis in JSON format:
             {{
@@ -588,10 +1234,9 @@ class MarketDataService:
             }}
             
             Return only valid JSON.
-            """
+            """)
             
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = generate_cached(self.gemini_model, 'market_sentiment', sentiment_inputs, prompt).strip()
             
             # Clean JSON response
             if response_text.startswith('```json'):
@@ -615,28 +1260,21 @@ class MarketDataService:
     
     def get_stock_recommendations(self, symbol: str, user_profile: Dict = None) -> Dict:
         """Get personalized stock recommendations"""
-        if not self.gemini_api_key:
+        if not self.gemini_model:
             return {'error': 'Gemini API key required for recommendations'}
         
         try:
             # Get stock data
             stock_data = self.get_market_data_with_fallback(symbol)
             
-            profile_str = ""
-            if user_profile:
-                profile_str = f"""
-                User Profile:
-                - Risk Tolerance: {user_profile.get('risk_tolerance', 'medium')}
-                - Investment Horizon: {user_profile.get('investment_horizon', 'medium')}
-                - Trading Style: {user_profile.get('trading_style', 'swing')}
-                - Portfolio Value: ${user_profile.get('portfolio_value', 10000):,.2f}
-                """
+            profile_str = self._profile_prompt(user_profile)
             
-            prompt = f"""
+            builder = PromptBuilder('stock_recommendations').add('stock_data', compact_json(compact_quote(stock_data)), priority=0)
+            prompt = builder.build(lambda sections: f"""
             Provide detailed stock analysis and recommendations for {symbol}:
             
             Stock Data:
-            {json.dumps(stock_data, indent=2, default=str)}
+            {sections['stock_data']}
             
             {profile_str}
             
@@ -662,18 +1300,10 @@ class MarketDataService:
             }}
             
             Return only valid JSON.
-            """
-            
-            response = self.gemini_model.generate_content(prompt)
-            response_text = response.text.strip()
+            """)
             
-            # Clean JSON response
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            recommendations = json.loads(response_text)
+            response_text = generate_cached(self.gemini_model, 'stock_recommendations', {'symbol': symbol, 'stock_data': stock_data, 'user_profile': user_profile}, prompt)
+            recommendations = self._parse_json_response(response_text)
             recommendations['symbol'] = symbol
             recommendations['timestamp'] = datetime.now().isoformat()
             
@@ -689,6 +1319,127 @@ class MarketDataService:
             }
 
 
+    @staticmethod
+    def _profile_prompt(user_profile: Dict = None) -> str:
+        if not user_profile:
+            return ""
+        return f"""
+                User Profile:
+                - Risk Tolerance: {user_profile.get('risk_tolerance', 'medium')}
+                - Investment Horizon: {user_profile.get('investment_horizon', 'medium')}
+                - Trading Style: {user_profile.get('trading_style', 'swing')}
+                - Portfolio Value: ${user_profile.get('portfolio_value', 10000):,.2f}
+                """
+
+    @staticmethod
+    def _parse_json_response(response_text: str):
+        """JSON body of a Gemini reply, with any markdown code fence stripped"""
+        response_text = response_text.strip()
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]
+        elif response_text.startswith('```'):
+            response_text = response_text[3:]
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]
+        return json.loads(response_text)
+
+    def get_batch_recommendations(self, symbols: List[str], user_profile: Dict = None,
+                                  batch_size: int = None) -> Dict[str, Dict]:
+        """Recommendations for many symbols with one Gemini prompt per batch.
+
+        Market data for every symbol is fetched once, concurrently. Symbols
+        are then split into batches of ``batch_size`` and the batches are
+        sent in parallel, so wall time stays close to a single round trip.
+        A symbol the model leaves out comes back as ``hold`` with an error.
+        """
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        if not symbols:
+            return {}
+        if not self.gemini_model:
+            return {s: {'symbol': s, 'error': 'Gemini API key required for recommendations'} for s in symbols}
+
+        market_data = self.get_multiple_stocks_data(symbols)
+        batch_size = max(1, batch_size or self.recommendation_batch_size)
+        batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+        start = time.time()
+        if len(batches) == 1:
+            results = self._recommend_batch(batches[0], market_data, user_profile)
+        else:
+            futures = [self.llm_executor.submit(self._recommend_batch, batch, market_data, user_profile)
+                       for batch in batches]
+            results = {}
+            for future in futures:
+                results.update(future.result())
+        self.logger.info(f"Batch recommendations for {len(symbols)} symbols in {len(batches)} prompt(s) "
+                         f"took {time.time() - start:.2f}s")
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def _recommend_batch(self, symbols: List[str], market_data: Dict[str, Dict], user_profile: Dict = None) -> Dict[str, Dict]:
+        """One Gemini call covering ``symbols``; parsed into a per-symbol dict"""
+        timestamp = datetime.now().isoformat()
+        stock_data = {symbol: market_data.get(symbol, {}) for symbol in symbols}
+        try:
+            builder = PromptBuilder('batch_recommendations').add_quotes('stock_data', stock_data, priority=0)
+            prompt = builder.build(lambda sections: f"""
+            Provide detailed stock analysis and recommendations for each of these stocks: {', '.join(symbols)}
+            
+            Stock Data (one row per symbol):
+            {sections['stock_data']}
+            
+            {self._profile_prompt(user_profile)}
+            
+            Return one JSON object with exactly one entry per symbol, keyed by the symbol:
+            {{
+                "SYMBOL": {{
+                    "recommendation": "strong_buy/buy/hold/sell/strong_sell",
+                    "confidence": 1-10_rating,
+                    "target_price": estimated_target_price,
+                    "stop_loss": suggested_stop_loss_price,
+                    "position_size": "percentage_of_portfolio_to_allocate",
+                    "time_horizon": "days_or_weeks_to_hold",
+                    "analysis": {{
+                        "technical": "technical_analysis_summary",
+                        "fundamental": "fundamental_analysis_summary",
+                        "risk_reward": "risk_reward_assessment"
+                    }},
+                    "pros": ["positive_factor1", "positive_factor2"],
+                    "cons": ["risk_factor1", "risk_factor2"],
+                    "key_levels": {{
+                        "support": price_level,
+                        "resistance": price_level
+                    }}
+                }}
+            }}
+            
+            Return only valid JSON.
+            """)
+
+            response_text = generate_cached(self.gemini_model, 'batch_recommendations',
+                                            {'symbols': symbols, 'stock_data': stock_data, 'user_profile': user_profile},
+                                            prompt)
+            parsed = self._parse_json_response(response_text)
+            if not isinstance(parsed, dict):
+                raise ValueError('batch response is not a JSON object')
+            parsed = {str(key).upper(): value for key, value in parsed.items()}
+        except Exception as e:
+            self.logger.error(f"Error getting batch recommendations for {symbols}: {e}")
+            return {symbol: {'symbol': symbol, 'recommendation': 'hold', 'error': str(e), 'timestamp': timestamp}
+                    for symbol in symbols}
+
+        results = {}
+        for symbol in symbols:
+            recommendation = parsed.get(symbol)
+            if isinstance(recommendation, dict):
+                recommendation['symbol'] = symbol
+                recommendation['timestamp'] = timestamp
+            else:
+                recommendation = {'symbol': symbol, 'recommendation': 'hold',
+                                  'error': 'Missing from batch response', 'timestamp': timestamp}
+            results[symbol] = recommendation
+        return results
+
+
 # Usage example and testing functions
 def test_market_data_service():
     """Test function to verify the service works"""
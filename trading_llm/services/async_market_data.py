@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+
+DEFAULT_PROVIDER_LIMITS = {
+    'finnhub': 8,
+    'alpha_vantage': 1,
+    'yahoo_finance': 4,
+    # Hedged lookups race providers internally, so they get their own bound
+    'hedged': 8,
+}
+
+
+class AsyncMarketDataService:
+    """Asyncio variant of MarketDataService for concurrent multi-symbol fetches.
+
+    Provider calls run on a shared worker pool (the providers are blocking HTTP
+    clients) while asyncio coordinates them, so every symbol in a request is
+    fetched at once instead of one after another. Each provider gets its own
+    concurrency limit so a burst of symbols cannot flood a single upstream.
+
+    The ``*_sync`` methods are a blocking facade for Flask and Streamlit code;
+    they hand work to one background event loop so the provider limits are
+    shared by every calling thread.
+    """
+
+    def __init__(self, service, provider_limits: Optional[Dict[str, int]] = None,
+                 max_workers: Optional[int] = None):
+        self.service = service
+        self.logger = logging.getLogger(__name__)
+        self.provider_limits = dict(DEFAULT_PROVIDER_LIMITS)
+        if provider_limits:
+            self.provider_limits.update(provider_limits)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or sum(self.provider_limits.values()),
+            thread_name_prefix='market-data'
+        )
+        # asyncio primitives belong to one loop, so keep a set per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        per_loop = self._semaphores.setdefault(loop, {})
+        if provider not in per_loop:
+            per_loop[provider] = asyncio.Semaphore(self.provider_limits.get(provider, 4))
+        return per_loop[provider]
+
+    async def call_provider(self, provider: str, func: Callable, *args, **kwargs):
+        """Run a blocking provider call under that provider's concurrency limit"""
+        async with self._semaphore(provider):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_market_data_with_fallback(self, symbol: str, period: str = "1d", track_demand: bool = True) -> Dict:
+        """Walk the provider chain for one symbol, falling back to mock data"""
+        if self.service.hedging_enabled:
+            return await self.call_provider('hedged', self.service.get_market_data_with_fallback, symbol, period,
+                                            track_demand)
+
+        if track_demand:
+            self.service._record_demand(symbol)
+        first_error = None
+        for provider, fetch in self.service._provider_chain(symbol):
+            try:
+                return self.service._overlay_live_price(await self.call_provider(provider, fetch, symbol))
+            except Exception as e:
+                first_error = first_error or e
+                self.logger.error(f"{provider} failed for {symbol}: {e}")
+        return self.service._fallback_result(symbol, first_error)
+
+    async def get_multiple_stocks_data(self, symbols: List[str], period: str = "1d",
+                                       track_demand: bool = True) -> Dict[str, Dict]:
+        """Fetch every symbol concurrently"""
+        async def fetch_one(symbol):
+            try:
+                return await self.get_market_data_with_fallback(symbol, period, track_demand)
+            except Exception as e:
+                self.logger.error(f"Failed to get data for {symbol}: {e}")
+                return self.service._get_mock_data(symbol, str(e))
+
+        results = await asyncio.gather(*(fetch_one(symbol) for symbol in symbols))
+        return dict(zip(symbols, results))
+
+    # Synchronous facade
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name='market-data-loop', daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def run_sync(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the background loop and block for its result"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError("run_sync cannot be called from the market data event loop")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def get_market_data_with_fallback_sync(self, symbol: str, period: str = "1d",
+                                           track_demand: bool = True) -> Dict:
+        return self.run_sync(self.get_market_data_with_fallback(symbol, period, track_demand))
+
+    def get_multiple_stocks_data_sync(self, symbols: List[str], period: str = "1d",
+                                      track_demand: bool = True) -> Dict[str, Dict]:
+        return self.run_sync(self.get_multiple_stocks_data(symbols, period, track_demand))
+
+    def close(self) -> None:
+        """Stop the background loop and worker pool"""
+        with self._loop_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                if self._loop_thread is not None:
+                    self._loop_thread.join(timeout=5)
+                self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from supabase import create_client
+
+from services.llm_cache import generate_cached
+from utils.prompt_builder import estimate_tokens, get_prompt_budget
+
+logger = logging.getLogger(__name__)
+
+# Supabase table holding each chat's summary and unsummarized turns
+CONVERSATIONS_TABLE = 'chat_conversations'
+
+
+def clip(text, max_chars: int) -> str:
+    """Whitespace-collapsed ``text`` cut to ``max_chars``"""
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + '...'
+
+
+class ConversationMemory:
+    """Bounded chat history: a rolling summary plus the last ``recent_turns`` turns.
+
+    Turns are appended in memory as they happen. After each turn a
+    background thread folds whatever is older than the last
+    ``recent_turns`` into the summary with one model call and persists the
+    conversation to the ``chat_conversations`` table, so a prompt carries
+    the summary and a few turns instead of the whole session. ``render``
+    clips long answers and drops the oldest turns until the memory fits its
+    token budget. Conversations not in memory are loaded from Supabase.
+    ``supabase`` must be a service-role client: the table is closed to anon.
+
+    Conversation ids come from clients, so each conversation belongs to the
+    trader it was started for. A caller passing another trader's id gets
+    no memory and its turns are not recorded.
+    """
+
+    def __init__(self, supabase=None, model=None, recent_turns: int = 4, budget: int = None,
+                 turn_chars: int = 600, summary_chars: int = 1500, max_conversations: int = 500):
+        self.supabase = supabase
+        self.model = model
+        self.recent_turns = recent_turns
+        self.budget = budget or get_prompt_budget('conversation_memory')
+        self.turn_chars = turn_chars
+        self.summary_chars = summary_chars
+        self.max_conversations = max_conversations
+        self._conversations: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Conversations with background work running, and ones that got a turn meanwhile
+        self._busy = set()
+        self._dirty = set()
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv('CHAT_SUMMARY_CONCURRENCY', '2')),
+                                            thread_name_prefix='chat-summary')
+        self._stats = {'turns': 0, 'loaded': 0, 'summaries': 0, 'summary_failures': 0,
+                       'summarized_turns': 0, 'persist_failures': 0, 'rejected': 0}
+
+    @classmethod
+    def from_env(cls, model=None, supabase=None) -> 'ConversationMemory':
+        """Memory persisted with the service-role key (SUPABASE_SERVICE_ROLE_KEY).
+
+        chat_conversations has no anon policies, so with the public anon key
+        nothing could be read or written; without a service key the memory
+        lives in this process only.
+        """
+        if supabase is None:
+            url, service_key = os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+            if url and service_key:
+                supabase = create_client(url, service_key)
+            else:
+                logger.warning("SUPABASE_SERVICE_ROLE_KEY not set; chat conversations will not be persisted")
+        return cls(supabase, model,
+                   recent_turns=int(os.getenv('CHAT_MEMORY_TURNS', '4')),
+                   turn_chars=int(os.getenv('CHAT_MEMORY_TURN_CHARS', '600')))
+
+    def _new_conversation(self, trader_id: Optional[str]) -> Dict:
+        return {'trader_id': trader_id, 'summary': '', 'turns': [], 'summarized_turns': 0, 'turn_count': 0}
+
+    def _fetch(self, conversation_id: str) -> Optional[Dict]:
+        if not self.supabase:
+            return None
+        try:
+            response = (self.supabase.table(CONVERSATIONS_TABLE).select('*')
+                        .eq('id', conversation_id).limit(1).execute())
+        except Exception as e:
+            logger.warning(f"Could not load conversation {conversation_id}: {e}")
+            return None
+        if not response.data:
+            return None
+        row = response.data[0]
+        with self._lock:
+            self._stats['loaded'] += 1
+        return {
+            'trader_id': row.get('trader_id'),
+            'summary': row.get('summary') or '',
+            'turns': row.get('recent_turns') or [],
+            'summarized_turns': row.get('summarized_turns') or 0,
+            'turn_count': row.get('turn_count') or 0,
+        }
+
+    def _load(self, conversation_id: str, trader_id: Optional[str]) -> Optional[Dict]:
+        """The conversation, started for ``trader_id`` if new; None if it belongs to another trader"""
+        trader_id = trader_id or None
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is not None:
+                self._conversations.move_to_end(conversation_id)
+        if conversation is None:
+            conversation = self._fetch(conversation_id) or self._new_conversation(trader_id)
+            with self._lock:
+                # Another thread may have loaded it meanwhile; keep the first copy
+                conversation = self._conversations.setdefault(conversation_id, conversation)
+                self._conversations.move_to_end(conversation_id)
+                while len(self._conversations) > self.max_conversations:
+                    oldest = next(iter(self._conversations))
+                    if oldest in self._busy:
+                        break
+                    del self._conversations[oldest]
+        if conversation['trader_id'] != trader_id:
+            with self._lock:
+                self._stats['rejected'] += 1
+            logger.warning(f"Conversation {conversation_id} does not belong to trader {trader_id}; ignoring it")
+            return None
+        return conversation
+
+    def _format_turn(self, turn: Dict) -> str:
+        return (f"User: {clip(turn.get('user'), self.turn_chars // 2)}\n"
+                f"Assistant: {clip(turn.get('assistant'), self.turn_chars)}")
+
+    def render(self, conversation_id: Optional[str], trader_id: str = None) -> Dict:
+        """{'summary': str, 'turns': [str]} for a prompt, within the memory token budget"""
+        conversation = self._load(conversation_id, trader_id) if conversation_id else None
+        if conversation is None:
+            return {'summary': '', 'turns': []}
+        with self._lock:
+            summary = clip(conversation['summary'], self.summary_chars)
+            turns = [self._format_turn(turn) for turn in conversation['turns'][-self.recent_turns:]]
+        while turns and estimate_tokens(summary + '\n'.join(turns)) > self.budget:
+            turns.pop(0)
+        return {'summary': summary, 'turns': turns}
+
+    def add_turn(self, conversation_id: Optional[str], user: str, assistant: str, trader_id: str = None) -> None:
+        """Record a finished turn; summarizing and persisting happen in the background"""
+        if not conversation_id or not assistant:
+            return
+        conversation = self._load(conversation_id, trader_id)
+        if conversation is None:
+            return
+        with self._lock:
+            conversation['turns'].append({'user': user, 'assistant': assistant, 'at': datetime.now().isoformat()})
+            conversation['turn_count'] += 1
+            self._stats['turns'] += 1
+            if conversation_id in self._busy:
+                self._dirty.add(conversation_id)
+                return
+            self._busy.add(conversation_id)
+        self._executor.submit(self._maintain, conversation_id)
+
+    def _maintain(self, conversation_id: str) -> None:
+        """Summarize and persist until no new turn arrived meanwhile (one task per conversation)"""
+        try:
+            while True:
+                self._summarize(conversation_id)
+                self._persist(conversation_id)
+                with self._lock:
+                    if conversation_id not in self._dirty:
+                        return
+                    self._dirty.discard(conversation_id)
+        finally:
+            with self._lock:
+                self._busy.discard(conversation_id)
+                self._dirty.discard(conversation_id)
+
+    def _summarize(self, conversation_id: str) -> None:
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None or len(conversation['turns']) <= self.recent_turns:
+                return
+            summary = conversation['summary']
+            overflow = list(conversation['turns'][:-self.recent_turns])
+
+        turn_lines = '\n'.join(self._format_turn(turn) for turn in overflow)
+        try:
+            if self.model:
+                prompt = f"""
+                Update the running summary of a trading chat between a user and an AI trading advisor.
+
+                Summary so far:
+                {summary or 'none'}
+
+                New turns:
+                {turn_lines}
+
+                Write the updated summary in at most 150 words. Keep the user's goals, holdings and
+                risk preferences mentioned, symbols discussed, and recommendations given. Plain text only.
+                """
+                new_summary = generate_cached(self.model, 'conversation_summary',
+                                              {'summary': summary, 'turns': overflow}, prompt).strip()
+            else:
+                # No model: keep the earlier questions so the thread stays recognizable
+                questions = '; '.join(clip(turn.get('user'), 120) for turn in overflow)
+                new_summary = f"{summary} Earlier questions: {questions}".strip()
+        except Exception as e:
+            with self._lock:
+                self._stats['summary_failures'] += 1
+            logger.warning(f"Conversation {conversation_id} summary failed: {e}")
+            return
+
+        with self._lock:
+            conversation['summary'] = clip(new_summary, self.summary_chars)
+            # Turns added while the model was summarizing stay unsummarized
+            del conversation['turns'][:len(overflow)]
+            conversation['summarized_turns'] += len(overflow)
+            self._stats['summaries'] += 1
+            self._stats['summarized_turns'] += len(overflow)
+
+    def _persist(self, conversation_id: str) -> None:
+        if not self.supabase:
+            return
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return
+            row = {
+                'id': conversation_id,
+                'trader_id': conversation['trader_id'],
+                'summary': conversation['summary'],
+                'recent_turns': list(conversation['turns']),
+                'summarized_turns': conversation['summarized_turns'],
+                'turn_count': conversation['turn_count'],
+            }
+        try:
+            self.supabase.table(CONVERSATIONS_TABLE).upsert(row).execute()
+        except Exception as e:
+            with self._lock:
+                self._stats['persist_failures'] += 1
+            logger.warning(f"Could not persist conversation {conversation_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['conversations'] = len(self._conversations)
+            stats['pending'] = len(self._busy)
+        stats.update({'recent_turns': self.recent_turns, 'budget_tokens': self.budget})
+        return stats
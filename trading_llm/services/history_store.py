@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Price columns kept from a yfinance history frame, in storage order
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close')
+OHLCV_COLUMNS = PRICE_COLUMNS + ('Volume',)
+
+
+class CompactHistory:
+    """OHLCV bars as contiguous float arrays plus a (shared) date index.
+
+    Prices are float32 (7 significant digits is plenty for quotes); volume
+    stays float64 so large share counts remain exact.
+    """
+
+    __slots__ = ('symbol', 'period', 'prices', 'volume', 'index', 'tz', 'source_bytes', '__weakref__')
+
+    def __init__(self, symbol: str, period: str, prices: np.ndarray, volume: np.ndarray, index: np.ndarray,
+                 tz: Optional[str] = None, source_bytes: int = 0):
+        self.symbol = symbol
+        self.period = period
+        self.prices = prices
+        self.volume = volume
+        self.index = index
+        self.tz = tz
+        # What the cached DataFrame (plus derived columns and info) used to cost
+        self.source_bytes = source_bytes
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def column(self, name: str) -> np.ndarray:
+        if name == 'Volume':
+            return self.volume
+        return self.prices[:, PRICE_COLUMNS.index(name)]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column('Close')
+
+    def nbytes(self, include_index: bool = True) -> int:
+        return self.prices.nbytes + self.volume.nbytes + (self.index.nbytes if include_index else 0)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rebuild a DataFrame view (OHLCV only) for callers that want pandas"""
+        index = pd.DatetimeIndex(self.index.view('datetime64[ns]'))
+        index = index.tz_localize('UTC').tz_convert(self.tz) if self.tz else index
+        frame = pd.DataFrame(self.prices.astype(np.float64), index=index, columns=list(PRICE_COLUMNS))
+        frame['Volume'] = self.volume
+        return frame
+
+
+class HistoryStore:
+    """TTL cache of compact per-symbol history.
+
+    Symbols fetched for the same period usually share their trading-day
+    timestamps, so identical date indexes are interned and stored once.
+    Expired entries are dropped when read and swept on writes (at most once
+    per TTL); beyond ``max_entries`` the oldest entries go first.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._last_sweep = time.time()
+        self.evictions = 0
+        self._indexes = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(symbol: str, period: str) -> str:
+        return f"{symbol.upper()}_{period}"
+
+    def _intern_index(self, index: np.ndarray) -> np.ndarray:
+        digest = hashlib.blake2b(index.tobytes(), digest_size=16).hexdigest()
+        with self._lock:
+            shared = self._indexes.get(digest)
+            if shared is None or not np.array_equal(shared, index):
+                index.setflags(write=False)
+                self._indexes[digest] = shared = index
+        return shared
+
+    def put(self, symbol: str, period: str, hist: pd.DataFrame, extra_bytes: int = 0) -> CompactHistory:
+        """Store the OHLCV columns of ``hist`` (derived columns are dropped)"""
+        source_bytes = int(hist.memory_usage(deep=True).sum()) + extra_bytes
+        prices = np.ascontiguousarray(hist.reindex(columns=list(PRICE_COLUMNS)).to_numpy(dtype=np.float32))
+        volume = np.ascontiguousarray(hist.reindex(columns=['Volume']).to_numpy(dtype=np.float64)[:, 0])
+        prices.setflags(write=False)
+        volume.setflags(write=False)
+        dt_index = pd.DatetimeIndex(hist.index)
+        tz = str(dt_index.tz) if dt_index.tz is not None else None
+        if tz:
+            dt_index = dt_index.tz_convert('UTC').tz_localize(None)
+        index = self._intern_index(dt_index.asi8.copy())
+        history = CompactHistory(symbol.upper(), period, prices, volume, index, tz, source_bytes)
+        now = time.time()
+        key = self.key(symbol, period)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (history, now)
+            if now - self._last_sweep >= self.ttl:
+                self._sweep(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return history
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries (caller holds the lock)"""
+        for key in [k for k, (_, stored) in self._entries.items() if now - stored >= self.ttl]:
+            del self._entries[key]
+            self.evictions += 1
+        self._last_sweep = now
+
+    def get(self, symbol: str, period: str) -> Optional[CompactHistory]:
+        """Cached history if still within TTL"""
+        key = self.key(symbol, period)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] >= self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                return None
+        return entry[0]
+
+    def clear(self, symbol: str = None) -> None:
+        """Drop every cached history, or only ``symbol``'s"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            for key in [k for k, (history, _) in self._entries.items() if history.symbol == symbol.upper()]:
+                del self._entries[key]
+
+    def memory_report(self) -> Dict:
+        """Bytes held per cached symbol versus what the DataFrame cache used"""
+        with self._lock:
+            entries = list(self._entries.items())
+        symbols = {}
+        seen_indexes = {}
+        for key, (history, _) in entries:
+            seen_indexes[id(history.index)] = history.index.nbytes
+            symbols[key] = {
+                'rows': len(history),
+                'compact_bytes': history.nbytes(include_index=False),
+                'index_bytes': history.index.nbytes,
+                'dataframe_bytes': history.source_bytes,
+                'reduction': round(history.source_bytes / history.nbytes(), 1) if history.nbytes() else None,
+            }
+        total_compact = sum(s['compact_bytes'] for s in symbols.values()) + sum(seen_indexes.values())
+        total_dataframe = sum(s['dataframe_bytes'] for s in symbols.values())
+        return {
+            'entries': len(symbols),
+            'evictions': self.evictions,
+            'shared_indexes': len(seen_indexes),
+            'total_compact_bytes': total_compact,
+            'total_dataframe_bytes': total_dataframe,
+            'overall_reduction': round(total_dataframe / total_compact, 1) if total_compact else None,
+            'symbols': symbols,
+        }
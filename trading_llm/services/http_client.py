@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class RequestCancelled(RuntimeError):
+    """Raised when the calling thread's request was cancelled (e.g. lost a hedge race)"""
+
+
+_cancel_scope = threading.local()
+
+
+@contextmanager
+def cancellation_scope(event: threading.Event):
+    """Make upstream requests issued by this thread abort once ``event`` is set"""
+    previous = getattr(_cancel_scope, 'event', None)
+    _cancel_scope.event = event
+    try:
+        yield event
+    finally:
+        _cancel_scope.event = previous
+
+
+def check_cancelled() -> None:
+    event = getattr(_cancel_scope, 'event', None)
+    if event is not None and event.is_set():
+        raise RequestCancelled("request cancelled")
+
+
+class ProviderHTTPClient:
+    """Long-lived pooled HTTP client for a single upstream data provider.
+
+    One instance is shared by every thread that talks to the provider, so TCP
+    and TLS setup is paid once per pooled connection instead of once per quote.
+    Connect and read timeouts are tracked separately so a dead host fails fast
+    while a slow-but-alive one still gets time to answer. When a circuit
+    breaker is attached, requests to a provider whose circuit is open raise
+    CircuitOpenError without touching the network.
+    """
+
+    def __init__(self, provider: str, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0, headers: Optional[Dict] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.breaker = breaker
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+        if headers:
+            self.session.headers.update(headers)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._last_latency = 0.0
+        self._recent = deque(maxlen=256)
+        self._histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._ewma_latency = None
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """Issue a GET through the shared pool and record its latency"""
+        kwargs.setdefault('timeout', self.timeout)
+        check_cancelled()
+        self.before_request()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        except Exception:
+            self.record_request(time.perf_counter() - start, ok=False)
+            raise
+        # 5xx means the provider is unhealthy; 4xx (including 429) means it answered
+        self.record_request(time.perf_counter() - start, ok=response.status_code < 500)
+        return response
+
+    def before_request(self) -> None:
+        """Fail fast if the provider's circuit is open"""
+        if self.breaker is not None and not self.breaker.allow_request():
+            raise CircuitOpenError(self.provider, self.breaker.retry_after())
+
+    def record_request(self, elapsed: float, ok: bool = True) -> None:
+        """Record one upstream round trip (also used for calls made by third-party clients)"""
+        if self.breaker is not None:
+            if ok:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+        with self._lock:
+            self._requests += 1
+            if not ok:
+                self._errors += 1
+            self._total_latency += elapsed
+            self._last_latency = elapsed
+            self._max_latency = max(self._max_latency, elapsed)
+            if ok:
+                self._recent.append(elapsed)
+                self._ewma_latency = elapsed if self._ewma_latency is None else 0.8 * self._ewma_latency + 0.2 * elapsed
+            elapsed_ms = elapsed * 1000
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+            self._histogram[bucket] += 1
+
+    def expected_latency(self) -> Optional[float]:
+        """Exponentially weighted recent latency (seconds), None without samples"""
+        with self._lock:
+            return self._ewma_latency
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Percentile (seconds) of recent successful request latencies, None without samples"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def _connections_opened(self) -> int:
+        """Number of TCP connections the pool has had to open so far"""
+        try:
+            pools = self._adapter.poolmanager.pools
+            return sum(pools[key].num_connections for key in list(pools.keys()))
+        except Exception:
+            return 0
+
+    def get_stats(self) -> Dict:
+        """Snapshot of request counts, latency and connection reuse"""
+        with self._lock:
+            requests_made = self._requests
+            stats = {
+                'requests': requests_made,
+                'errors': self._errors,
+                'avg_latency_ms': round(self._total_latency / requests_made * 1000, 2) if requests_made else 0.0,
+                'last_latency_ms': round(self._last_latency * 1000, 2),
+                'max_latency_ms': round(self._max_latency * 1000, 2),
+            }
+        p95 = self.latency_percentile(95)
+        stats['p95_latency_ms'] = round(p95 * 1000, 2) if p95 is not None else None
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+            stats['latency_histogram'] = dict(zip(labels, self._histogram))
+        opened = self._connections_opened()
+        stats['connections_opened'] = opened
+        stats['connection_reuse_ratio'] = round(1 - opened / requests_made, 3) if requests_made and opened <= requests_made else 0.0
+        stats['pool_size'] = self.pool_size
+        stats['connect_timeout'] = self.timeout[0]
+        stats['read_timeout'] = self.timeout[1]
+        return stats
+
+    def close(self) -> None:
+        """Release pooled connections"""
+        self.session.close()
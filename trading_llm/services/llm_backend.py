@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+# Anything with ``generate_content(prompt, stream=False)`` returning an object
+# with ``.text`` (or, with stream=True, an iterator of such chunks) and a
+# ``model_name`` attribute can stand in for ``genai.GenerativeModel``.
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+
+class LocalLLMError(RuntimeError):
+    """Simulated upstream failure from the local stand-in"""
+
+    def __init__(self, status: int):
+        super().__init__(f"Simulated LLM failure ({status})")
+        self.status = status
+
+
+class LocalResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LocalLLM:
+    """Deterministic offline stand-in for a Gemini model.
+
+    Prompts that ask for one of the repo's JSON schemas (sentiment, single and
+    batch recommendations, Gemini market data) get schema-valid JSON; every
+    other prompt gets plain analysis text. Content depends only on ``seed``
+    and the prompt. Latency is a sampled time to first token plus
+    ``ms_per_token`` per output token, and ``failure_rate`` of calls raise
+    ``LocalLLMError``; both come from a seeded generator, so a run with the
+    same seed and call order is reproducible.
+    """
+
+    def __init__(self, latency_ms: float = 800, distribution: str = 'lognormal', sigma: float = 0.5,
+                 ms_per_token: float = 5, failure_rate: float = 0.0, seed: int = 0,
+                 model_name: str = 'local-stub'):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self.ms_per_token = ms_per_token
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.model_name = f'local/{model_name}'
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'streamed': 0, 'latency': 0.0}
+
+    @classmethod
+    def from_env(cls) -> 'LocalLLM':
+        return cls(
+            latency_ms=float(os.getenv('LOCAL_LLM_LATENCY_MS', '800')),
+            distribution=os.getenv('LOCAL_LLM_LATENCY_DIST', 'lognormal'),
+            sigma=float(os.getenv('LOCAL_LLM_LATENCY_SIGMA', '0.5')),
+            ms_per_token=float(os.getenv('LOCAL_LLM_MS_PER_TOKEN', '5')),
+            failure_rate=float(os.getenv('LOCAL_LLM_FAILURE_RATE', '0')),
+            seed=int(os.getenv('LOCAL_LLM_SEED', '0')),
+        )
+
+    def _sample_call(self):
+        """(first-token latency in seconds, failure status or None) for one call"""
+        with self._lock:
+            rng = self._rng
+            if self.distribution == 'fixed':
+                latency = self.latency_ms
+            elif self.distribution == 'uniform':
+                latency = rng.uniform(0.5, 1.5) * self.latency_ms
+            elif self.distribution == 'normal':
+                latency = max(0.0, rng.gauss(self.latency_ms, self.sigma * self.latency_ms))
+            else:
+                latency = self.latency_ms * math.exp(rng.gauss(0.0, self.sigma))
+            failure = rng.choice((429, 500, 503)) if rng.random() < self.failure_rate else None
+            self._stats['calls'] += 1
+            self._stats['failures'] += int(failure is not None)
+        return latency / 1000.0, failure
+
+    def _token_time(self, text: str) -> float:
+        # Same 4-characters-per-token heuristic as the prompt builder
+        return len(text) / 4 * self.ms_per_token / 1000.0
+
+    def generate_content(self, prompt, stream: bool = False, request_options: Dict = None):
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        latency, failure = self._sample_call()
+        text = render_response(prompt, self.seed)
+        # Like the Gemini client, give up with a 504 once the request timeout passes
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and latency > timeout:
+            latency, failure = timeout, 504
+        if stream:
+            return self._stream(text, latency, failure)
+        if not failure and timeout is not None and latency + self._token_time(text) > timeout:
+            time.sleep(timeout)
+            raise LocalLLMError(504)
+        time.sleep(latency + self._token_time(text))
+        if failure:
+            raise LocalLLMError(failure)
+        self._add_latency(latency + self._token_time(text))
+        return LocalResponse(text)
+
+    def _stream(self, text: str, latency: float, failure: Optional[int]) -> Iterator[LocalResponse]:
+        time.sleep(latency)
+        if failure:
+            raise LocalLLMError(failure)
+        with self._lock:
+            self._stats['streamed'] += 1
+        # Roughly word-sized chunks, like a token stream
+        for chunk in re.findall(r'\S+\s*|\s+', text):
+            time.sleep(self._token_time(chunk))
+            yield LocalResponse(chunk)
+        self._add_latency(latency + self._token_time(text))
+
+    def _add_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._stats['latency'] += seconds
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        succeeded = stats['calls'] - stats['failures']
+        return {
+            'backend': 'local',
+            'model': self.model_name,
+            'latency_ms': self.latency_ms,
+            'distribution': self.distribution,
+            'failure_rate': self.failure_rate,
+            'seed': self.seed,
+            'calls': stats['calls'],
+            'failures': stats['failures'],
+            'streamed': stats['streamed'],
+            'avg_latency_ms': round(stats['latency'] / succeeded * 1000, 1) if succeeded else None,
+        }
+
+
+def _prompt_rng(prompt: str, seed: int) -> random.Random:
+    digest = hashlib.sha256(f'{seed}:{prompt}'.encode('utf-8')).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _quote_prices(prompt: str) -> Dict[str, float]:
+    """Current prices from a prompt's quote table (or compact JSON quote)"""
+    prices = {}
+    lines = prompt.splitlines()
+    for i, line in enumerate(lines):
+        header = line.strip().split('|')
+        if header[0] != 'symbol' or 'current_price' not in header:
+            continue
+        column = header.index('current_price')
+        for row in lines[i + 1:]:
+            cells = row.strip().split('|')
+            if len(cells) != len(header):
+                break
+            try:
+                prices[cells[0]] = float(cells[column])
+            except ValueError:
+                continue
+    match = re.search(r'"symbol":\s*"([^"]+)".*?"current_price":\s*([\d.]+)', prompt, re.S)
+    if match:
+        prices.setdefault(match.group(1), float(match.group(2)))
+    return prices
+
+
+def _recommendation(rng: random.Random, price: float) -> Dict:
+    action = rng.choice(('strong_buy', 'buy', 'hold', 'hold', 'sell', 'strong_sell'))
+    direction = {'strong_buy': 1, 'buy': 1, 'hold': 0, 'sell': -1, 'strong_sell': -1}[action]
+    move = rng.uniform(0.03, 0.15)
+    return {
+        'recommendation': action,
+        'confidence': rng.randint(4, 9),
+        'target_price': round(price * (1 + direction * move if direction else 1 + rng.uniform(-0.02, 0.02)), 2),
+        'stop_loss': round(price * (1 - rng.uniform(0.04, 0.1)), 2),
+        'position_size': f"{rng.choice((2, 3, 5, 8, 10))}%",
+        'time_horizon': rng.choice(('1-2 weeks', '2-4 weeks', '1-3 months')),
+        'analysis': {
+            'technical': rng.choice(('Price holding above the 50-day average', 'RSI in neutral territory',
+                                     'MACD crossing below its signal line')),
+            'fundamental': rng.choice(('Valuation in line with sector peers', 'Earnings growth ahead of estimates')),
+            'risk_reward': f"{rng.uniform(1.2, 3.0):.1f}:1",
+        },
+        'pros': ['Strong liquidity', 'Positive momentum'][:rng.randint(1, 2)],
+        'cons': ['Elevated volatility', 'Sector headwinds'][:rng.randint(1, 2)],
+        'key_levels': {'support': round(price * 0.95, 2), 'resistance': round(price * 1.05, 2)},
+    }
+
+
+def _sentiment(rng: random.Random, symbols: List[str]) -> Dict:
+    return {
+        'overall_sentiment': rng.choice(('bullish', 'bearish', 'neutral')),
+        'market_strength': rng.randint(3, 8),
+        'key_trends': ['Rotation into large caps', 'Rates-sensitive names lagging', 'Volume below average'],
+        'sector_analysis': {'strongest_sectors': ['Technology', 'Energy'], 'weakest_sectors': ['Utilities', 'Real Estate']},
+        'trading_recommendations': {
+            'short_term': 'Trade ranges and keep stops tight',
+            'medium_term': 'Add to quality names on pullbacks',
+            'risk_factors': ['Macro data surprises', 'Earnings guidance'],
+        },
+        'individual_stock_signals': {symbol: rng.choice(('buy', 'sell', 'hold')) for symbol in symbols},
+    }
+
+
+def _market_data(rng: random.Random, symbol: str) -> Dict:
+    price = round(rng.uniform(20, 600), 2)
+    return {
+        'symbol': symbol,
+        'current_price': price,
+        'change_percent': round(rng.uniform(-3, 3), 2),
+        'volume': rng.randint(1_000_000, 80_000_000),
+        'market_cap': rng.randint(10, 3000) * 1_000_000_000,
+        'sector': rng.choice(('Technology', 'Healthcare', 'Financials', 'Energy')),
+        'pe_ratio': round(rng.uniform(8, 60), 1),
+        'technical_analysis': {
+            'trend': rng.choice(('bullish', 'bearish', 'neutral')),
+            'support_level': round(price * 0.95, 2),
+            'resistance_level': round(price * 1.05, 2),
+            'rsi_estimate': round(rng.uniform(25, 75), 1),
+            'recommendation': rng.choice(('buy', 'sell', 'hold')),
+        },
+        'fundamental_analysis': {
+            'business_summary': f'{symbol} is a listed company (local stand-in data).',
+            'key_metrics': ['Revenue growth', 'Operating margin', 'Free cash flow'],
+            'recent_news_sentiment': rng.choice(('positive', 'negative', 'neutral')),
+        },
+        'ai_insights': {
+            'price_target': round(price * rng.uniform(0.9, 1.2), 2),
+            'risk_level': rng.choice(('low', 'medium', 'high')),
+            'investment_horizon': rng.choice(('short', 'medium', 'long')),
+            'key_catalysts': ['Earnings', 'Product cycle'],
+            'risk_factors': ['Competition', 'Macro slowdown'],
+        },
+    }
+
+
+_TEXT_SENTENCES = (
+    "Momentum remains constructive while price holds above the 20-day average.",
+    "RSI sits in neutral territory, leaving room for a move in either direction.",
+    "Volume is running below its 20-day average, so breakouts need confirmation.",
+    "Position sizes should reflect the current volatility; keep single names under 10% of the portfolio.",
+    "A close below support would invalidate the bullish case and calls for a tighter stop.",
+    "Sector exposure is concentrated; adding defensive names would lower portfolio risk.",
+    "Short-term traders can work the range between support and resistance.",
+    "Longer-term investors can scale in on pullbacks rather than chase strength.",
+)
+
+
+def _text(rng: random.Random, prompt: str) -> str:
+    symbols = list(dict.fromkeys(re.findall(r'^\s*([A-Z^][A-Z.^-]{0,9})\|', prompt, re.M)))[:5]
+    lead = f"Analysis for {', '.join(symbols)}." if symbols else "Analysis."
+    sentences = [rng.choice(_TEXT_SENTENCES) for _ in range(rng.randint(5, 9))]
+    return ' '.join([lead] + sentences)
+
+
+def render_response(prompt: str, seed: int = 0) -> str:
+    """Deterministic reply to ``prompt``: schema-valid JSON where a known schema is asked for, text otherwise"""
+    rng = _prompt_rng(prompt, seed)
+    prices = _quote_prices(prompt)
+    if 'individual_stock_signals' in prompt:
+        symbols = re.findall(r'"([^"]+)":\s*"buy/sell/hold"', prompt)
+        return json.dumps(_sentiment(rng, symbols))
+    if 'exactly one entry per symbol' in prompt:
+        match = re.search(r'each of these stocks: ([^\n]+)', prompt)
+        symbols = [s.strip() for s in match.group(1).split(',')] if match else []
+        return json.dumps({s: _recommendation(rng, prices.get(s) or rng.uniform(20, 600)) for s in symbols})
+    if '"recommendation": "strong_buy/buy/hold/sell/strong_sell"' in prompt:
+        match = re.search(r'recommendations for ([^\s:]+):', prompt)
+        symbol = match.group(1) if match else None
+        return json.dumps(_recommendation(rng, prices.get(symbol) or rng.uniform(20, 600)))
+    if '"technical_analysis"' in prompt and '"fundamental_analysis"' in prompt:
+        match = re.search(r'"symbol":\s*"([^"]+)"', prompt)
+        return json.dumps(_market_data(rng, match.group(1) if match else 'UNKNOWN'))
+    return _text(rng, prompt)
+
+
+def create_llm_model(api_key: str = None, model_name: str = 'gemini-1.5-flash'):
+    """LLM model for the configured backend (LLM_BACKEND=gemini|local); None if Gemini has no key"""
+    backend = os.getenv('LLM_BACKEND', 'gemini').lower()
+    if backend == 'local':
+        model = LocalLLM.from_env()
+        logger.info(f"Using local LLM stand-in ({model.distribution} latency ~{model.latency_ms:.0f}ms, "
+                    f"failure rate {model.failure_rate})")
+        return model
+    if backend != 'gemini':
+        raise ValueError(f"Unknown LLM_BACKEND {backend!r}, expected 'gemini' or 'local'")
+    if not api_key:
+        return None
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def get_backend_stats(model) -> Dict:
+    """Backend description for health endpoints"""
+    if model is None:
+        return {'backend': 'none'}
+    if hasattr(model, 'get_stats'):
+        return model.get_stats()
+    return {'backend': 'gemini', 'model': getattr(model, 'model_name', None)}
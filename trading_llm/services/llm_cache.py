@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from services.llm_dispatcher import get_dispatcher, template_priority
+
+logger = logging.getLogger(__name__)
+
+# Fields that change on every fetch without changing what the model should say
+VOLATILE_KEYS = frozenset({
+    'timestamp', 'analysis_timestamp', 'age_seconds', 'stale', 'live_price', 'live_price_age_seconds',
+    'retry_after', 'cached_at', 'last_updated',
+})
+
+
+# Numbers under these keys are prices (or moves in price) and are bucketed;
+# every other number (quantities, P&L, RSI, counts) is keyed exactly
+PRICE_KEYS = frozenset({
+    'price', 'current_price', 'current_market_price', 'previous_close', 'open', 'high', 'low', 'close',
+    'avg_price', 'entry_price', 'change', 'change_percent', 'market_change_percent',
+    'upper', 'middle', 'lower',
+})
+PRICE_KEY_PREFIXES = ('ma_', 'bb_', 'ema_')
+
+
+def is_price_key(key) -> bool:
+    key = str(key)
+    return key in PRICE_KEYS or key.endswith('_price') or key.startswith(PRICE_KEY_PREFIXES)
+
+
+def _bucket_number(value: float, tolerance: float) -> float:
+    """Snap a number onto a relative grid so values within ``tolerance`` share a key"""
+    if value == 0 or math.isnan(value) or math.isinf(value):
+        return 0.0 if value == 0 else value
+    if abs(value) < 1:
+        # Percent changes and ratios: an absolute grid keeps tiny moves together
+        return round(round(value / (tolerance * 10)) * tolerance * 10, 6)
+    step = math.log1p(tolerance)
+    return math.copysign(round(math.exp(round(math.log(abs(value)) / step) * step), 6), value)
+
+
+def normalize_inputs(value, tolerance: float = 0.005, bucket: bool = False):
+    """Canonical form of prompt inputs: volatile keys dropped, prices bucketed, strings trimmed"""
+    if isinstance(value, dict):
+        return {str(k): normalize_inputs(v, tolerance, is_price_key(k))
+                for k, v in sorted(value.items(), key=lambda kv: str(kv[0])) if str(k) not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_inputs(v, tolerance, bucket) for v in value]
+        return sorted(items, key=str) if isinstance(value, set) else items
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return _bucket_number(float(value), tolerance) if bucket else value
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return normalize_inputs(value.item(), tolerance, bucket)
+    return ' '.join(str(value).split())
+
+
+def model_name(model) -> str:
+    return getattr(model, 'model_name', None) or type(model).__name__
+
+
+class LLMResponseCache:
+    """TTL + LRU cache for LLM responses with an optional sqlite disk tier.
+
+    Keys hash the prompt template id, the normalized inputs (price fields
+    bucketed to ``price_tolerance``, other numbers exact) and the model name, so two requests over the same
+    quotes within the TTL share one generation.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 512, disk_path: str = None,
+                 price_tolerance: float = 0.005):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.price_tolerance = price_tolerance
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                       'evictions': 0, 'generation_time': 0.0, 'time_saved': 0.0}
+        if disk_path:
+            self._init_disk()
+
+    def _init_disk(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS llm_cache '
+                             '(key TEXT PRIMARY KEY, response TEXT, created REAL, ttl REAL, generation_time REAL)')
+        except Exception as e:
+            logger.error(f"LLM cache disk tier disabled ({self.disk_path}): {e}")
+            self.disk_path = None
+
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=5)
+
+    def make_key(self, template_id: str, inputs, model: str) -> str:
+        payload = json.dumps({'template': template_id, 'model': model,
+                              'inputs': normalize_inputs(inputs, self.price_tolerance)},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry['created'] < entry['ttl']:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    self._stats['time_saved'] += entry['generation_time']
+                    return entry['response']
+                del self._memory[key]
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._stats['time_saved'] += entry['generation_time']
+            self._memory_put(key, entry)
+        return entry['response']
+
+    def put(self, key: str, response: str, generation_time: float = 0.0, ttl: float = None) -> None:
+        entry = {'response': response, 'created': time.time(), 'ttl': ttl or self.ttl,
+                 'generation_time': generation_time}
+        with self._lock:
+            self._memory_put(key, entry)
+            self._stats['stores'] += 1
+        self._disk_put(key, entry)
+
+    def _memory_put(self, key: str, entry: Dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Dict]:
+        if not self.disk_path:
+            return None
+        try:
+            with self._disk_lock, self._connect() as conn:
+                row = conn.execute('SELECT response, created, ttl, generation_time FROM llm_cache WHERE key = ?',
+                                   (key,)).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] >= row[2]:
+                    conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                    return None
+            return {'response': row[0], 'created': row[1], 'ttl': row[2], 'generation_time': row[3] or 0.0}
+        except Exception as e:
+            logger.warning(f"LLM cache disk read failed: {e}")
+            return None
+
+    def _disk_put(self, key: str, entry: Dict) -> None:
+        if not self.disk_path:
+            return
+        try:
+            with self._disk_lock, self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)',
+                             (key, entry['response'], entry['created'], entry['ttl'], entry['generation_time']))
+                # Keep the disk tier bounded too: drop expired rows
+                conn.execute('DELETE FROM llm_cache WHERE created + ttl < ?', (time.time(),))
+        except Exception as e:
+            logger.warning(f"LLM cache disk write failed: {e}")
+
+    def get_or_generate(self, template_id: str, inputs, model: str, generate: Callable[[], str],
+                        ttl: float = None) -> str:
+        """Cached response for (template, inputs, model), generating it on a miss.
+
+        Exceptions from ``generate`` propagate and nothing is cached.
+        """
+        key = self.make_key(template_id, inputs, model)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        response = generate()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats['generation_time'] += elapsed
+        if response:
+            self.put(key, response, elapsed, ttl)
+        return response
+
+    def stream_or_generate(self, template_id: str, inputs, model: str, stream: Callable[[], Iterable[str]],
+                           ttl: float = None) -> Iterator[str]:
+        """Like ``get_or_generate`` but yields text chunks as ``stream()`` produces them.
+
+        A cached response is yielded as a single chunk. A fresh one is cached
+        only if the stream ran to completion, so a client that disconnects
+        midway leaves nothing partial behind.
+        """
+        key = self.make_key(template_id, inputs, model)
+        cached = self.get(key)
+        if cached is not None:
+            yield cached
+            return
+        start = time.perf_counter()
+        chunks = []
+        for chunk in stream():
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats['generation_time'] += elapsed
+        response = ''.join(chunks)
+        if response:
+            self.put(key, response, elapsed, ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path:
+            try:
+                with self._disk_lock, self._connect() as conn:
+                    conn.execute('DELETE FROM llm_cache')
+            except Exception as e:
+                logger.warning(f"LLM cache disk clear failed: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._memory)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'disk_tier': self.disk_path,
+            'memory_hits': stats['memory_hits'],
+            'disk_hits': stats['disk_hits'],
+            'misses': stats['misses'],
+            'hit_rate': round(hits / lookups, 3) if lookups else None,
+            'evictions': stats['evictions'],
+            'avg_generation_ms': round(stats['generation_time'] / stats['stores'] * 1000, 1) if stats['stores'] else None,
+            'time_saved_s': round(stats['time_saved'], 2),
+        }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide LLM response cache configured from the environment"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache(
+                ttl=float(os.getenv('LLM_CACHE_TTL', '300')),
+                max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512')),
+                disk_path=os.getenv('LLM_CACHE_PATH') or None,
+                price_tolerance=float(os.getenv('LLM_CACHE_PRICE_TOLERANCE', '0.005')),
+            )
+        return _llm_cache
+
+
+def _call_options(remaining: float) -> Dict:
+    # Whatever is left of the deadline after queueing bounds the call itself
+    return {'request_options': {'timeout': max(1.0, remaining)}}
+
+
+def generate_cached(model, template_id: str, inputs, prompt: str, ttl: float = None,
+                    priority: str = None, deadline: float = None) -> str:
+    """``model.generate_content(prompt).text`` through the shared response cache.
+
+    Cache misses go through the LLM dispatcher at ``priority`` (by default
+    the template's class); hits never wait for a slot.
+    """
+    priority = priority or template_priority(template_id)
+
+    def generate():
+        with get_dispatcher().slot(priority, deadline) as remaining:
+            return model.generate_content(prompt, **_call_options(remaining)).text
+
+    return get_llm_cache().get_or_generate(template_id, inputs, model_name(model), generate, ttl=ttl)
+
+
+def stream_text(model, prompt: str, priority: str = 'standard', deadline: float = None) -> Iterator[str]:
+    """Text chunks of a streamed generation; the dispatcher slot is held until the stream ends"""
+    with get_dispatcher().slot(priority, deadline) as remaining:
+        for chunk in model.generate_content(prompt, stream=True, **_call_options(remaining)):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish-reason chunk)
+                continue
+            if text:
+                yield text
+
+
+def stream_cached(model, template_id: str, inputs, prompt: str, ttl: float = None,
+                  priority: str = None, deadline: float = None) -> Iterator[str]:
+    """Streaming ``generate_cached``: text chunks as Gemini produces them, sharing its cache entries"""
+    priority = priority or template_priority(template_id)
+    return get_llm_cache().stream_or_generate(template_id, inputs, model_name(model),
+                                              lambda: stream_text(model, prompt, priority, deadline), ttl=ttl)
@@ -0,0 +1,234 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Served strictly in this order when slots free up
+PRIORITIES = ('interactive', 'standard', 'batch')
+
+# Prompt templates that are not 'standard'; chat and per-user answers jump
+# the queue, bulk analysis waits behind everything else
+TEMPLATE_PRIORITIES = {
+    'chat_market': 'interactive',
+    'chat_general': 'interactive',
+    'personalized_recommendations': 'interactive',
+    'earnings_calendar': 'batch',
+    'backtest_analysis': 'batch',
+    'batch_recommendations': 'batch',
+    'conversation_summary': 'batch',
+}
+
+# Seconds a call may spend queued plus running, per class
+DEFAULT_DEADLINES = {'interactive': 20.0, 'standard': 45.0, 'batch': 120.0}
+
+
+def template_priority(template_id: str) -> str:
+    return TEMPLATE_PRIORITIES.get(template_id, 'standard')
+
+
+class LLMOverloadedError(RuntimeError):
+    """Raised straight away when a priority class's queue is full"""
+
+    def __init__(self, priority: str, queued: int, retry_after: float = 1.0):
+        self.priority = priority
+        self.queued = queued
+        self.retry_after = retry_after
+        super().__init__(f"LLM dispatcher overloaded: {queued} {priority} calls already queued")
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a call could not get a slot before its deadline"""
+
+    def __init__(self, priority: str, waited: float):
+        self.priority = priority
+        self.waited = waited
+        super().__init__(f"No LLM slot for {priority} call within {waited:.1f}s")
+
+
+class _Waiter:
+    __slots__ = ('priority', 'event', 'granted')
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+
+
+class LLMDispatcher:
+    """Admission control for outbound LLM calls.
+
+    At most ``max_concurrency`` calls run at once; callers beyond that wait
+    in a priority queue (interactive, then standard, then batch, FIFO within
+    a class). ``reserved_interactive`` slots are only ever given to
+    interactive calls, so a burst of batch analysis cannot starve the chat.
+    Each class has a bounded queue: when it is full the call is rejected
+    with ``LLMOverloadedError`` instead of piling up threads, and a queued
+    call that reaches its deadline gives up with ``LLMDeadlineExceeded``.
+    Calls run in the caller's thread; the dispatcher only hands out slots.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32, reserved_interactive: int = 1,
+                 deadlines: Dict[str, float] = None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = min(max(0, reserved_interactive), max_concurrency - 1)
+        # Batch work gets half the queue so it sheds load first
+        self.queue_limits = {'interactive': max_queue, 'standard': max_queue, 'batch': max(1, max_queue // 2)}
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self._lock = threading.Lock()
+        self._heap: List = []
+        self._seq = itertools.count()
+        self._active = {p: 0 for p in PRIORITIES}
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._stats = {p: {'admitted': 0, 'rejected': 0, 'timed_out': 0, 'completed': 0, 'failed': 0,
+                           'wait_time': 0.0, 'max_wait': 0.0, 'run_time': 0.0, 'max_queued': 0}
+                       for p in PRIORITIES}
+
+    @classmethod
+    def from_env(cls) -> 'LLMDispatcher':
+        return cls(
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '4')),
+            max_queue=int(os.getenv('LLM_MAX_QUEUE', '32')),
+            reserved_interactive=int(os.getenv('LLM_RESERVED_INTERACTIVE', '1')),
+            deadlines={p: float(os.getenv(f'LLM_DEADLINE_{p.upper()}', DEFAULT_DEADLINES[p])) for p in PRIORITIES},
+        )
+
+    def _can_start(self, priority: str) -> bool:
+        running = sum(self._active.values())
+        if running >= self.max_concurrency:
+            return False
+        if priority == 'interactive':
+            return True
+        return running - self._active['interactive'] < self.max_concurrency - self.reserved_interactive
+
+    def _start(self, priority: str, waited: float) -> None:
+        self._active[priority] += 1
+        stats = self._stats[priority]
+        stats['admitted'] += 1
+        stats['wait_time'] += waited
+        stats['max_wait'] = max(stats['max_wait'], waited)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the head of the queue (caller holds the lock)"""
+        while self._heap:
+            rank, _, enqueued, waiter = self._heap[0]
+            if not self._can_start(waiter.priority):
+                # Everything behind the head ranks the same or lower, so it cannot start either
+                break
+            heapq.heappop(self._heap)
+            self._queued[waiter.priority] -= 1
+            self._start(waiter.priority, time.monotonic() - enqueued)
+            waiter.granted = True
+            waiter.event.set()
+
+    def acquire(self, priority: str = 'standard', timeout: float = None) -> None:
+        """Block until a slot is free, at most ``timeout`` seconds (the class deadline by default)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority {priority!r}, expected one of {PRIORITIES}")
+        timeout = self.deadlines[priority] if timeout is None else timeout
+        enqueued = time.monotonic()
+        with self._lock:
+            # Only start ahead of the queue when nobody of equal or higher rank is waiting
+            rank = PRIORITIES.index(priority)
+            if self._can_start(priority) and not any(entry[0] <= rank for entry in self._heap):
+                self._start(priority, 0.0)
+                return
+            queued = self._queued[priority]
+            if queued >= self.queue_limits[priority]:
+                self._stats[priority]['rejected'] += 1
+                raise LLMOverloadedError(priority, queued)
+            waiter = _Waiter(priority)
+            heapq.heappush(self._heap, (rank, next(self._seq), enqueued, waiter))
+            self._queued[priority] += 1
+            self._stats[priority]['max_queued'] = max(self._stats[priority]['max_queued'], queued + 1)
+
+        waiter.event.wait(max(0.0, timeout))
+        with self._lock:
+            if waiter.granted:
+                return
+            self._heap = [entry for entry in self._heap if entry[3] is not waiter]
+            heapq.heapify(self._heap)
+            self._queued[priority] -= 1
+            self._stats[priority]['timed_out'] += 1
+        waited = time.monotonic() - enqueued
+        logger.warning(f"LLM {priority} call gave up after {waited:.1f}s in queue")
+        raise LLMDeadlineExceeded(priority, waited)
+
+    def release(self, priority: str, run_time: float = 0.0, failed: bool = False) -> None:
+        with self._lock:
+            self._active[priority] -= 1
+            stats = self._stats[priority]
+            stats['failed' if failed else 'completed'] += 1
+            stats['run_time'] += run_time
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = 'standard', deadline: float = None) -> Iterator[float]:
+        """Hold a slot for the body; yields the seconds left of ``deadline`` for the call itself"""
+        deadline = self.deadlines.get(priority, DEFAULT_DEADLINES['standard']) if deadline is None else deadline
+        start = time.monotonic()
+        self.acquire(priority, deadline)
+        admitted = time.monotonic()
+        failed = True
+        try:
+            yield max(0.0, start + deadline - admitted)
+            failed = False
+        finally:
+            self.release(priority, time.monotonic() - admitted, failed)
+
+    def run(self, fn: Callable, priority: str = 'standard', deadline: float = None):
+        """``fn(remaining_seconds)`` inside a slot"""
+        with self.slot(priority, deadline) as remaining:
+            return fn(remaining)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            active = dict(self._active)
+            queued = dict(self._queued)
+            stats = {p: dict(s) for p, s in self._stats.items()}
+        classes = {}
+        for priority in PRIORITIES:
+            s = stats[priority]
+            finished = s['completed'] + s['failed']
+            classes[priority] = {
+                'active': active[priority],
+                'queued': queued[priority],
+                'queue_limit': self.queue_limits[priority],
+                'max_queued': s['max_queued'],
+                'admitted': s['admitted'],
+                'completed': s['completed'],
+                'failed': s['failed'],
+                'rejected': s['rejected'],
+                'timed_out': s['timed_out'],
+                'deadline_s': self.deadlines[priority],
+                'avg_wait_ms': round(s['wait_time'] / s['admitted'] * 1000, 1) if s['admitted'] else None,
+                'max_wait_ms': round(s['max_wait'] * 1000, 1),
+                'avg_run_ms': round(s['run_time'] / finished * 1000, 1) if finished else None,
+            }
+        return {
+            'max_concurrency': self.max_concurrency,
+            'reserved_interactive': self.reserved_interactive,
+            'active': sum(active.values()),
+            'queue_depth': sum(queued.values()),
+            'classes': classes,
+        }
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> LLMDispatcher:
+    """Process-wide LLM dispatcher configured from the environment"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = LLMDispatcher.from_env()
+        return _dispatcher
@@ -0,0 +1,267 @@
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dtime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo(os.getenv('MARKET_TIMEZONE', 'America/New_York'))
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+# Header a privileged caller sends (matching BRIEF_REFRESH_TOKEN) to force a regeneration
+REFRESH_TOKEN_HEADER = 'X-Brief-Refresh-Token'
+
+
+def is_market_hours(now: datetime = None) -> bool:
+    """Regular US equity session, weekdays 9:30-16:00 exchange time (holidays not excluded)"""
+    now = now.astimezone(MARKET_TZ) if now else datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def refresh_authorized(token: Optional[str]) -> bool:
+    """True when ``token`` matches BRIEF_REFRESH_TOKEN; refresh is disabled while it is unset"""
+    expected = os.getenv('BRIEF_REFRESH_TOKEN')
+    return bool(expected and token) and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+
+def _brief_key(name: str, params: Dict) -> Tuple[str, str]:
+    return name, json.dumps(params, sort_keys=True, default=str)
+
+
+class MarketBriefScheduler:
+    """Market-wide briefs (sentiment, earnings, news) generated once and served to every user.
+
+    Each brief is a registered generator called with keyword params; its
+    result is stored per (name, params) with the time it was generated. A
+    background thread regenerates stored briefs every ``market_interval``
+    seconds during market hours and every ``off_hours_interval`` otherwise,
+    keeps the registered default params generated, and drops briefs nobody
+    has read for ``idle_ttl``. Readers always get the stored copy; only a
+    missing brief (or a due one while the scheduler is not running) is
+    generated on demand, once for all concurrent readers. A failed
+    regeneration keeps serving the previous copy.
+    """
+
+    def __init__(self, market_interval: float = 900, off_hours_interval: float = 3600, tick: float = 30,
+                 idle_ttl: float = 6 * 3600, max_entries: int = 64):
+        self.market_interval = market_interval
+        self.off_hours_interval = off_hours_interval
+        self.tick = tick
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._generators: Dict[str, Callable[..., Dict]] = {}
+        self._defaults: Dict[str, List[Dict]] = {}
+        self._entries: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {'served': 0, 'generated': 0, 'on_demand': 0, 'forced': 0, 'failures': 0, 'dropped': 0}
+
+    @classmethod
+    def from_env(cls) -> 'MarketBriefScheduler':
+        return cls(
+            market_interval=float(os.getenv('BRIEF_MARKET_INTERVAL', '900')),
+            off_hours_interval=float(os.getenv('BRIEF_OFF_HOURS_INTERVAL', '3600')),
+            idle_ttl=float(os.getenv('BRIEF_IDLE_TTL', str(6 * 3600))),
+        )
+
+    def register(self, name: str, generate: Callable[..., Dict], defaults: Iterable[Dict] = ()) -> None:
+        """``generate(**params)`` -> brief payload; ``defaults`` are params kept generated on schedule"""
+        with self._lock:
+            self._generators[name] = generate
+            self._defaults[name] = [dict(params) for params in defaults]
+
+    def start(self) -> 'MarketBriefScheduler':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='market-briefs', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def current_interval(self) -> float:
+        return self.market_interval if is_market_hours() else self.off_hours_interval
+
+    def _is_due(self, entry: Dict, now: float) -> bool:
+        return now - entry['generated_at'] >= self.current_interval()
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _generate(self, name: str, params: Dict, force: bool = False, on_demand: bool = False) -> Dict:
+        key = _brief_key(name, params)
+        # One generation per brief; readers that queued behind it reuse the result
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                generate = self._generators.get(name)
+            if entry is not None and not force and not self._is_due(entry, time.time()):
+                return entry
+            if generate is None:
+                raise KeyError(f"Unknown market brief '{name}'")
+            start = time.time()
+            try:
+                data = generate(**params)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                    if entry is not None:
+                        entry['last_error'] = str(e)
+                logger.warning(f"Market brief {name} {params or ''} failed: {e}")
+                if entry is None:
+                    raise
+                return entry
+            entry = {
+                'name': name,
+                'params': params,
+                'data': data,
+                'generated_at': time.time(),
+                'duration': time.time() - start,
+                'reads': entry['reads'] if entry else 0,
+                'last_read': entry['last_read'] if entry else start,
+                'last_error': None,
+            }
+            with self._lock:
+                self._entries[key] = entry
+                self._stats['generated'] += 1
+                self._stats['on_demand'] += int(on_demand)
+                self._evict()
+            logger.info(f"Market brief {name} {params or ''} generated in {entry['duration']:.1f}s")
+            return entry
+
+    def _evict(self) -> None:
+        """Drop least recently read briefs beyond ``max_entries`` (caller holds the lock)"""
+        pinned = {_brief_key(name, params) for name, defaults in self._defaults.items() for params in defaults}
+        for key in [k for k in self._entries if k not in pinned]:
+            if len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+            self._stats['dropped'] += 1
+
+    def _view(self, entry: Dict, refreshed: bool = False) -> Dict:
+        now = time.time()
+        return {
+            'data': entry['data'],
+            'generated_at': datetime.fromtimestamp(entry['generated_at']).isoformat(),
+            'age_seconds': round(now - entry['generated_at'], 1),
+            'next_refresh': datetime.fromtimestamp(entry['generated_at'] + self.current_interval()).isoformat(),
+            'stale': bool(entry['last_error']) or self._is_due(entry, now),
+            'refreshed': refreshed,
+        }
+
+    def get(self, name: str, **params) -> Dict:
+        """Stored brief for ``params`` as {'data', 'generated_at', 'age_seconds', 'next_refresh', 'stale', 'refreshed'}"""
+        key = _brief_key(name, params)
+        with self._lock:
+            entry = self._entries.get(key)
+        refreshed = False
+        # With the scheduler running a due brief is refreshed in the background; without it, on read
+        if entry is None or (not self.running and self._is_due(entry, time.time())):
+            before = entry
+            entry = self._generate(name, params, on_demand=True)
+            refreshed = entry is not before
+        with self._lock:
+            entry['reads'] += 1
+            entry['last_read'] = time.time()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats['served'] += 1
+        return self._view(entry, refreshed)
+
+    def refresh(self, name: str, **params) -> Dict:
+        """Regenerate now (privileged callers only) and return the new brief"""
+        entry = self._generate(name, params, force=True)
+        with self._lock:
+            self._stats['forced'] += 1
+            entry['reads'] += 1
+            entry['last_read'] = time.time()
+        return self._view(entry, refreshed=not entry['last_error'])
+
+    def serve(self, name: str, refresh: bool = False, token: str = None, **params) -> Dict:
+        """``get``, or ``refresh`` for a caller holding the refresh token (PermissionError otherwise)"""
+        if not refresh:
+            return self.get(name, **params)
+        if not refresh_authorized(token):
+            raise PermissionError(f"Refreshing market briefs requires a valid {REFRESH_TOKEN_HEADER} header")
+        return self.refresh(name, **params)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Market brief cycle failed: {e}")
+            self._stop.wait(self.tick)
+
+    def run_pending(self) -> None:
+        """One scheduler pass: generate missing defaults, refresh due briefs, drop idle ones"""
+        now = time.time()
+        with self._lock:
+            pending = [(name, params) for name, defaults in self._defaults.items() for params in defaults]
+            pinned = {_brief_key(name, params) for name, params in pending}
+            for key, entry in list(self._entries.items()):
+                if key in pinned or not self._is_due(entry, now):
+                    continue
+                if now - entry['last_read'] > self.idle_ttl:
+                    del self._entries[key]
+                    self._stats['dropped'] += 1
+                else:
+                    pending.append((entry['name'], entry['params']))
+        for name, params in pending:
+            if self._stop.is_set():
+                return
+            try:
+                self._generate(name, params)
+            except Exception:
+                # Logged in _generate; the next pass retries
+                pass
+
+    def get_status(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.values())
+            stats = dict(self._stats)
+        return {
+            'running': self.running,
+            'market_hours': is_market_hours(),
+            'interval_seconds': self.current_interval(),
+            **stats,
+            'briefs': [{
+                'name': entry['name'],
+                'params': entry['params'],
+                'generated_at': datetime.fromtimestamp(entry['generated_at']).isoformat(),
+                'age_seconds': round(now - entry['generated_at'], 1),
+                'generation_seconds': round(entry['duration'], 2),
+                'reads': entry['reads'],
+                'last_error': entry['last_error'],
+            } for entry in entries],
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_brief_scheduler() -> MarketBriefScheduler:
+    """Process-wide brief scheduler configured from the environment (not started)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = MarketBriefScheduler.from_env()
+        return _scheduler
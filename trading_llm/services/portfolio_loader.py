@@ -0,0 +1,139 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+
+class PortfolioLoader:
+    """Trader portfolios from Supabase, fetched in parallel and cached per trader.
+
+    The trader, positions and recent-trades queries run concurrently, and
+    the assembled portfolio is kept for ``ttl`` seconds so a chat turn or a
+    recommendations request right after another one skips Supabase.
+    Concurrent misses for the same trader share one fetch. Callers get a
+    deep copy they are free to modify.
+
+    The TTL is the consistency mechanism: these rows are written outside
+    the Python services, so nothing here sees the writes. Keep it short.
+    ``invalidate`` (and the /api/portfolio/<id>/invalidate route) lets a
+    writer or a user's explicit refresh skip the wait.
+    """
+
+    def __init__(self, supabase, ttl: float = 10, max_entries: int = 256, trades_limit: int = 50,
+                 executor: ThreadPoolExecutor = None):
+        self.supabase = supabase
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.trades_limit = trades_limit
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=int(os.getenv('PORTFOLIO_QUERY_CONCURRENCY', '6')), thread_name_prefix='portfolio')
+        self._cache: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._trader_locks: Dict[str, threading.Lock] = {}
+        # Bumped by invalidate so a fetch that started before a write is not cached
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'fetch_time': 0.0, 'fetches': 0}
+
+    @classmethod
+    def from_env(cls, supabase) -> 'PortfolioLoader':
+        return cls(supabase, ttl=float(os.getenv('PORTFOLIO_CACHE_TTL', '10')),
+                   max_entries=int(os.getenv('PORTFOLIO_CACHE_MAX_ENTRIES', '256')))
+
+    def _cached(self, trader_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(trader_id)
+            if entry is None:
+                return None
+            if time.time() - entry['cached_at'] >= self.ttl:
+                del self._cache[trader_id]
+                return None
+            self._cache.move_to_end(trader_id)
+            return entry['portfolio']
+
+    def _trader_lock(self, trader_id: str) -> threading.Lock:
+        with self._lock:
+            return self._trader_locks.setdefault(trader_id, threading.Lock())
+
+    def _fetch(self, trader_id: str) -> Optional[Dict]:
+        start = time.perf_counter()
+        trader_future = self.executor.submit(
+            lambda: self.supabase.table('traders').select('*').eq('trader_id', trader_id).execute())
+        positions_future = self.executor.submit(
+            lambda: self.supabase.table('positions').select('*').eq('trader_id', trader_id).execute())
+        trades_future = self.executor.submit(
+            lambda: self.supabase.table('trades').select('*').eq('trader_id', trader_id)
+            .order('trade_date', desc=True).limit(self.trades_limit).execute())
+
+        trader_response = trader_future.result()
+        positions = positions_future.result().data or []
+        trades = trades_future.result().data or []
+        with self._lock:
+            self._stats['fetches'] += 1
+            self._stats['fetch_time'] += time.perf_counter() - start
+        if not trader_response.data:
+            return None
+        return {
+            'trader': trader_response.data[0],
+            'positions': positions,
+            'trades': trades,
+            'total_pnl': sum(trade['realized_pnl'] for trade in trades if trade.get('realized_pnl')),
+        }
+
+    def load(self, trader_id: str) -> Optional[Dict]:
+        """Portfolio {'trader', 'positions', 'trades', 'total_pnl'}, or None for an unknown trader"""
+        if not self.supabase or not trader_id:
+            return None
+        portfolio = self._cached(trader_id)
+        if portfolio is None:
+            with self._trader_lock(trader_id):
+                # Another request may have filled it while this one waited
+                portfolio = self._cached(trader_id)
+                if portfolio is None:
+                    with self._lock:
+                        self._stats['misses'] += 1
+                        version = (self._epoch, self._versions.get(trader_id, 0))
+                    portfolio = self._fetch(trader_id)
+                    if portfolio is None:
+                        # Unknown traders are not cached: a new account shows up right away
+                        return None
+                    with self._lock:
+                        if version == (self._epoch, self._versions.get(trader_id, 0)):
+                            self._cache[trader_id] = {'portfolio': portfolio, 'cached_at': time.time()}
+                            while len(self._cache) > self.max_entries:
+                                self._cache.popitem(last=False)
+                    return copy.deepcopy(portfolio)
+        with self._lock:
+            self._stats['hits'] += 1
+        return copy.deepcopy(portfolio)
+
+    def invalidate(self, trader_id: str = None) -> int:
+        """Drop one trader's cached portfolio (all with no ``trader_id``); returns how many were dropped"""
+        with self._lock:
+            if trader_id is None:
+                removed = len(self._cache)
+                self._cache.clear()
+                self._epoch += 1
+            else:
+                removed = 1 if self._cache.pop(trader_id, None) is not None else 0
+                self._versions[trader_id] = self._versions.get(trader_id, 0) + 1
+            self._stats['invalidations'] += removed
+        return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'entries': entries,
+            'ttl_seconds': self.ttl,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else None,
+            'invalidations': stats['invalidations'],
+            'avg_fetch_ms': round(stats['fetch_time'] / stats['fetches'] * 1000, 1) if stats['fetches'] else None,
+        }
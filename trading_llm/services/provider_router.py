@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils.circuit_breaker import CircuitBreaker
+
+
+# Expected latency (seconds) assumed for a provider before it has been measured;
+# the ordering reproduces the original Finnhub -> Alpha Vantage -> Yahoo chain.
+DEFAULT_LATENCY_PRIORS = {
+    'finnhub': 0.3,
+    'alpha_vantage': 1.5,
+    'yahoo_finance': 2.0,
+}
+
+
+class ProviderRouter:
+    """Chooses the provider order for each quote request from live statistics.
+
+    Every candidate gets an expected cost: the time until its rate limiter can
+    grant a token plus its recent (EWMA) latency, divided by its smoothed
+    success probability from the circuit breaker window. Part of the gap
+    between p95 and EWMA latency is added on, so a provider with a fat tail
+    is not ranked on its mean alone. Providers with an open circuit go last.
+    A pinned provider always goes first. Each decision is kept with its
+    scores so the choice can be explained afterwards.
+    """
+
+    def __init__(self, http_clients: Dict, circuit_breakers: Dict, rate_limiters: Dict,
+                 pinned: Optional[str] = None, latency_priors: Optional[Dict[str, float]] = None,
+                 decision_log_size: int = 200, tail_weight: float = 0.25):
+        self.http_clients = http_clients
+        self.circuit_breakers = circuit_breakers
+        self.rate_limiters = rate_limiters
+        self.pinned = pinned
+        self.latency_priors = dict(DEFAULT_LATENCY_PRIORS)
+        self.latency_priors.update(latency_priors or {})
+        # Share of (p95 - EWMA) added to the expected latency
+        self.tail_weight = tail_weight
+        self._decisions = deque(maxlen=decision_log_size)
+        self._lock = threading.Lock()
+
+    def pin(self, provider: Optional[str]) -> None:
+        """Force ``provider`` to be tried first (None restores adaptive routing)"""
+        self.pinned = provider
+
+    def score(self, provider: str) -> Dict:
+        """Expected cost of sending the next request to ``provider``"""
+        client = self.http_clients.get(provider)
+        breaker = self.circuit_breakers.get(provider)
+        limiter = self.rate_limiters.get(provider)
+
+        measured = client.expected_latency() if client else None
+        p95 = client.latency_percentile(95) if client else None
+        latency = measured if measured is not None else self.latency_priors.get(provider, 1.0)
+        if measured is not None and p95 is not None:
+            latency += self.tail_weight * max(0.0, p95 - measured)
+        quota_wait = limiter.time_until_available() if limiter else 0.0
+
+        breaker_stats = breaker.get_stats() if breaker else {'state': CircuitBreaker.CLOSED, 'window_calls': 0, 'window_error_rate': 0.0}
+        calls = breaker_stats['window_calls']
+        failures = round(breaker_stats['window_error_rate'] * calls)
+        # Laplace smoothing keeps a couple of early failures from zeroing a provider
+        success_probability = (calls - failures + 1) / (calls + 2)
+
+        return {
+            'expected_latency_ms': round(latency * 1000, 2),
+            'latency_source': 'measured' if measured is not None else 'prior',
+            'p95_latency_ms': round(p95 * 1000, 2) if p95 is not None else None,
+            'quota_wait_ms': round(quota_wait * 1000, 2),
+            'success_probability': round(success_probability, 3),
+            'circuit_state': breaker_stats['state'],
+            'cost': (quota_wait + latency) / success_probability,
+        }
+
+    def rank(self, candidates: List[str], symbol: str = None) -> List[str]:
+        """Order ``candidates`` best-first and record why"""
+        scores = {provider: self.score(provider) for provider in candidates}
+
+        def sort_key(provider):
+            return (scores[provider]['circuit_state'] == CircuitBreaker.OPEN, scores[provider]['cost'])
+
+        order = sorted(candidates, key=sort_key)
+        if self.pinned in candidates:
+            order.remove(self.pinned)
+            order.insert(0, self.pinned)
+            reason = f"pinned to {self.pinned}"
+        elif order and scores[order[0]]['circuit_state'] == CircuitBreaker.OPEN:
+            reason = "all circuits open"
+        else:
+            reason = "lowest expected cost"
+
+        decision = {
+            'timestamp': datetime.now().isoformat(),
+            'symbol': symbol,
+            'chosen': order[0] if order else None,
+            'order': order,
+            'reason': reason,
+            'scores': {p: {k: (round(v, 4) if k == 'cost' else v) for k, v in sc.items()} for p, sc in scores.items()},
+        }
+        with self._lock:
+            self._decisions.append(decision)
+        return order
+
+    def get_stats(self, recent_decisions: int = 20) -> Dict:
+        """Per-provider statistics plus the most recent routing decisions"""
+        providers = {}
+        for name in self.http_clients:
+            entry = {'score': self.score(name)}
+            entry['score']['cost'] = round(entry['score']['cost'], 4)
+            entry['http'] = self.http_clients[name].get_stats()
+            if name in self.circuit_breakers:
+                entry['circuit'] = self.circuit_breakers[name].get_stats()
+            if name in self.rate_limiters:
+                entry['quota'] = self.rate_limiters[name].get_stats()
+            providers[name] = entry
+        with self._lock:
+            decisions = list(self._decisions)[-recent_decisions:]
+        return {
+            'pinned': self.pinned,
+            'providers': providers,
+            'recent_decisions': decisions,
+        }
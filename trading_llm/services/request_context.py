@@ -0,0 +1,29 @@
+import threading
+from typing import Dict, List
+
+
+class RequestDataContext:
+    """Market data for one request, fetched at most once per symbol.
+
+    Every consumer in the request (prompt building, sentiment, summaries)
+    asks the context instead of the service; symbols already fetched are
+    served from it and only the missing ones go upstream, in one concurrent
+    batch. Safe to share between the request's worker threads.
+    """
+
+    def __init__(self, service, period: str = "1d"):
+        self.service = service
+        self.period = period
+        self._data: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def get(self, symbols: List[str]) -> Dict[str, Dict]:
+        symbols = [s.upper() for s in symbols]
+        # Held across the fetch so a concurrent consumer waits instead of fetching again
+        with self._lock:
+            missing = [s for s in dict.fromkeys(symbols) if s not in self._data]
+            if missing:
+                self._data.update(self.service.get_multiple_stocks_data(missing, self.period))
+                self.fetches += 1
+            return {s: self._data[s] for s in symbols if s in self._data}
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bar intervals (seconds) aggregated on the fly for every symbol
+BAR_INTERVALS = {'1s': 1, '1m': 60}
+
+
+class _BarAggregator:
+    """Rolls ticks into fixed-interval OHLCV bars as they arrive"""
+
+    __slots__ = ('interval', 'bars', 'current')
+
+    def __init__(self, interval: int, max_bars: int):
+        self.interval = interval
+        # Completed bars as (start, open, high, low, close, volume, trades) tuples
+        self.bars = deque(maxlen=max_bars)
+        self.current = None
+
+    def add(self, ts: float, price: float, size: float) -> None:
+        start = ts - (ts % self.interval)
+        bar = self.current
+        if bar is None or start > bar[0]:
+            if bar is not None:
+                self.bars.append(tuple(bar))
+            self.current = [start, price, price, price, price, size, 1]
+            return
+        if start < bar[0]:
+            # Late tick for a bar that is already closed; the tick buffer keeps it
+            return
+        if price > bar[2]:
+            bar[2] = price
+        if price < bar[3]:
+            bar[3] = price
+        bar[4] = price
+        bar[5] += size
+        bar[6] += 1
+
+    def snapshot(self, limit: int) -> List[Tuple]:
+        bars = list(self.bars)
+        if self.current is not None:
+            bars.append(tuple(self.current))
+        return bars[-limit:] if limit else bars
+
+
+class _SymbolTicks:
+    """Fixed-capacity ring buffer of one symbol's ticks in contiguous arrays"""
+
+    def __init__(self, capacity: int, max_bars: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.last = None
+        self.aggregators = {name: _BarAggregator(seconds, max_bars) for name, seconds in BAR_INTERVALS.items()}
+        self.lock = threading.Lock()
+
+    def add(self, ts: float, price: float, size: float) -> None:
+        with self.lock:
+            i = self.head
+            self.ts[i] = ts
+            self.price[i] = price
+            self.size[i] = size
+            self.head = (i + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total += 1
+            if self.last is None or ts >= self.last[1]:
+                self.last = (price, ts)
+            for aggregator in self.aggregators.values():
+                aggregator.add(ts, price, size)
+
+    def recent(self, n: int) -> Dict[str, np.ndarray]:
+        with self.lock:
+            n = min(n, self.count) if n else self.count
+            idx = (np.arange(self.head - n, self.head)) % self.capacity
+            return {'ts': self.ts[idx], 'price': self.price[idx], 'size': self.size[idx]}
+
+
+class TickStore:
+    """In-memory per-symbol tick store with on-the-fly 1s/1m OHLCV bars.
+
+    Writers (stream clients, replay feeds) call ``add_tick``; readers get the
+    last trade price in O(1) and bars without touching the network.
+    """
+
+    def __init__(self, capacity: int = 4096, max_bars: int = 600):
+        self.capacity = capacity
+        self.max_bars = max_bars
+        self._symbols: Dict[str, _SymbolTicks] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, symbol: str, create: bool = False) -> Optional[_SymbolTicks]:
+        ticks = self._symbols.get(symbol)
+        if ticks is None and create:
+            with self._lock:
+                ticks = self._symbols.setdefault(symbol, _SymbolTicks(self.capacity, self.max_bars))
+        return ticks
+
+    def add_tick(self, symbol: str, price: float, size: float = 0.0, ts: float = None) -> None:
+        """Record one trade (``ts`` in epoch seconds, defaults to now)"""
+        self._get(symbol.upper(), create=True).add(ts if ts is not None else time.time(), float(price), float(size or 0.0))
+
+    def last_price(self, symbol: str) -> Optional[Tuple[float, float]]:
+        """(price, epoch seconds) of the latest trade, None if never seen"""
+        ticks = self._get(symbol.upper())
+        return ticks.last if ticks is not None else None
+
+    def get_ticks(self, symbol: str, limit: int = 0) -> Dict[str, np.ndarray]:
+        """Most recent ``limit`` ticks (all buffered ticks if 0) as arrays, oldest first"""
+        ticks = self._get(symbol.upper())
+        if ticks is None:
+            empty = np.zeros(0, dtype=np.float64)
+            return {'ts': empty, 'price': empty, 'size': empty}
+        return ticks.recent(limit)
+
+    def get_bars(self, symbol: str, interval: str = '1m', limit: int = 60) -> List[Dict]:
+        """OHLCV bars oldest first; the last one is still forming"""
+        if interval not in BAR_INTERVALS:
+            raise ValueError(f"Unsupported bar interval {interval}; use one of {list(BAR_INTERVALS)}")
+        ticks = self._get(symbol.upper())
+        if ticks is None:
+            return []
+        with ticks.lock:
+            bars = ticks.aggregators[interval].snapshot(limit)
+        return [
+            {'time': start, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'trades': n}
+            for start, o, h, l, c, v, n in bars
+        ]
+
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def get_stats(self) -> Dict:
+        stats = {}
+        for symbol, ticks in list(self._symbols.items()):
+            stats[symbol] = {
+                'ticks_received': ticks.total,
+                'ticks_buffered': ticks.count,
+                'last_price': ticks.last[0] if ticks.last else None,
+                'last_tick_age_s': round(time.time() - ticks.last[1], 3) if ticks.last else None,
+            }
+        return {'capacity_per_symbol': self.capacity, 'symbols': stats}
+
+
+class FinnhubStreamClient:
+    """Finnhub trade websocket client feeding a TickStore.
+
+    Runs its own event loop on a daemon thread, subscribes to the requested
+    symbols and reconnects with jittered backoff when the socket drops.
+    """
+
+    def __init__(self, api_key: str, store: TickStore, symbols: Iterable[str] = (),
+                 url: str = 'wss://ws.finnhub.io', max_backoff: float = 30.0):
+        self.api_key = api_key
+        self.store = store
+        self.url = url
+        self.max_backoff = max_backoff
+        self._symbols = {s.upper() for s in symbols}
+        self._loop = None
+        self._ws = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+
+    def start(self) -> 'FinnhubStreamClient':
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='finnhub-stream', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._loop is not None and self._ws is not None:
+            asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def subscribe(self, symbol: str) -> None:
+        symbol = symbol.upper()
+        if symbol in self._symbols:
+            return
+        self._symbols.add(symbol)
+        if self._loop is not None and self._ws is not None:
+            asyncio.run_coroutine_threadsafe(self._send('subscribe', symbol), self._loop)
+
+    def unsubscribe(self, symbol: str) -> None:
+        symbol = symbol.upper()
+        self._symbols.discard(symbol)
+        if self._loop is not None and self._ws is not None:
+            asyncio.run_coroutine_threadsafe(self._send('unsubscribe', symbol), self._loop)
+
+    async def _send(self, action: str, symbol: str) -> None:
+        try:
+            await self._ws.send(json.dumps({'type': action, 'symbol': symbol}))
+        except Exception as e:
+            logger.warning(f"Finnhub stream {action} {symbol} failed: {e}")
+
+    def handle_message(self, raw) -> None:
+        """Apply one websocket message to the store"""
+        message = json.loads(raw)
+        if message.get('type') != 'trade':
+            return
+        for trade in message.get('data') or []:
+            # Finnhub timestamps are epoch milliseconds
+            self.store.add_tick(trade['s'], trade['p'], trade.get('v', 0), trade['t'] / 1000.0)
+        self.messages += 1
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._consume())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _consume(self) -> None:
+        import websockets
+
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(f"{self.url}?token={self.api_key}", ping_interval=20) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    attempt = 0
+                    for symbol in list(self._symbols):
+                        await self._send('subscribe', symbol)
+                    async for raw in ws:
+                        self.handle_message(raw)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"Finnhub stream disconnected: {e}")
+            finally:
+                self._ws = None
+                self.connected = False
+            if self._stop.is_set():
+                break
+            attempt += 1
+            self.reconnects += 1
+            await asyncio.sleep(random.uniform(0, min(self.max_backoff, 2 ** attempt)))
+
+    def get_stats(self) -> Dict:
+        return {
+            'connected': self.connected,
+            'subscribed': sorted(self._symbols),
+            'messages': self.messages,
+            'reconnects': self.reconnects,
+        }
+
+
+class ReplayFeed:
+    """Replays (symbol, price, size, ts) trades into a TickStore.
+
+    ``speed`` scales the gaps between trade timestamps (0 replays as fast as
+    possible). Useful for local development and tests without a websocket.
+    """
+
+    def __init__(self, store: TickStore, trades: Iterable[Tuple[str, float, float, float]], speed: float = 0.0):
+        self.store = store
+        self.trades = trades
+        self.speed = speed
+        self._thread = None
+        self._stop = threading.Event()
+        self.replayed = 0
+
+    @classmethod
+    def random_walk(cls, store: TickStore, prices: Dict[str, float], ticks_per_symbol: int = 600,
+                    interval: float = 0.1, start: float = None, speed: float = 0.0, seed: int = None) -> 'ReplayFeed':
+        """Synthetic feed: a Gaussian random walk per symbol, ``interval`` seconds apart"""
+        rng = random.Random(seed)
+        start = time.time() - ticks_per_symbol * interval if start is None else start
+        trades = []
+        for symbol, price in prices.items():
+            for i in range(ticks_per_symbol):
+                price = max(0.01, price * (1 + rng.gauss(0, 0.0005)))
+                trades.append((symbol, round(price, 4), rng.randint(1, 500), start + i * interval))
+        trades.sort(key=lambda t: t[3])
+        return cls(store, trades, speed)
+
+    def run(self) -> int:
+        """Replay synchronously; returns the number of trades written"""
+        previous_ts = None
+        for symbol, price, size, ts in self.trades:
+            if self._stop.is_set():
+                break
+            if self.speed and previous_ts is not None and ts > previous_ts:
+                time.sleep((ts - previous_ts) / self.speed)
+            previous_ts = ts
+            self.store.add_tick(symbol, price, size, ts)
+            self.replayed += 1
+        return self.replayed
+
+    def start(self) -> 'ReplayFeed':
+        self._thread = threading.Thread(target=self.run, name='replay-feed', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def get_stats(self) -> Dict:
+        return {'replayed': self.replayed, 'running': bool(self._thread and self._thread.is_alive())}
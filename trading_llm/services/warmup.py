@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Symbols the dashboards and default endpoints ask for first
+DEFAULT_WARM_UNIVERSE = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'NVDA', 'AMZN']
+
+
+class CacheWarmer:
+    """Background warm-up and predictive prefetch for MarketDataService's cache.
+
+    At start it fetches a configured universe plus symbols from extra
+    sources (e.g. traders' positions) in concurrent chunks of
+    ``chunk_size``, pacing each chunk on the primary provider's token
+    bucket so that ``reserve_tokens`` stay free for user requests.
+    Afterwards, every ``refresh_interval`` seconds (the cache TTL by
+    default) it touches the universe and the most requested symbols again;
+    entries that just expired are then refreshed in the background by the
+    service's stale-while-revalidate path, so users keep getting cache hits.
+    """
+
+    def __init__(self, service, universe: Iterable[str] = None,
+                 symbol_sources: Iterable[Callable[[], Iterable[str]]] = (),
+                 pace_provider: str = 'finnhub', reserve_tokens: int = 2,
+                 refresh_interval: float = None, popular_count: int = 10, chunk_size: int = 5):
+        self.service = service
+        self.universe = [s.upper() for s in (universe or DEFAULT_WARM_UNIVERSE)]
+        self.symbol_sources = list(symbol_sources)
+        self.pace_provider = pace_provider
+        self.reserve_tokens = reserve_tokens
+        self.refresh_interval = refresh_interval if refresh_interval is not None else service.cache_timeout
+        self.popular_count = popular_count
+        self.chunk_size = max(1, chunk_size)
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.state = 'pending'
+        self.symbols: List[str] = []
+        self.warmed: List[str] = []
+        self.failed: List[str] = []
+        self.current = None
+        self.started_at = None
+        self.finished_at = None
+        self.refresh_cycles = 0
+
+    def start(self) -> 'CacheWarmer':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ('done', 'failed')
+
+    def _collect_symbols(self) -> List[str]:
+        symbols = list(self.universe)
+        for source in self.symbol_sources:
+            try:
+                symbols.extend(s.upper() for s in source() if s)
+            except Exception as e:
+                logger.warning(f"Warm-up symbol source failed: {e}")
+        # Keep order (universe first) but drop duplicates
+        return list(dict.fromkeys(symbols))
+
+    def _chunks(self, symbols: List[str]) -> Iterable[List[str]]:
+        """Symbol chunks no larger than the pace provider's burst allows beside the reserve"""
+        size = self.chunk_size
+        limiter = self.service.rate_limiters.get(self.pace_provider)
+        if limiter is not None:
+            size = max(1, min(size, limiter.burst - self.reserve_tokens))
+        for i in range(0, len(symbols), size):
+            yield symbols[i:i + size]
+
+    def _pace(self, tokens: int = 1) -> None:
+        """Wait until the primary provider has ``tokens`` of budget beyond the user reserve"""
+        limiter = self.service.rate_limiters.get(self.pace_provider)
+        if limiter is None:
+            return
+        wait = limiter.time_until_available(tokens + self.reserve_tokens)
+        if wait > 0:
+            self._stop.wait(wait)
+
+    def _warm(self, symbols: List[str]) -> Dict[str, bool]:
+        """Fetch one chunk concurrently; maps each symbol to whether real data came back"""
+        self._pace(len(symbols))
+        results = self.service.get_multiple_stocks_data(symbols, track_demand=False)
+        return {symbol: bool(results.get(symbol)) and results[symbol].get('source') != 'mock_data'
+                for symbol in symbols}
+
+    def _run(self) -> None:
+        self.started_at = time.time()
+        self.state = 'running'
+        try:
+            self.symbols = self._collect_symbols()
+            logger.info(f"Warming market data cache for {len(self.symbols)} symbols")
+            for chunk in self._chunks(self.symbols):
+                if self._stop.is_set():
+                    break
+                self.current = ', '.join(chunk)
+                try:
+                    outcome = self._warm(chunk)
+                except Exception as e:
+                    logger.warning(f"Warm-up failed for {self.current}: {e}")
+                    outcome = dict.fromkeys(chunk, False)
+                with self._lock:
+                    for symbol in chunk:
+                        (self.warmed if outcome.get(symbol) else self.failed).append(symbol)
+            self.state = 'done'
+        except Exception as e:
+            logger.error(f"Cache warm-up aborted: {e}")
+            self.state = 'failed'
+        finally:
+            self.current = None
+            self.finished_at = time.time()
+        logger.info(f"Cache warm-up finished: {len(self.warmed)} warmed, {len(self.failed)} failed "
+                    f"in {self.finished_at - self.started_at:.1f}s")
+
+        while self.refresh_interval and not self._stop.wait(self.refresh_interval):
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Touch the universe and the most requested symbols so expired entries refresh"""
+        popular = [symbol for symbol, _ in self.service.get_symbol_demand(self.popular_count)]
+        for chunk in self._chunks(list(dict.fromkeys(self.universe + popular))):
+            if self._stop.is_set():
+                return
+            try:
+                self._warm(chunk)
+            except Exception as e:
+                logger.warning(f"Prefetch failed for {', '.join(chunk)}: {e}")
+        self.refresh_cycles += 1
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            done = len(self.warmed) + len(self.failed)
+            total = len(self.symbols)
+            status = {
+                'state': self.state,
+                'ready': self.ready,
+                'total': total,
+                'completed': done,
+                'warmed': len(self.warmed),
+                'failed': list(self.failed),
+                'progress': round(done / total, 3) if total else (1.0 if self.ready else 0.0),
+                'current_symbol': self.current,
+                'refresh_cycles': self.refresh_cycles,
+            }
+        if self.started_at:
+            status['started_at'] = datetime.fromtimestamp(self.started_at).isoformat()
+            end = self.finished_at or time.time()
+            status['elapsed_seconds'] = round(end - self.started_at, 1)
+        return status
@@ -3,15 +3,20 @@ import os
 import json
 import time
 import re
+import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
-import google.generativeai as genai
+from typing import Dict, Iterator, List, Optional
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from market_data_service import MarketDataService
+from utils.prompt_builder import PromptBuilder
+from services.llm_backend import create_llm_model
+from services.llm_cache import stream_text
+from services.conversation_memory import ConversationMemory
+from services.portfolio_loader import PortfolioLoader
 
 # Use the shared MarketDataService (Finnhub as primary)
 
@@ -128,12 +133,11 @@ class EnhancedTradingChatbot:
             finnhub_api_key=self.finnhub_key,
         )
         
-        # Initialize Gemini for chat
-        if self.gemini_api_key:
-            genai.configure(api_key=self.gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        else:
-            self.gemini_model = None
+        # Initialize Gemini (or the local stand-in with LLM_BACKEND=local) for chat
+        self.gemini_model = create_llm_model(self.gemini_api_key)
+        self.portfolio_loader = PortfolioLoader.from_env(self.supabase)
+        # Summary plus the last few turns of this chat go into every prompt
+        self.memory = ConversationMemory.from_env(self.gemini_model)
         
         # Disclaimer text
         self.disclaimer = (
@@ -160,21 +164,9 @@ class EnhancedTradingChatbot:
         return status
     
     def get_trader_portfolio(self, trader_id: str) -> Optional[Dict]:
-        """Fetch trader profile, positions, and recent trades from Supabase."""
-        if not self.supabase or not trader_id:
-            return None
+        """Fetch trader profile, positions, and recent trades from Supabase (in parallel, briefly cached)."""
         try:
-            trader_response = self.supabase.table('traders').select('*').eq('trader_id', trader_id).execute()
-            if not trader_response.data:
-                return None
-            trader = trader_response.data[0]
-            positions = self.supabase.table('positions').select('*').eq('trader_id', trader_id).execute().data
-            trades = self.supabase.table('trades').select('*').eq('trader_id', trader_id).order('trade_date', desc=True).limit(50).execute().data
-            return {
-                'trader': trader,
-                'positions': positions,
-                'trades': trades,
-            }
+            return self.portfolio_loader.load(trader_id)
         except Exception:
             return None
     
@@ -258,10 +250,26 @@ class EnhancedTradingChatbot:
         fig.update_layout(height=300, font={'color': "darkblue", 'family': "Arial"})
         return fig
     
-    def generate_market_response(self, query: str, symbols: List[str], trader_id: Optional[str]) -> str:
+    def generate_market_response(self, query: str, symbols: List[str], trader_id: Optional[str],
+                                 conversation_id: Optional[str] = None) -> str:
         """Generate decisive AI response using real-time Finnhub data and portfolio context."""
+        return "".join(self.stream_market_response(query, symbols, trader_id, conversation_id))
+    
+    def _stream_and_remember(self, prompt: str, query: str, trader_id: Optional[str],
+                             conversation_id: Optional[str]) -> Iterator[str]:
+        """Stream the answer, then hand the finished turn to the conversation memory."""
+        chunks = []
+        for chunk in stream_text(self.gemini_model, prompt, priority='interactive'):
+            chunks.append(chunk)
+            yield chunk
+        self.memory.add_turn(conversation_id, query, "".join(chunks), trader_id)
+    
+    def stream_market_response(self, query: str, symbols: List[str], trader_id: Optional[str],
+                               conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Market response as it is produced: a quote line per symbol first, then Gemini's text."""
         if not self.gemini_model:
-            return "❌ AI analysis not available - Gemini API key not configured"
+            yield "❌ AI analysis not available - Gemini API key not configured"
+            return
         
         try:
             # Get real-time data
@@ -272,7 +280,15 @@ class EnhancedTradingChatbot:
             successful_data = {k: v for k, v in market_data.items() if not v.get('error')}
             
             if not successful_data:
-                return "❌ Unable to fetch real-time market data. Please check API configurations."
+                yield "❌ Unable to fetch real-time market data. Please check API configurations."
+                return
+            
+            # The quotes are known now; show them while the model is still thinking
+            yield "".join(
+                f"**{symbol}** ${float(data.get('current_price') or 0):.2f} "
+                f"({float(data.get('change_percent') or 0):+.2f}%)  \n"
+                for symbol, data in successful_data.items()
+            ) + "\n"
             
             # Create context for AI
             market_context = "Current Real-Time Market Data:\n"
@@ -293,18 +309,26 @@ class EnhancedTradingChatbot:
                 - Source: {src}
                 - Data Time: {ts}
                 """
-            portfolio_context = json.dumps(portfolio, default=str) if portfolio else "{}"
-            
-            prompt = f"""
+            builder = (PromptBuilder('chat_market').add('market', market_context, priority=0).add_portfolio(portfolio)
+                       .add_memory(self.memory.render(conversation_id, trader_id)))
+            prompt = builder.build(lambda sections: f"""
             You are a decisive professional trading advisor. Avoid hedging language.
             Provide clear, actionable guidance based on the data and the user's profile.
             
+            Conversation So Far: {sections['conversation_summary'] or 'none'}
+            Recent Turns:
+            {sections['recent_turns'] or 'none'}
+            
             User Question: "{query}"
             
-            {market_context}
+            {sections['market']}
             
-            User Portfolio Context (JSON):
-            {portfolio_context}
+            User Portfolio Context:
+            Profile: {sections['profile'] or 'none'}
+            Positions:
+            {sections['positions'] or 'none'}
+            Recent Trades (newest first):
+            {sections['trades'] or 'none'}
             
             Please provide:
             1. Direct answer using the real-time data above (Finnhub)
@@ -315,38 +339,53 @@ class EnhancedTradingChatbot:
             6. 2-3 key risk factors and what would invalidate the thesis
             
             Be specific and actionable. Use firm language. Mention Finnhub as the data source and include timestamps.
-            """
+            """)
             
-            response = self.gemini_model.generate_content(prompt)
-            return (response.text or "").strip() + self.disclaimer
+            yield from self._stream_and_remember(prompt, query, trader_id, conversation_id)
+            yield self.disclaimer
             
         except Exception as e:
-            return f"❌ Error generating market analysis: {str(e)}"
+            yield f"❌ Error generating market analysis: {str(e)}"
     
-    def generate_general_response(self, query: str, trader_id: Optional[str]) -> str:
+    def generate_general_response(self, query: str, trader_id: Optional[str],
+                                  conversation_id: Optional[str] = None) -> str:
         """Generate personalized trading advice using portfolio context."""
+        return "".join(self.stream_general_response(query, trader_id, conversation_id))
+    
+    def stream_general_response(self, query: str, trader_id: Optional[str],
+                                conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Personalized advice as Gemini produces it."""
         if not self.gemini_model:
-            return "❌ AI not available - please configure Gemini API key"
+            yield "❌ AI not available - please configure Gemini API key"
+            return
         
         portfolio = self.get_trader_portfolio(trader_id) if trader_id else None
-        portfolio_context = json.dumps(portfolio, default=str) if portfolio else "{}"
-        prompt = f"""
+        builder = PromptBuilder('chat_general').add_portfolio(portfolio).add_memory(self.memory.render(conversation_id, trader_id))
+        prompt = builder.build(lambda sections: f"""
         You are a decisive professional trading advisor. Avoid hedging language.
         
+        Conversation So Far: {sections['conversation_summary'] or 'none'}
+        Recent Turns:
+        {sections['recent_turns'] or 'none'}
+        
         User Question: "{query}"
         
-        User Portfolio Context (JSON):
-        {portfolio_context}
+        User Portfolio Context:
+        Profile: {sections['profile'] or 'none'}
+        Positions:
+        {sections['positions'] or 'none'}
+        Recent Trades (newest first):
+        {sections['trades'] or 'none'}
         
         Provide personalized guidance that references the user's holdings, risk tolerance (if present), and trading style.
         Include concrete next steps and specific suggestions. Use firm language.
-        """
+        """)
         
         try:
-            response = self.gemini_model.generate_content(prompt)
-            return (response.text or "").strip() + self.disclaimer
+            yield from self._stream_and_remember(prompt, query, trader_id, conversation_id)
+            yield self.disclaimer
         except Exception as e:
-            return f"❌ Error generating response: {str(e)}"
+            yield f"❌ Error generating response: {str(e)}"
 
 
 def display_stock_cards(market_data: Dict):
@@ -418,6 +457,8 @@ def main():
     # Initialize chat history
     if 'messages' not in st.session_state:
         st.session_state.messages = []
+    if 'conversation_id' not in st.session_state:
+        st.session_state.conversation_id = str(uuid.uuid4())
     
     # Initialize last market data
     if 'last_market_data' not in st.session_state:
@@ -441,9 +482,13 @@ def main():
         with col_sid_a:
             if st.button("Set ID"):
                 st.session_state.trader_id = trader_id_input.strip()
+                chatbot.portfolio_loader.invalidate(st.session_state.trader_id)
+                # Conversations belong to one trader, so a new ID starts a new one
+                st.session_state.conversation_id = str(uuid.uuid4())
         with col_sid_b:
             if st.button("Clear ID"):
                 st.session_state.trader_id = ''
+                st.session_state.conversation_id = str(uuid.uuid4())
         display_api_status(api_status)
     
     # Main content area
@@ -492,25 +537,27 @@ def main():
             
             # Generate and display response
             with st.chat_message("assistant"):
-                with st.spinner("Analyzing market data and generating response..."):
-                    try:
-                        # Extract symbols from query
-                        symbols = chatbot.extract_stock_symbols(prompt)
-                        
-                        if symbols:
-                            # Market-related query with real-time data
-                            response = chatbot.generate_market_response(prompt, symbols, st.session_state.trader_id)
-                        else:
-                            # Personalized/general query
-                            response = chatbot.generate_general_response(prompt, st.session_state.trader_id)
-                        
-                        st.markdown(response)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
-                        
-                    except Exception as e:
-                        error_msg = f"❌ Sorry, I encountered an error: {str(e)}"
-                        st.error(error_msg)
-                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                try:
+                    # Extract symbols from query
+                    symbols = chatbot.extract_stock_symbols(prompt)
+                    
+                    if symbols:
+                        # Market-related query with real-time data
+                        stream = chatbot.stream_market_response(prompt, symbols, st.session_state.trader_id,
+                                                                st.session_state.conversation_id)
+                    else:
+                        # Personalized/general query
+                        stream = chatbot.stream_general_response(prompt, st.session_state.trader_id,
+                                                                 st.session_state.conversation_id)
+                    
+                    # Render text as it arrives instead of behind a spinner
+                    response = st.write_stream(stream)
+                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    
+                except Exception as e:
+                    error_msg = f"❌ Sorry, I encountered an error: {str(e)}"
+                    st.error(error_msg)
+                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
     
     with col2:
         # Sidebar content
@@ -533,9 +580,11 @@ def main():
                 # Generate response
                 symbols = chatbot.extract_stock_symbols(query)
                 if symbols:
-                    response = chatbot.generate_market_response(query, symbols, st.session_state.trader_id)
+                    response = chatbot.generate_market_response(query, symbols, st.session_state.trader_id,
+                                                                st.session_state.conversation_id)
                 else:
-                    response = chatbot.generate_general_response(query, st.session_state.trader_id)
+                    response = chatbot.generate_general_response(query, st.session_state.trader_id,
+                                                                 st.session_state.conversation_id)
                 
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.rerun()
@@ -547,9 +596,13 @@ def main():
         if st.button("🗑️ Clear Chat"):
             st.session_state.messages = []
             st.session_state.last_market_data = {}
+            # A cleared chat starts a new conversation memory
+            st.session_state.conversation_id = str(uuid.uuid4())
             st.rerun()
         
         if st.button("🔄 Refresh Data"):
+            if st.session_state.trader_id:
+                chatbot.portfolio_loader.invalidate(st.session_state.trader_id)
             if st.session_state.last_market_data:
                 symbols = list(st.session_state.last_market_data.keys())
                 with st.spinner("Refreshing..."):
@@ -0,0 +1,142 @@
+"""
+Tests for the advanced trading endpoints' analysis code (advanced_app.py)
+
+advanced_app.py extends app.py's Flask app and assistant rather than
+standing alone, so these tests run it on top of stub globals.
+"""
+
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import llm_cache
+from services.llm_cache import LLMResponseCache
+
+
+class _StubApp:
+    """Enough of a Flask app for advanced_app's module-level decorators"""
+
+    def route(self, *args, **kwargs):
+        return lambda f: f
+
+    errorhandler = route
+
+
+def load_advanced_app(model=None):
+    module = types.ModuleType('advanced_app')
+    module.__dict__.update(app=_StubApp(), supabase=None, model=model, assistant=None,
+                           get_recommendations=lambda trader_id: None)
+    with open('advanced_app.py') as f:
+        exec(compile(f.read(), 'advanced_app.py', 'exec'), module.__dict__)
+    return module
+
+
+def daily_bars(closes, end='2026-10-16'):
+    closes = np.asarray(closes, dtype=float)
+    index = pd.bdate_range(end=end, periods=len(closes))
+    return pd.DataFrame({'Open': closes, 'High': closes * 1.01, 'Low': closes * 0.99,
+                         'Close': closes, 'Volume': np.full(len(closes), 1_000_000.0)}, index=index)
+
+
+class _StubTicker:
+    def __init__(self, frames):
+        self.frames = frames
+        self.periods = []
+
+    def __call__(self, symbol, **kwargs):
+        return self
+
+    def history(self, period='3mo', **kwargs):
+        self.periods.append(period)
+        return self.frames[period]
+
+
+@pytest.fixture
+def advanced_app():
+    return load_advanced_app()
+
+
+def test_technical_indicators_include_trend(advanced_app, monkeypatch):
+    monkeypatch.setattr(advanced_app.yf, 'Ticker', _StubTicker({'3mo': daily_bars(np.linspace(100, 160, 65))}))
+    result = advanced_app.enhanced_assistant.get_technical_indicators('AAPL')
+    assert result
+    assert result['trend_analysis']['trend'] in ('strong_uptrend', 'uptrend', 'sideways')
+    # A steady climb of ~0.94 per bar
+    assert result['trend_analysis']['strength'] == pytest.approx(60 / 64, rel=1e-3)
+
+
+def test_signal_trend_uses_kept_close_history(advanced_app, monkeypatch):
+    # Seeding commits every bar but the last (still forming), so the state ends on Friday 10-16
+    history = daily_bars(np.linspace(100, 160, 65), end='2026-10-19')
+    recent = daily_bars([159.0, 161.0, 162.0], end='2026-10-20')
+    ticker = _StubTicker({'3mo': history, '5d': recent})
+    monkeypatch.setattr(advanced_app.yf, 'Ticker', ticker)
+    monkeypatch.setattr(advanced_app.time, 'time', lambda: pd.Timestamp('2026-10-20 14:00').timestamp())
+    assistant = advanced_app.enhanced_assistant
+
+    first = assistant.get_signal_technicals('AAPL')
+    second = assistant.get_signal_technicals('AAPL')
+    assert ticker.periods == ['3mo', '5d']
+    # The second slope covers 20 bars from the state (10-19 newly committed,
+    # 10-20 forming), not just the 3 downloaded; 10-16 is not applied twice
+    closes = list(history['Close'].iloc[-19:-1]) + [161.0, 162.0]
+    expected = np.polyfit(np.arange(20), closes, 1)[0]
+    assert first['trend_analysis']['strength'] > 0
+    assert second['trend_analysis']['strength'] == pytest.approx(expected)
+
+
+def test_update_period_covers_gap(advanced_app, monkeypatch):
+    now = pd.Timestamp('2026-10-20').timestamp()
+    monkeypatch.setattr(advanced_app.time, 'time', lambda: now)
+    state = advanced_app.IndicatorState()
+    assistant = advanced_app.enhanced_assistant
+    assert assistant._update_period(None) == '3mo'
+    for days, period in ((1, '5d'), (4.6, '5d'), (10, '1mo'), (40, '3mo')):
+        state.last_bar_time = now - days * 86400
+        assert assistant._update_period(state) == period
+
+
+class _SlowModel:
+    """generate_content that blocks for symbols in ``slow`` until released"""
+
+    model_name = 'stub-model'
+
+    def __init__(self, slow):
+        self.slow = slow
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, **kwargs):
+        if any(f'signal for {symbol}' in prompt for symbol in self.slow):
+            self.release.wait(5)
+        return types.SimpleNamespace(text='Momentum is constructive.')
+
+
+def test_slow_commentary_times_out_but_technicals_return(monkeypatch):
+    monkeypatch.setattr(llm_cache, '_llm_cache', LLMResponseCache())
+    model = _SlowModel(slow={'MSFT'})
+    advanced_app = load_advanced_app(model)
+    assistant = advanced_app.enhanced_assistant
+    technicals = {'current_price': 100.0, 'rsi': 50.0, 'macd': {'macd': 0.1, 'signal': 0.05},
+                  'moving_averages': {'ma_20': 98.0, 'ma_50': 95.0}, 'trend_analysis': {'trend': 'uptrend'}}
+    monkeypatch.setattr(assistant, 'get_signal_technicals', lambda symbol: dict(technicals, symbol=symbol))
+
+    try:
+        start = time.monotonic()
+        signals = assistant.generate_trading_signals(['AAPL', 'MSFT'], deadline=0.3)
+        elapsed = time.monotonic() - start
+    finally:
+        model.release.set()
+
+    assert elapsed < 1
+    assert signals['AAPL']['ai_status'] == 'ok'
+    assert signals['AAPL']['ai_analysis'] == 'Momentum is constructive.'
+    slow = signals['MSFT']
+    assert slow['ai_status'] == 'timeout' and slow['ai_analysis'] is None
+    # The technical signal is there regardless
+    assert slow['technical_data']['symbol'] == 'MSFT'
+    assert slow['signal'] == signals['AAPL']['signal']
+    assert slow['confidence'] == signals['AAPL']['confidence']
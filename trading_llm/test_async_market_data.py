@@ -0,0 +1,122 @@
+"""
+Tests for concurrent multi-symbol fetches (services/async_market_data.py)
+"""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from services.async_market_data import AsyncMarketDataService
+from utils.rate_limiter import RateLimitedError, TokenBucket
+
+
+class StubProvider:
+    """Blocking fetcher with a fixed latency that records its peak concurrency"""
+
+    def __init__(self, name, latency, limiter=None):
+        self.name = name
+        self.latency = latency
+        self.limiter = limiter
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol):
+        if self.limiter is not None and not self.limiter.try_acquire():
+            raise RateLimitedError(self.name, 1.0)
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return {'symbol': symbol, 'current_price': 100.0, 'source': self.name}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class StubService:
+    """The parts of MarketDataService the async layer calls back into"""
+
+    hedging_enabled = False
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.demand = Counter()
+
+    def _record_demand(self, symbol):
+        self.demand[symbol] += 1
+
+    def _provider_chain(self, symbol=None):
+        return [(provider.name, provider) for provider in self.providers]
+
+    def _overlay_live_price(self, data):
+        return data
+
+    def _fallback_result(self, symbol, error):
+        return self._get_mock_data(symbol, str(error))
+
+    def _get_mock_data(self, symbol, error_msg):
+        return {'symbol': symbol, 'source': 'mock_data', 'error': error_msg}
+
+
+@pytest.fixture
+def make_service():
+    services = []
+
+    def make(providers, limits):
+        service = AsyncMarketDataService(StubService(providers), provider_limits=limits)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+
+
+SYMBOLS = [f'SYM{i}' for i in range(12)]
+
+
+def test_fans_out_within_provider_limits(make_service):
+    finnhub = StubProvider('finnhub', 0.1)
+    service = make_service([finnhub], {'finnhub': 4})
+    start = time.monotonic()
+    results = service.get_multiple_stocks_data_sync(SYMBOLS)
+    elapsed = time.monotonic() - start
+    assert [results[s]['source'] for s in SYMBOLS] == ['finnhub'] * 12
+    assert finnhub.peak == 4
+    # Three waves of four instead of twelve calls in a row
+    assert 0.25 < elapsed < 0.9
+
+
+def test_rate_limited_symbols_fall_back(make_service):
+    # Budget for five symbols; the rest go to the next provider
+    finnhub = StubProvider('finnhub', 0.02, TokenBucket(rate=0.001, burst=5))
+    yahoo = StubProvider('yahoo_finance', 0.02)
+    service = make_service([finnhub, yahoo], {'finnhub': 8, 'yahoo_finance': 2})
+    results = service.get_multiple_stocks_data_sync(SYMBOLS)
+    sources = Counter(result['source'] for result in results.values())
+    assert sources == {'finnhub': 5, 'yahoo_finance': 7}
+    assert yahoo.peak <= 2
+
+
+def test_every_provider_failing_gives_mock_data(make_service):
+    finnhub = StubProvider('finnhub', 0.0, TokenBucket(rate=0.001, burst=1))
+    finnhub.limiter.try_acquire()
+    service = make_service([finnhub], {})
+    result = service.get_market_data_with_fallback_sync('AAPL')
+    assert result['source'] == 'mock_data'
+    assert 'rate limited' in result['error']
+
+
+def test_track_demand_passes_through(make_service):
+    service = make_service([StubProvider('finnhub', 0.0)], {})
+    service.get_multiple_stocks_data_sync(['AAPL', 'MSFT'])
+    service.get_market_data_with_fallback_sync('AAPL')
+    service.get_multiple_stocks_data_sync(['AAPL', 'MSFT'], track_demand=False)
+    service.get_market_data_with_fallback_sync('NVDA', track_demand=False)
+    assert service.service.demand == {'AAPL': 2, 'MSFT': 1}
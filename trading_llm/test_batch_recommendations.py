@@ -0,0 +1,123 @@
+"""
+Tests for batched Gemini recommendations (market_data_service.py)
+"""
+
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from market_data_service import MarketDataService
+from services import llm_cache
+from services.llm_cache import LLMResponseCache
+
+
+class StubModel:
+    """generate_content stand-in; ``reply`` maps the symbols in a prompt to the response text"""
+
+    model_name = 'stub-model'
+
+    def __init__(self, reply, latency=0.0):
+        self.reply = reply
+        self.latency = latency
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        symbols = re.search(r'each of these stocks: ([A-Z, ]+)', prompt).group(1).split(', ')
+        with self._lock:
+            self.prompts.append(symbols)
+        time.sleep(self.latency)
+        return SimpleNamespace(text=self.reply(symbols))
+
+
+def recommend_all(symbols):
+    return json.dumps({s: {'recommendation': 'buy', 'confidence': 7} for s in symbols})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # A fresh response cache so no test is answered from another's replies
+    monkeypatch.setattr(llm_cache, '_llm_cache', LLMResponseCache())
+    service = MarketDataService(finnhub_api_key='test')
+    service.get_multiple_stocks_data = lambda symbols, *args, **kwargs: {
+        s: {'symbol': s, 'current_price': 100.0, 'change_percent': 1.0, 'source': 'stub'} for s in symbols
+    }
+    yield service
+    service.close()
+
+
+def test_one_prompt_for_a_small_batch(service):
+    service.gemini_model = StubModel(recommend_all)
+    results = service.get_batch_recommendations(['msft', 'AAPL', ' msft ', ''])
+    assert service.gemini_model.prompts == [['MSFT', 'AAPL']]
+    assert list(results) == ['MSFT', 'AAPL']
+    for symbol, result in results.items():
+        assert result['symbol'] == symbol
+        assert result['recommendation'] == 'buy' and result['confidence'] == 7
+        assert 'timestamp' in result and 'error' not in result
+
+
+def test_large_request_split_into_concurrent_batches(service):
+    service.gemini_model = StubModel(recommend_all, latency=0.2)
+    symbols = [f'SYM{chr(65 + i)}' for i in range(7)]
+    start = time.monotonic()
+    results = service.get_batch_recommendations(symbols, batch_size=3)
+    elapsed = time.monotonic() - start
+    assert sorted(map(len, service.gemini_model.prompts)) == [1, 3, 3]
+    assert list(results) == symbols
+    assert all(result['recommendation'] == 'buy' for result in results.values())
+    # Three prompts in parallel cost about one round trip
+    assert elapsed < 0.5
+
+
+def test_fenced_reply_and_lowercase_keys(service):
+    service.gemini_model = StubModel(
+        lambda symbols: '```json\n' + json.dumps({s.lower(): {'recommendation': 'sell'} for s in symbols}) + '\n```')
+    results = service.get_batch_recommendations(['AAPL', 'MSFT'])
+    assert [r['recommendation'] for r in results.values()] == ['sell', 'sell']
+
+
+def test_symbols_missing_from_reply_fall_back_to_hold(service):
+    service.gemini_model = StubModel(lambda symbols: json.dumps({
+        'AAPL': {'recommendation': 'strong_buy'},
+        'MSFT': 'buy',  # not an object
+        'GOOGL': {'recommendation': 'sell'},  # never asked for
+    }))
+    results = service.get_batch_recommendations(['AAPL', 'MSFT', 'NVDA'])
+    assert list(results) == ['AAPL', 'MSFT', 'NVDA']
+    assert results['AAPL']['recommendation'] == 'strong_buy'
+    for symbol in ('MSFT', 'NVDA'):
+        assert results[symbol]['recommendation'] == 'hold'
+        assert results[symbol]['error'] == 'Missing from batch response'
+
+
+@pytest.mark.parametrize('reply, error', [
+    ('Sorry, I cannot help with that.', 'Expecting value'),
+    ('{"AAPL": {"recommendation": "buy"', 'Expecting'),
+    ('[{"symbol": "AAPL"}]', 'not a JSON object'),
+])
+def test_malformed_reply_gives_hold_for_every_symbol(service, reply, error):
+    service.gemini_model = StubModel(lambda symbols: reply)
+    results = service.get_batch_recommendations(['AAPL', 'MSFT'])
+    for symbol, result in results.items():
+        assert result['symbol'] == symbol and result['recommendation'] == 'hold'
+        assert error in result['error']
+
+
+def test_bad_batch_does_not_spoil_the_others(service):
+    service.gemini_model = StubModel(lambda symbols: 'not json' if 'NVDA' in symbols else recommend_all(symbols))
+    results = service.get_batch_recommendations(['AAPL', 'MSFT', 'NVDA', 'TSLA'], batch_size=2)
+    assert [results[s]['recommendation'] for s in ('AAPL', 'MSFT')] == ['buy', 'buy']
+    assert [results[s]['recommendation'] for s in ('NVDA', 'TSLA')] == ['hold', 'hold']
+    assert 'error' in results['TSLA'] and 'error' not in results['AAPL']
+
+
+def test_without_a_model(service):
+    service.gemini_model = None
+    assert service.get_batch_recommendations([]) == {}
+    results = service.get_batch_recommendations(['AAPL'])
+    assert results == {'AAPL': {'symbol': 'AAPL', 'error': 'Gemini API key required for recommendations'}}
@@ -0,0 +1,108 @@
+"""
+Tests for cache accounting (utils/cache_stats.py) and MarketDataService.clear_cache
+"""
+
+import pandas as pd
+import pytest
+
+from market_data_service import MarketDataService
+from utils.cache_stats import CacheStats, split_cache_key
+
+
+@pytest.mark.parametrize('cache_key, expected', [
+    ('finnhub_quote_AAPL', ('finnhub_quote', 'AAPL')),
+    ('finnhub_profile_msft', ('finnhub_profile', 'MSFT')),
+    ('alpha_overview_NVDA', ('alpha_overview', 'NVDA')),
+    ('alpha_TSLA_1min', ('alpha', 'TSLA')),
+    ('yf_AMZN_1mo', ('yf', 'AMZN')),
+    ('gemini_AAPL', ('gemini', 'AAPL')),
+    ('other_thing', ('other', None)),
+])
+def test_split_cache_key(cache_key, expected):
+    assert split_cache_key(cache_key) == expected
+
+
+def test_counters_per_namespace():
+    stats = CacheStats()
+    stats.record_miss('finnhub_quote_AAPL')
+    stats.record_store('finnhub_quote_AAPL', 0.2)
+    stats.record_hit('finnhub_quote_AAPL', 0.2)
+    stats.record_hit('finnhub_quote_AAPL', 0.2)
+    stats.record_hit('finnhub_quote_MSFT', 0.4, stale=True)
+    stats.record_miss('yf_AAPL_1mo')
+    stats.record_eviction('yf_AAPL_1mo', 2)
+
+    entries = {'finnhub_quote_AAPL': {'size_bytes': 100}, 'finnhub_quote_MSFT': {'size_bytes': 300}}
+    report = stats.report(entries)
+    quote = report['namespaces']['finnhub_quote']
+    assert (quote['hits'], quote['stale_hits'], quote['misses']) == (2, 1, 1)
+    assert quote['hit_rate'] == 0.75
+    # Latency saved counts stale hits too: (0.2 + 0.2 + 0.4) / 3
+    assert quote['avg_latency_saved_ms'] == pytest.approx(266.67)
+    assert quote['avg_fetch_latency_ms'] == 200.0
+    assert (quote['entries'], quote['bytes'], quote['avg_entry_bytes']) == (2, 400, 200)
+
+    yf = report['namespaces']['yf']
+    assert yf['hit_rate'] == 0.0 and yf['evictions'] == 2 and yf['entries'] == 0
+    assert report['total_entries'] == 2 and report['total_bytes'] == 400
+    assert report['hottest_keys'][0] == {'key': 'finnhub_quote_AAPL', 'hits': 2}
+
+
+def test_forget_keys_drops_hottest_entries():
+    stats = CacheStats()
+    stats.record_hit('finnhub_quote_AAPL')
+    stats.record_hit('finnhub_quote_MSFT')
+    stats.forget_keys(['finnhub_quote_AAPL'])
+    assert stats.report({})['hottest_keys'] == [{'key': 'finnhub_quote_MSFT', 'hits': 1}]
+    # Namespace totals are history and stay
+    assert stats.report({})['namespaces']['finnhub_quote']['hits'] == 2
+
+
+@pytest.fixture
+def service():
+    service = MarketDataService(finnhub_api_key='test')
+    for key in ('finnhub_quote_AAPL', 'finnhub_quote_MSFT', 'finnhub_profile_AAPL', 'yf_AAPL_1mo', 'yf_MSFT_1mo'):
+        service._cache_data(key, {'key': key})
+    history = pd.DataFrame({'Close': [1.0, 2.0]}, index=pd.date_range('2026-10-15', periods=2))
+    for symbol in ('AAPL', 'MSFT'):
+        service.history_store.put(symbol, '1mo', history)
+    yield service
+    service.close()
+
+
+def test_service_counts_hits_and_misses(service):
+    assert service._get_cached_data('finnhub_quote_AAPL') == {'key': 'finnhub_quote_AAPL'}
+    assert service._get_cached_data('finnhub_quote_NVDA') is None
+    stats = service.get_cache_statistics()
+    quote = stats['namespaces']['finnhub_quote']
+    assert (quote['hits'], quote['misses'], quote['entries']) == (1, 1, 2)
+    assert stats['total_entries'] == 5
+
+
+def test_clear_by_symbol(service):
+    service._get_cached_data('finnhub_quote_AAPL')
+    assert service.clear_cache(symbol='aapl') == 3
+    assert sorted(service.cache) == ['finnhub_quote_MSFT', 'yf_MSFT_1mo']
+    assert list(service.history_store.memory_report()['symbols']) == ['MSFT_1mo']
+    stats = service.get_cache_statistics()
+    assert stats['hottest_keys'] == []
+    assert stats['namespaces']['finnhub_quote']['evictions'] == 1
+
+
+def test_clear_by_namespace(service):
+    assert service.clear_cache(namespace='finnhub_quote') == 2
+    assert sorted(service.cache) == ['finnhub_profile_AAPL', 'yf_AAPL_1mo', 'yf_MSFT_1mo']
+    # Only the yf namespace owns the price history
+    assert service.history_store.memory_report()['entries'] == 2
+
+
+def test_clear_by_namespace_and_symbol(service):
+    assert service.clear_cache(namespace='yf', symbol='MSFT') == 1
+    assert 'yf_MSFT_1mo' not in service.cache and 'yf_AAPL_1mo' in service.cache
+    assert list(service.history_store.memory_report()['symbols']) == ['AAPL_1mo']
+
+
+def test_clear_everything(service):
+    assert service.clear_cache() == 5
+    assert service.cache == {}
+    assert service.history_store.memory_report()['entries'] == 0
@@ -0,0 +1,67 @@
+"""
+Tests for the per-provider circuit breaker (utils/circuit_breaker.py)
+"""
+
+import time
+
+from utils.circuit_breaker import CircuitBreaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_after() <= 60
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, min_calls=100)
+    for _ in range(10):
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_on_error_rate():
+    breaker = CircuitBreaker('test', failure_threshold=100, error_rate_threshold=0.5, window_size=10, min_calls=10)
+    for _ in range(5):
+        breaker.record_success()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_error_rate_waits_for_min_calls():
+    breaker = CircuitBreaker('test', failure_threshold=100, error_rate_threshold=0.5, min_calls=10)
+    for _ in range(4):
+        breaker.record_failure()
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker('test', failure_threshold=1, cooldown=0.05, half_open_max_calls=1)
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    # Only one probe at a time
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_probe_reopens_on_failure():
+    breaker = CircuitBreaker('test', failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
@@ -0,0 +1,97 @@
+"""
+Tests for bounded chat memory and conversation ownership (services/conversation_memory.py)
+"""
+
+import time
+from types import SimpleNamespace
+
+from services.conversation_memory import ConversationMemory
+
+
+class FakeConversationsTable:
+    """The slice of the Supabase query builder ConversationMemory uses"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._filter = None
+        self._upsert = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self._filter = (column, value)
+        return self
+
+    def limit(self, n):
+        return self
+
+    def upsert(self, row):
+        self._upsert = row
+        return self
+
+    def execute(self):
+        if self._upsert is not None:
+            self.rows[self._upsert['id']] = dict(self._upsert)
+            return SimpleNamespace(data=[self._upsert])
+        row = self.rows.get(self._filter[1])
+        return SimpleNamespace(data=[dict(row)] if row else [])
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.rows = {}
+
+    def table(self, name):
+        return FakeConversationsTable(self.rows)
+
+
+def wait_idle(memory):
+    for _ in range(200):
+        if not memory.get_stats()['pending']:
+            return
+        time.sleep(0.01)
+
+
+def test_summary_keeps_prompt_bounded():
+    memory = ConversationMemory(recent_turns=2, budget=200)
+    for i in range(6):
+        memory.add_turn('c1', f'question {i}', f'answer {i}', 'trader-a')
+        wait_idle(memory)
+    rendered = memory.render('c1', 'trader-a')
+    assert len(rendered['turns']) == 2
+    assert 'question 0' in rendered['summary']
+    assert 'answer 5' in rendered['turns'][-1]
+
+
+def test_other_trader_gets_no_memory():
+    memory = ConversationMemory()
+    memory.add_turn('c1', 'I hold 500 NVDA, how risky is that?', 'Quite concentrated.', 'trader-a')
+    wait_idle(memory)
+
+    assert memory.render('c1', 'trader-b') == {'summary': '', 'turns': []}
+    assert memory.render('c1') == {'summary': '', 'turns': []}
+    memory.add_turn('c1', 'what did I ask?', 'nothing', 'trader-b')
+    wait_idle(memory)
+
+    owner_view = memory.render('c1', 'trader-a')
+    assert len(owner_view['turns']) == 1
+    assert '500 NVDA' in owner_view['turns'][0]
+    assert memory.get_stats()['rejected'] == 3
+
+
+def test_persisted_conversation_keeps_its_owner():
+    supabase = FakeSupabase()
+    writer = ConversationMemory(supabase=supabase)
+    writer.add_turn('c1', 'My risk tolerance is low', 'Noted.', 'trader-a')
+    wait_idle(writer)
+    assert supabase.rows['c1']['trader_id'] == 'trader-a'
+
+    # A fresh process loads the row from Supabase
+    reader = ConversationMemory(supabase=supabase)
+    assert reader.render('c1', 'trader-b')['turns'] == []
+    reader.add_turn('c1', 'overwrite?', 'no', 'trader-b')
+    wait_idle(reader)
+    assert supabase.rows['c1']['trader_id'] == 'trader-a'
+    assert supabase.rows['c1']['turn_count'] == 1
+    assert 'risk tolerance' in reader.render('c1', 'trader-a')['turns'][0]
@@ -0,0 +1,109 @@
+"""
+Tests for hedged provider requests (market_data_service.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from market_data_service import MarketDataService
+from services.http_client import RequestCancelled, check_cancelled
+
+
+class StubProvider:
+    """Fetcher with a fixed latency that checks for cancellation like ProviderHTTPClient does"""
+
+    def __init__(self, name, latency, fail=False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.started_at = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def __call__(self, symbol):
+        self.started_at = time.monotonic()
+        try:
+            while time.monotonic() - self.started_at < self.latency:
+                check_cancelled()
+                time.sleep(0.005)
+            if self.fail:
+                raise RuntimeError(f'{self.name} unavailable')
+            return {'symbol': symbol, 'current_price': 100.0, 'source': self.name}
+        except RequestCancelled:
+            self.cancelled.set()
+            raise
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def service():
+    service = MarketDataService(finnhub_api_key='test', hedging=True)
+    # No latency history yet, so the hedge delay is the configured maximum
+    service.hedge_min_delay = 0.05
+    service.hedge_max_delay = 0.1
+    yield service
+    service.close()
+
+
+def use_providers(service, *providers):
+    service._provider_chain = lambda symbol=None: [(p.name, p) for p in providers]
+
+
+def test_fast_primary_is_not_hedged(service):
+    primary, secondary = StubProvider('finnhub', 0.01), StubProvider('yahoo_finance', 0.01)
+    use_providers(service, primary, secondary)
+    assert service._get_hedged_market_data('AAPL')['source'] == 'finnhub'
+    assert secondary.started_at is None
+    stats = service.get_hedging_stats()['providers']
+    assert stats == {'finnhub': {'primary_calls': 1, 'hedges_sent': 0, 'wins': 0, 'cancelled': 0}}
+
+
+def test_hedge_fires_after_delay_and_loser_is_cancelled(service):
+    primary, secondary = StubProvider('finnhub', 2.0), StubProvider('yahoo_finance', 0.02)
+    use_providers(service, primary, secondary)
+    start = time.monotonic()
+    result = service._get_hedged_market_data('AAPL')
+    elapsed = time.monotonic() - start
+
+    assert result['source'] == 'yahoo_finance'
+    # The secondary was only asked once the primary had been out for the hedge delay
+    assert secondary.started_at - start >= 0.1
+    assert elapsed < 0.5
+    # The primary aborts at its next cancellation check instead of running to 2s
+    assert primary.finished.wait(1)
+    assert primary.cancelled.is_set()
+    stats = service.get_hedging_stats()['providers']
+    assert stats['finnhub'] == {'primary_calls': 1, 'hedges_sent': 0, 'wins': 0, 'cancelled': 1}
+    assert stats['yahoo_finance'] == {'primary_calls': 0, 'hedges_sent': 1, 'wins': 1, 'cancelled': 0}
+
+
+def test_primary_wins_race_after_hedging(service):
+    primary, secondary = StubProvider('finnhub', 0.15), StubProvider('yahoo_finance', 2.0)
+    use_providers(service, primary, secondary)
+    assert service._get_hedged_market_data('AAPL')['source'] == 'finnhub'
+    assert secondary.finished.wait(1)
+    assert secondary.cancelled.is_set()
+    stats = service.get_hedging_stats()['providers']
+    assert stats['finnhub']['wins'] == 1 and stats['yahoo_finance']['cancelled'] == 1
+
+
+def test_failed_racer_does_not_win(service):
+    primary, secondary = StubProvider('finnhub', 0.15, fail=True), StubProvider('yahoo_finance', 0.2)
+    use_providers(service, primary, secondary)
+    assert service._get_hedged_market_data('AAPL')['source'] == 'yahoo_finance'
+    assert not primary.cancelled.is_set()
+
+
+def test_rest_of_chain_after_race_fails(service):
+    providers = (StubProvider('finnhub', 0.0, fail=True), StubProvider('yahoo_finance', 0.0, fail=True),
+                 StubProvider('alpha_vantage', 0.0))
+    use_providers(service, *providers)
+    assert service._get_hedged_market_data('AAPL')['source'] == 'alpha_vantage'
+
+    use_providers(service, *providers[:2])
+    result = service._get_hedged_market_data('AAPL')
+    assert result['source'] == 'mock_data'
+    assert 'finnhub unavailable' in result['error']
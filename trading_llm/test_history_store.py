@@ -0,0 +1,91 @@
+"""
+Tests for the compact history cache (services/history_store.py)
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services import history_store
+from services.history_store import HistoryStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(history_store, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def history(rows=30, start=100.0, tz='America/New_York'):
+    index = pd.date_range(end='2026-10-16', periods=rows, freq='B', tz=tz)
+    close = start + np.arange(rows, dtype=float)
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': np.full(rows, 1_234_567.0), 'RSI': np.full(rows, 50.0)}, index=index)
+
+
+def test_round_trip_keeps_ohlcv(clock):
+    store = HistoryStore(ttl=60)
+    frame = history()
+    store.put('aapl', '1mo', frame)
+    cached = store.get('AAPL', '1mo')
+    restored = cached.to_frame()
+    assert list(restored.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert restored.index.equals(frame.index)
+    np.testing.assert_allclose(restored['Close'], frame['Close'])
+    assert restored['Volume'].iloc[0] == 1_234_567.0
+
+
+def test_shared_index_stored_once(clock):
+    store = HistoryStore(ttl=60)
+    a = store.put('AAPL', '1mo', history(start=100))
+    b = store.put('MSFT', '1mo', history(start=400))
+    assert a.index is b.index
+    assert store.memory_report()['shared_indexes'] == 1
+
+
+def test_expired_entry_is_removed_on_read(clock):
+    store = HistoryStore(ttl=60)
+    store.put('AAPL', '1mo', history())
+    clock[0] += 59
+    assert store.get('AAPL', '1mo') is not None
+    clock[0] += 1
+    assert store.get('AAPL', '1mo') is None
+    assert store.memory_report()['entries'] == 0
+    assert store.evictions == 1
+
+
+def test_writes_sweep_expired_entries(clock):
+    store = HistoryStore(ttl=60)
+    for symbol in ('AAPL', 'MSFT', 'NVDA'):
+        store.put(symbol, '1mo', history())
+    clock[0] += 61
+    # Never read again, but the next write clears them out
+    store.put('TSLA', '1mo', history())
+    report = store.memory_report()
+    assert list(report['symbols']) == ['TSLA_1mo']
+    assert report['evictions'] == 3
+
+
+def test_size_cap_drops_oldest(clock):
+    store = HistoryStore(ttl=600, max_entries=2)
+    for i, symbol in enumerate(('AAPL', 'MSFT', 'NVDA')):
+        clock[0] += 1
+        store.put(symbol, '1mo', history())
+    assert store.get('AAPL', '1mo') is None
+    assert store.get('MSFT', '1mo') is not None and store.get('NVDA', '1mo') is not None
+    # Re-storing a symbol makes it the newest
+    store.put('MSFT', '1mo', history())
+    store.put('TSLA', '1mo', history())
+    assert store.get('MSFT', '1mo') is not None and store.get('NVDA', '1mo') is None
+
+
+def test_clear_by_symbol(clock):
+    store = HistoryStore(ttl=60)
+    store.put('AAPL', '1mo', history())
+    store.put('AAPL', '1d', history(rows=1))
+    store.put('MSFT', '1mo', history())
+    store.clear('aapl')
+    assert list(store.memory_report()['symbols']) == ['MSFT_1mo']
@@ -0,0 +1,104 @@
+"""
+Tests for the vectorized indicator panel (utils/indicators.py) against pandas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicators import IndicatorPanel, compute_indicators, ewm_mean, last_valid, rolling_mean, rolling_std
+
+
+def pandas_indicators(close: pd.Series, volume: pd.Series) -> dict:
+    """The per-symbol pandas calculations the services used before vectorizing"""
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    signal = macd.ewm(span=9).mean()
+    middle = close.rolling(window=20).mean()
+    std = close.rolling(window=20).std()
+    return {
+        'ma_20': close.rolling(window=20).mean(),
+        'ma_50': close.rolling(window=50).mean(),
+        'ma_200': close.rolling(window=200).mean(),
+        'rsi': 100 - 100 / (1 + gain / loss),
+        'macd': macd,
+        'macd_signal': signal,
+        'macd_histogram': macd - signal,
+        'bb_upper': middle + std * 2,
+        'bb_middle': middle,
+        'bb_lower': middle - std * 2,
+        'avg_volume': volume.rolling(window=20).mean(),
+    }
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(3)
+    index = pd.bdate_range(end='2026-10-16', periods=260)
+
+    def frame(periods, start):
+        close = start + np.cumsum(rng.normal(0, 1, periods))
+        return pd.DataFrame({'Close': close, 'Volume': rng.uniform(1e5, 1e6, periods)}, index=index[-periods:])
+
+    # Ragged: a recent listing with less history than the others
+    return {'AAPL': frame(260, 190), 'MSFT': frame(260, 410), 'NEWCO': frame(90, 20)}
+
+
+def assert_series_equal(actual: np.ndarray, expected: pd.Series, name: str):
+    np.testing.assert_allclose(actual, expected.to_numpy(dtype=np.float64), rtol=1e-9, atol=1e-9,
+                               equal_nan=True, err_msg=name)
+
+
+def test_single_series_matches_pandas(frames):
+    close, volume = frames['AAPL']['Close'], frames['AAPL']['Volume']
+    series = compute_indicators(close.to_numpy(), volume.to_numpy())
+    for name, expected in pandas_indicators(close, volume).items():
+        assert_series_equal(series[name][:, 0], expected, name)
+
+
+def test_ragged_panel_matches_per_symbol_pandas(frames):
+    panel = IndicatorPanel.from_frames(frames)
+    assert panel.symbols == ['AAPL', 'MSFT', 'NEWCO']
+    for symbol, frame in frames.items():
+        expected = pandas_indicators(frame['Close'], frame['Volume'])
+        for name, values in expected.items():
+            column = panel.full_series(name, symbol)
+            # NaN padding before NEWCO's history starts, pandas values after
+            assert column.loc[:frame.index[0]].iloc[:-1].isna().all(), name
+            assert_series_equal(column.loc[frame.index].to_numpy(), values, f'{symbol} {name}')
+
+
+def test_latest_uses_last_valid_value(frames):
+    panel = IndicatorPanel.from_frames(frames)
+    latest = panel.latest()
+    assert latest['NEWCO']['ma_200'] is None
+    assert latest['NEWCO']['ma_50'] == pytest.approx(frames['NEWCO']['Close'].tail(50).mean())
+    assert latest['AAPL']['close'] == pytest.approx(frames['AAPL']['Close'].iloc[-1])
+
+
+def test_ewm_skips_gaps_like_pandas():
+    values = pd.Series([np.nan, np.nan, 10.0, 11.0, np.nan, 13.0, 12.5, np.nan, 14.0])
+    assert_series_equal(ewm_mean(values.to_numpy()[:, None], 5)[:, 0], values.ewm(span=5).mean(), 'ewm')
+
+
+def test_rolling_helpers_match_pandas():
+    values = pd.Series(np.random.default_rng(5).normal(100, 5, 40))
+    panel = values.to_numpy()[:, None]
+    assert_series_equal(rolling_mean(panel, 7)[:, 0], values.rolling(7).mean(), 'mean')
+    assert_series_equal(rolling_std(panel, 7)[:, 0], values.rolling(7).std(), 'std')
+    # Window longer than the history: nothing but NaN
+    assert np.isnan(rolling_mean(panel[:5], 7)).all()
+
+
+def test_clip_windows_shrinks_to_history():
+    close = np.linspace(10, 20, 30)
+    series = compute_indicators(close, clip_windows=True)
+    assert series['ma_200'][-1, 0] == pytest.approx(close.mean())
+
+
+def test_last_valid():
+    panel = np.array([[1.0, np.nan], [2.0, np.nan], [np.nan, np.nan]])
+    result = last_valid(panel)
+    assert result[0] == 2.0 and np.isnan(result[1])
@@ -0,0 +1,61 @@
+"""
+Tests for LLM response cache keys and reuse (services/llm_cache.py)
+"""
+
+from services.llm_cache import LLMResponseCache, is_price_key, normalize_inputs
+
+
+def test_prices_within_tolerance_share_a_key():
+    cache = LLMResponseCache(price_tolerance=0.005)
+    a = cache.make_key('chat_market', {'AAPL': {'current_price': 190.01, 'change_percent': 1.231}}, 'gemini')
+    b = cache.make_key('chat_market', {'AAPL': {'current_price': 190.2, 'change_percent': 1.234}}, 'gemini')
+    c = cache.make_key('chat_market', {'AAPL': {'current_price': 195.0, 'change_percent': 1.231}}, 'gemini')
+    assert a == b
+    assert a != c
+
+
+def test_non_price_numbers_are_exact():
+    for inputs_a, inputs_b in (({'quantity': 100}, {'quantity': 101}),
+                               ({'rsi': 55.3}, {'rsi': 55.4}),
+                               ({'volume': 1000000}, {'volume': 1004000}),
+                               ({'unrealized_pnl': 250.0}, {'unrealized_pnl': 251.0})):
+        assert normalize_inputs(inputs_a) != normalize_inputs(inputs_b)
+
+
+def test_price_keys():
+    for key in ('price', 'current_price', 'avg_price', 'entry_price', 'previous_close', 'ma_20', 'bb_upper'):
+        assert is_price_key(key)
+    for key in ('quantity', 'volume', 'rsi', 'realized_pnl', 'market_cap'):
+        assert not is_price_key(key)
+
+
+def test_nested_prices_are_bucketed():
+    a = normalize_inputs({'positions': [{'symbol': 'AAPL', 'quantity': 10, 'avg_price': 101.2}]})
+    b = normalize_inputs({'positions': [{'symbol': 'AAPL', 'quantity': 10, 'avg_price': 101.3}]})
+    assert a == b
+    assert a['positions'][0]['quantity'] == 10
+
+
+def test_volatile_keys_dropped_and_strings_trimmed():
+    a = normalize_inputs({'symbol': ' AAPL ', 'timestamp': '2026-10-19T10:00:00', 'note': 'buy  the   dip'})
+    assert a == {'symbol': 'AAPL', 'note': 'buy the dip'}
+
+
+def test_key_depends_on_template_and_model():
+    cache = LLMResponseCache()
+    inputs = {'symbol': 'AAPL'}
+    assert cache.make_key('market_sentiment', inputs, 'gemini') != cache.make_key('index_sentiment', inputs, 'gemini')
+    assert cache.make_key('market_sentiment', inputs, 'gemini') != cache.make_key('market_sentiment', inputs, 'local')
+
+
+def test_get_or_generate_reuses_response():
+    cache = LLMResponseCache(ttl=60)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return 'bullish'
+
+    assert cache.get_or_generate('chat_market', {'price': 190.01}, 'gemini', generate) == 'bullish'
+    assert cache.get_or_generate('chat_market', {'price': 190.2}, 'gemini', generate) == 'bullish'
+    assert len(calls) == 1
@@ -0,0 +1,91 @@
+"""
+Tests for LLM admission control (services/llm_dispatcher.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.llm_dispatcher import LLMDeadlineExceeded, LLMDispatcher, LLMOverloadedError, template_priority
+
+
+def _wait_for_queue(dispatcher, depth):
+    for _ in range(200):
+        if dispatcher.get_stats()['queue_depth'] >= depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"queue never reached {depth}")
+
+
+def _queue_calls(dispatcher, priorities, order):
+    """Start one thread per priority, each queued before the next starts"""
+    def call(priority):
+        with dispatcher.slot(priority, deadline=5):
+            order.append(priority)
+
+    threads = []
+    for i, priority in enumerate(priorities):
+        thread = threading.Thread(target=call, args=(priority,))
+        thread.start()
+        _wait_for_queue(dispatcher, i + 1)
+        threads.append(thread)
+    return threads
+
+
+def test_serves_by_priority_then_fifo():
+    dispatcher = LLMDispatcher(max_concurrency=1, reserved_interactive=0)
+    order = []
+    dispatcher.acquire('standard')
+    threads = _queue_calls(dispatcher, ['batch', 'standard', 'interactive', 'batch', 'interactive'], order)
+    dispatcher.release('standard')
+    for thread in threads:
+        thread.join(5)
+    assert order == ['interactive', 'interactive', 'standard', 'batch', 'batch']
+
+
+def test_reserved_slot_only_for_interactive():
+    dispatcher = LLMDispatcher(max_concurrency=2, reserved_interactive=1)
+    dispatcher.acquire('batch')
+    with pytest.raises(LLMDeadlineExceeded):
+        dispatcher.acquire('standard', timeout=0.05)
+    # The reserved slot is still free for chat
+    dispatcher.acquire('interactive', timeout=0.05)
+    stats = dispatcher.get_stats()
+    assert stats['active'] == 2
+    assert stats['classes']['standard']['timed_out'] == 1
+
+
+def test_rejects_when_queue_full():
+    dispatcher = LLMDispatcher(max_concurrency=1, max_queue=2, reserved_interactive=0)
+    dispatcher.acquire('standard')
+    # Batch gets half the queue
+    threads = _queue_calls(dispatcher, ['batch'], [])
+    with pytest.raises(LLMOverloadedError):
+        dispatcher.acquire('batch')
+    assert dispatcher.get_stats()['classes']['batch']['rejected'] == 1
+    dispatcher.release('standard')
+    for thread in threads:
+        thread.join(5)
+
+
+def test_slot_yields_remaining_deadline_and_releases_on_error():
+    dispatcher = LLMDispatcher(max_concurrency=1)
+    with pytest.raises(RuntimeError):
+        with dispatcher.slot('standard', deadline=10) as remaining:
+            assert 9 < remaining <= 10
+            raise RuntimeError("model failed")
+    stats = dispatcher.get_stats()
+    assert stats['active'] == 0
+    assert stats['classes']['standard']['failed'] == 1
+
+
+def test_unknown_priority():
+    with pytest.raises(ValueError):
+        LLMDispatcher().acquire('urgent')
+
+
+def test_template_priorities():
+    assert template_priority('chat_market') == 'interactive'
+    assert template_priority('backtest_analysis') == 'batch'
+    assert template_priority('something_new') == 'standard'
@@ -0,0 +1,180 @@
+"""
+Tests for scheduled market-wide briefs (services/market_briefs.py)
+"""
+
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+from services import market_briefs
+from services.market_briefs import REFRESH_TOKEN_HEADER, MarketBriefScheduler, is_market_hours
+from test_advanced_app import load_advanced_app
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_760_000_000.0]
+    monkeypatch.setattr(market_briefs, 'time', SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(market_briefs, 'is_market_hours', lambda now=None: True)
+    return now
+
+
+class StubGenerator:
+    """Brief generator that counts calls and can be made to fail or block"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, **params):
+        self.calls.append(params)
+        time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError('upstream down')
+        return {'version': len(self.calls), **params}
+
+
+@pytest.fixture
+def scheduler(clock):
+    return MarketBriefScheduler(market_interval=900, off_hours_interval=3600, idle_ttl=7200)
+
+
+def test_market_hours():
+    tz = market_briefs.MARKET_TZ
+    assert is_market_hours(datetime(2026, 10, 19, 9, 30, tzinfo=tz))
+    assert not is_market_hours(datetime(2026, 10, 19, 16, 0, tzinfo=tz))
+    assert not is_market_hours(datetime(2026, 10, 18, 12, 0, tzinfo=tz))  # Sunday
+
+
+def test_get_serves_stored_copy(scheduler, clock):
+    generate = StubGenerator()
+    scheduler.register('sentiment', generate)
+    first = scheduler.get('sentiment', symbols=['SPY'])
+    assert first['refreshed'] and first['data'] == {'version': 1, 'symbols': ['SPY']}
+    clock[0] += 600
+    second = scheduler.get('sentiment', symbols=['SPY'])
+    assert not second['refreshed'] and second['data']['version'] == 1
+    assert second['age_seconds'] == 600.0 and not second['stale']
+    # Different params are a different brief
+    assert scheduler.get('sentiment', symbols=['QQQ'])['data']['version'] == 2
+    assert len(generate.calls) == 2
+
+
+def test_concurrent_first_readers_generate_once(scheduler):
+    generate = StubGenerator(latency=0.1)
+    scheduler.register('sentiment', generate)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.get('sentiment'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(generate.calls) == 1
+    assert [r['data']['version'] for r in results] == [1] * 5
+
+
+def test_running_scheduler_serves_due_copy(scheduler, clock):
+    generate = StubGenerator()
+    scheduler.register('sentiment', generate)
+    scheduler.get('sentiment')
+    clock[0] += 1000
+    # Not running: a due brief is regenerated on read
+    assert scheduler.get('sentiment')['data']['version'] == 2
+    clock[0] += 1000
+    scheduler._thread = SimpleNamespace(is_alive=lambda: True)
+    brief = scheduler.get('sentiment')
+    assert brief['data']['version'] == 2 and brief['stale']
+
+
+def test_run_pending_schedule(scheduler, clock, monkeypatch):
+    defaults, on_demand = StubGenerator(), StubGenerator()
+    scheduler.register('index', defaults, defaults=[{}])
+    scheduler.register('news', on_demand)
+
+    scheduler.run_pending()
+    assert defaults.calls == [{}] and on_demand.calls == []
+    scheduler.get('news', symbol='AAPL')
+
+    clock[0] += 600
+    scheduler.run_pending()
+    assert len(defaults.calls) == 1 and len(on_demand.calls) == 1
+
+    # Every 15 minutes in market hours, for the defaults and briefs still being read
+    clock[0] += 300
+    scheduler.run_pending()
+    assert len(defaults.calls) == 2 and len(on_demand.calls) == 2
+
+    # Hourly outside market hours
+    monkeypatch.setattr(market_briefs, 'is_market_hours', lambda now=None: False)
+    clock[0] += 900
+    scheduler.run_pending()
+    assert len(defaults.calls) == 2
+    clock[0] += 2700
+    scheduler.run_pending()
+    assert len(defaults.calls) == 3
+
+    # A brief nobody has read for idle_ttl is dropped; defaults are kept
+    clock[0] += 7200
+    scheduler.run_pending()
+    assert len(on_demand.calls) == 3
+    status = scheduler.get_status()
+    assert [brief['name'] for brief in status['briefs']] == ['index']
+    assert status['dropped'] == 1
+
+
+def test_failed_refresh_keeps_previous_copy(scheduler, clock):
+    generate = StubGenerator()
+    scheduler.register('sentiment', generate)
+    scheduler.get('sentiment')
+    generate.fail = True
+    clock[0] += 1000
+    brief = scheduler.get('sentiment')
+    assert brief['data']['version'] == 1 and brief['stale'] and not brief['refreshed']
+    assert scheduler.get_status()['briefs'][0]['last_error'] == 'upstream down'
+
+    with pytest.raises(RuntimeError):
+        scheduler.get('sentiment', symbols=['NEW'])
+    with pytest.raises(KeyError):
+        scheduler.get('unknown')
+
+
+def test_refresh_requires_token(scheduler, monkeypatch):
+    generate = StubGenerator()
+    scheduler.register('sentiment', generate)
+    scheduler.serve('sentiment')
+    with pytest.raises(PermissionError):
+        scheduler.serve('sentiment', refresh=True, token='secret')
+    monkeypatch.setenv('BRIEF_REFRESH_TOKEN', 'secret')
+    with pytest.raises(PermissionError):
+        scheduler.serve('sentiment', refresh=True, token='wrong')
+    brief = scheduler.serve('sentiment', refresh=True, token='secret')
+    assert brief['refreshed'] and brief['data']['version'] == 2
+
+
+def test_endpoint_refresh_without_token_is_forbidden(scheduler, monkeypatch):
+    advanced_app = load_advanced_app()
+    generate = StubGenerator()
+    scheduler.register('earnings_calendar', generate)
+    monkeypatch.setattr(advanced_app, 'brief_scheduler', scheduler)
+    monkeypatch.setenv('BRIEF_REFRESH_TOKEN', 'secret')
+    flask_app = Flask(__name__)
+
+    with flask_app.test_request_context('/api/earnings-calendar?symbols=aapl'):
+        response = advanced_app.earnings_calendar()
+    assert response.get_json()['success'] and response.get_json()['symbols'] == ['AAPL']
+
+    with flask_app.test_request_context('/api/earnings-calendar?symbols=aapl&refresh=true'):
+        response, status = advanced_app.earnings_calendar()
+    assert status == 403
+    assert REFRESH_TOKEN_HEADER in response.get_json()['error']
+
+    with flask_app.test_request_context('/api/earnings-calendar?symbols=aapl&refresh=true',
+                                        headers={REFRESH_TOKEN_HEADER: 'secret'}):
+        response = advanced_app.earnings_calendar()
+    assert response.get_json()['brief']['refreshed']
+    assert len(generate.calls) == 2
@@ -0,0 +1,158 @@
+"""
+Tests for the cached, parallel portfolio loader (services/portfolio_loader.py)
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import portfolio_loader
+from services.portfolio_loader import PortfolioLoader
+
+
+class FakeQuery:
+    """The slice of the Supabase query builder PortfolioLoader uses"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.trader_id = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.trader_id = value
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.db.queries.append((self.table, self.trader_id))
+        gate = self.db.gates.get(self.table)
+        if gate is not None:
+            self.db.waiting.set()
+            gate.wait(5)
+        rows = [dict(row) for row in self.db.rows[self.table] if row['trader_id'] == self.trader_id]
+        return SimpleNamespace(data=rows)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.rows = {
+            'traders': [{'trader_id': 't1', 'name': 'Ada'}],
+            'positions': [{'trader_id': 't1', 'symbol': 'AAPL', 'quantity': 10}],
+            'trades': [{'trader_id': 't1', 'symbol': 'AAPL', 'realized_pnl': 12.5},
+                       {'trader_id': 't1', 'symbol': 'MSFT', 'realized_pnl': None}],
+        }
+        self.queries = []
+        self.gates = {}
+        self.waiting = threading.Event()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def fetches(self, trader_id='t1'):
+        return self.queries.count(('traders', trader_id))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(portfolio_loader, 'time', SimpleNamespace(time=lambda: now[0], perf_counter=time.perf_counter))
+    return now
+
+
+@pytest.fixture
+def db():
+    return FakeSupabase()
+
+
+@pytest.fixture
+def loader(db):
+    loader = PortfolioLoader(db, ttl=10)
+    yield loader
+    loader.executor.shutdown(wait=False)
+
+
+def test_assembles_portfolio(loader, db, clock):
+    portfolio = loader.load('t1')
+    assert portfolio['trader']['name'] == 'Ada'
+    assert [p['symbol'] for p in portfolio['positions']] == ['AAPL']
+    assert portfolio['total_pnl'] == 12.5
+    assert sorted(db.queries) == [('positions', 't1'), ('traders', 't1'), ('trades', 't1')]
+
+
+def test_cached_for_ttl(loader, db, clock):
+    loader.load('t1')
+    clock[0] += 9.9
+    db.rows['positions'][0]['quantity'] = 20
+    assert loader.load('t1')['positions'][0]['quantity'] == 10
+    assert db.fetches() == 1
+    clock[0] += 0.1
+    assert loader.load('t1')['positions'][0]['quantity'] == 20
+    assert db.fetches() == 2
+    stats = loader.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_callers_get_copies(loader, clock):
+    loader.load('t1')['positions'].clear()
+    assert len(loader.load('t1')['positions']) == 1
+
+
+def test_unknown_trader_not_cached(loader, db, clock):
+    assert loader.load('t2') is None
+    db.rows['traders'].append({'trader_id': 't2', 'name': 'Grace'})
+    assert loader.load('t2')['trader']['name'] == 'Grace'
+    assert PortfolioLoader(None).load('t1') is None
+
+
+def test_invalidate_after_write(loader, db, clock):
+    loader.load('t1')
+    db.rows['positions'].append({'trader_id': 't1', 'symbol': 'NVDA', 'quantity': 5})
+    assert loader.invalidate('t1') == 1
+    assert [p['symbol'] for p in loader.load('t1')['positions']] == ['AAPL', 'NVDA']
+    assert loader.invalidate('nobody') == 0
+    assert loader.invalidate() == 1
+    assert loader.get_stats()['entries'] == 0
+
+
+@pytest.mark.parametrize('trader_id', ['t1', None])
+def test_fetch_racing_a_write_is_not_cached(loader, db, clock, trader_id):
+    # The trades query is still in flight when the write lands and invalidates
+    db.gates['trades'] = threading.Event()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(loader.load('t1')))
+    reader.start()
+    assert db.waiting.wait(5)
+    db.rows['positions'][0]['quantity'] = 20
+    loader.invalidate(trader_id)
+    db.gates['trades'].set()
+    reader.join(5)
+
+    # The racing reader gets what it read, but it is not kept
+    assert result[0] is not None
+    assert loader.get_stats()['entries'] == 0
+    del db.gates['trades']
+    assert loader.load('t1')['positions'][0]['quantity'] == 20
+    assert db.fetches() == 2
+
+
+def test_concurrent_misses_share_one_fetch(loader, db, clock):
+    db.gates['trades'] = threading.Event()
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(loader.load('t1'))) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    assert db.waiting.wait(5)
+    db.gates['trades'].set()
+    for reader in readers:
+        reader.join(5)
+    assert len(results) == 4 and db.fetches() == 1
@@ -0,0 +1,57 @@
+"""
+Tests for token-budgeted prompt assembly (utils/prompt_builder.py)
+"""
+
+from utils.prompt_builder import PromptBuilder, estimate_tokens, round_value, table_rows
+
+
+def _render(sections):
+    return '\n\n'.join(f"{name}:\n{text}" for name, text in sections.items())
+
+
+def test_fits_without_truncation():
+    builder = PromptBuilder('test_prompt', budget=1000).add('notes', ['a', 'b', 'c'])
+    prompt = builder.build(_render)
+    assert 'a\nb\nc' in prompt
+    assert builder.dropped == {}
+    assert builder.tokens == estimate_tokens(prompt)
+
+
+def test_cuts_highest_priority_number_first():
+    builder = (PromptBuilder('test_prompt', budget=60)
+               .add('profile', 'risk_tolerance: moderate', priority=0)
+               .add('positions', [f'position {i} ' + 'x' * 20 for i in range(5)], priority=2)
+               .add('trades', [f'trade {i} ' + 'y' * 20 for i in range(10)], priority=3))
+    prompt = builder.build(_render)
+    assert builder.tokens <= 60
+    assert 'risk_tolerance: moderate' in prompt
+    # Trades go before any position does
+    assert builder.dropped['trades'] > 0
+    assert builder.dropped['trades'] == 10 or 'positions' not in builder.dropped
+    assert 'more omitted' in prompt
+
+
+def test_keeps_leading_lines_and_min_items():
+    builder = PromptBuilder('test_prompt', budget=10).add('quotes', [f'row {i} ' + 'z' * 30 for i in range(6)],
+                                                          min_items=2)
+    prompt = builder.build(_render)
+    assert 'row 0' in prompt and 'row 1' in prompt
+    assert 'row 2' not in prompt
+    assert builder.dropped == {'quotes': 4}
+    # Over budget is tolerated once nothing more may be cut
+    assert builder.tokens > 10
+
+
+def test_table_header_survives_truncation():
+    records = [{'symbol': f'S{i}', 'quantity': i, 'current_price': 100 + i} for i in range(20)]
+    builder = PromptBuilder('test_prompt', budget=20).add_table('positions', records,
+                                                                ('symbol', 'quantity', 'current_price'))
+    prompt = builder.build(_render)
+    assert 'symbol|quantity|current_price' in prompt
+
+
+def test_compact_values():
+    assert round_value(190.12345) == 190.12
+    assert round_value(0.0123456) == 0.01235
+    assert round_value(float('nan')) is None
+    assert table_rows([{'symbol': 'AAPL', 'sector': None}], ('symbol', 'sector')) == ['symbol', 'AAPL']
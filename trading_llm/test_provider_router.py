@@ -0,0 +1,104 @@
+"""
+Tests for adaptive provider ordering (services/provider_router.py)
+"""
+
+import pytest
+
+from services.http_client import ProviderHTTPClient
+from services.provider_router import ProviderRouter
+from utils.circuit_breaker import CircuitBreaker
+from utils.rate_limiter import TokenBucket
+
+PROVIDERS = ('finnhub', 'alpha_vantage', 'yahoo_finance')
+
+
+@pytest.fixture
+def router():
+    breakers = {name: CircuitBreaker(name, failure_threshold=5, min_calls=10) for name in PROVIDERS}
+    clients = {name: ProviderHTTPClient(name, breaker=breakers[name]) for name in PROVIDERS}
+    limiters = {name: TokenBucket(rate=1, burst=5) for name in PROVIDERS}
+    router = ProviderRouter(clients, breakers, limiters)
+    yield router
+    for client in clients.values():
+        client.close()
+
+
+def record(router, provider, latencies, ok=True):
+    for elapsed in latencies:
+        router.http_clients[provider].record_request(elapsed, ok)
+
+
+def test_priors_keep_original_order(router):
+    assert router.rank(list(PROVIDERS)) == ['finnhub', 'alpha_vantage', 'yahoo_finance']
+    assert router.score('finnhub')['latency_source'] == 'prior'
+
+
+def test_follows_ewma_latency(router):
+    record(router, 'finnhub', [0.2] * 5)
+    record(router, 'yahoo_finance', [0.1] * 5)
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['yahoo_finance', 'finnhub']
+    # Finnhub speeds up; the recent samples outweigh the old ones
+    record(router, 'finnhub', [0.02] * 10)
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['finnhub', 'yahoo_finance']
+
+
+def test_fat_tail_costs_more_than_mean(router):
+    # Lower EWMA, but one request in ten takes two seconds
+    record(router, 'finnhub', [2.0, 2.0] + [0.1] * 18)
+    record(router, 'yahoo_finance', [0.3] * 20)
+    score = router.score('finnhub')
+    assert score['p95_latency_ms'] == 2000.0
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['yahoo_finance', 'finnhub']
+
+    router.tail_weight = 0.0
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['finnhub', 'yahoo_finance']
+
+
+def test_error_rate_demotes_provider(router):
+    record(router, 'finnhub', [0.2] * 10)
+    record(router, 'yahoo_finance', [0.25] * 10)
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['finnhub', 'yahoo_finance']
+    # A third of finnhub's calls fail: not enough to trip the breaker, enough to lose
+    for _ in range(5):
+        record(router, 'finnhub', [0.2], ok=False)
+        record(router, 'finnhub', [0.2])
+    score = router.score('finnhub')
+    assert score['circuit_state'] == CircuitBreaker.CLOSED
+    assert score['success_probability'] < router.score('yahoo_finance')['success_probability']
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['yahoo_finance', 'finnhub']
+
+
+def test_open_breaker_goes_last(router):
+    record(router, 'finnhub', [0.01] * 5)
+    record(router, 'finnhub', [0.01] * 5, ok=False)
+    assert router.score('finnhub')['circuit_state'] == CircuitBreaker.OPEN
+    assert router.rank(list(PROVIDERS))[-1] == 'finnhub'
+    assert router.get_stats()['recent_decisions'][-1]['reason'] == 'lowest expected cost'
+
+    for name in ('alpha_vantage', 'yahoo_finance'):
+        record(router, name, [0.01] * 5, ok=False)
+    router.rank(list(PROVIDERS))
+    assert router.get_stats()['recent_decisions'][-1]['reason'] == 'all circuits open'
+
+
+def test_exhausted_quota_is_waited_for(router):
+    record(router, 'finnhub', [0.1] * 5)
+    record(router, 'yahoo_finance', [0.5] * 5)
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['finnhub', 'yahoo_finance']
+    # The next finnhub token is a second away
+    router.rate_limiters['finnhub'].drain()
+    assert router.score('finnhub')['quota_wait_ms'] == pytest.approx(1000, abs=50)
+    assert router.rank(['finnhub', 'yahoo_finance']) == ['yahoo_finance', 'finnhub']
+
+
+def test_pinned_provider_first_and_decision_logged(router):
+    record(router, 'finnhub', [0.05] * 5)
+    router.pin('yahoo_finance')
+    assert router.rank(list(PROVIDERS), 'AAPL')[0] == 'yahoo_finance'
+    decision = router.get_stats()['recent_decisions'][-1]
+    assert decision['symbol'] == 'AAPL' and decision['chosen'] == 'yahoo_finance'
+    assert decision['reason'] == 'pinned to yahoo_finance'
+    assert set(decision['scores']) == set(PROVIDERS)
+
+    router.pin(None)
+    assert router.rank(list(PROVIDERS))[0] == 'finnhub'
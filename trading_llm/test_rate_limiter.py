@@ -0,0 +1,111 @@
+"""
+Tests for the per-provider token bucket (utils/rate_limiter.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from utils.rate_limiter import TokenBucket, get_rate_limiter
+
+
+def test_burst_then_empty():
+    bucket = TokenBucket(rate=1, burst=3)
+    assert all(bucket.try_acquire() for _ in range(3))
+    assert not bucket.try_acquire()
+    assert bucket.get_stats()['rejected'] == 1
+
+
+def test_refills_at_rate():
+    bucket = TokenBucket(rate=20, burst=1)
+    assert bucket.try_acquire()
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    # One token at 20/s takes about 50ms
+    assert 0.03 <= time.monotonic() - start < 0.5
+
+
+def test_rejects_straight_away_when_deadline_too_short():
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.try_acquire()
+    start = time.monotonic()
+    assert not bucket.acquire(timeout=0.1)
+    # The next token is a second away, so there is no point waiting for it
+    assert time.monotonic() - start < 0.05
+
+
+def test_time_until_available():
+    bucket = TokenBucket(rate=10, burst=5)
+    assert bucket.time_until_available(5) == 0
+    bucket.drain()
+    assert bucket.time_until_available(1) == pytest.approx(0.1, abs=0.02)
+
+
+def test_concurrent_callers_never_exceed_budget():
+    bucket = TokenBucket(rate=0.001, burst=10)
+    granted = []
+    lock = threading.Lock()
+
+    def worker():
+        if bucket.try_acquire():
+            with lock:
+                granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 10
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0)
+
+
+def test_shared_per_provider():
+    first = get_rate_limiter('test_provider', 60, 2)
+    assert get_rate_limiter('test_provider', 60, 2) is first
+    assert first.rate == 1 and first.burst == 2
+
+
+def test_later_override_reconfigures_shared_bucket():
+    limiter = get_rate_limiter('test_override', 60, 2)
+    assert get_rate_limiter('test_override', 120, 5) is limiter
+    assert limiter.rate == 2 and limiter.burst == 5
+    # Shrinking the burst drops tokens beyond it
+    get_rate_limiter('test_override', 120, 1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+
+def test_configure_wakes_waiters():
+    bucket = TokenBucket(rate=0.5, burst=1)
+    bucket.try_acquire()
+    result = []
+
+    def waiter():
+        start = time.monotonic()
+        result.append((bucket.acquire(timeout=5), time.monotonic() - start))
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    # The next token was 2s away; at the new rate it is due at once
+    bucket.configure(rate=100, burst=1)
+    thread.join(5)
+    granted, waited = result[0]
+    assert granted
+    assert waited < 1
+
+
+def test_more_tokens_than_burst():
+    bucket = TokenBucket(rate=1, burst=3)
+    with pytest.raises(ValueError):
+        bucket.acquire(4)
+    with pytest.raises(ValueError):
+        bucket.try_acquire(4)
@@ -0,0 +1,99 @@
+"""
+Tests for per-request market data sharing (services/request_context.py)
+"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from market_data_service import MarketDataService
+from services import llm_cache
+from services.llm_cache import LLMResponseCache
+from services.request_context import RequestDataContext
+
+
+class StubService:
+    """get_multiple_stocks_data that records every batch it is asked for"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.price = 100.0
+
+    def get_multiple_stocks_data(self, symbols, period='1d'):
+        self.calls.append((list(symbols), period))
+        time.sleep(self.latency)
+        return {s: {'symbol': s, 'current_price': self.price} for s in symbols}
+
+
+def test_repeated_lookups_fetch_once():
+    service = StubService()
+    context = RequestDataContext(service)
+    first = context.get(['aapl', 'MSFT'])
+    second = context.get(['MSFT', 'AAPL', 'MSFT'])
+    assert service.calls == [(['AAPL', 'MSFT'], '1d')]
+    assert context.fetches == 1
+    assert list(second) == ['MSFT', 'AAPL']
+    assert second['AAPL'] is first['AAPL']
+
+
+def test_only_missing_symbols_go_upstream():
+    service = StubService()
+    context = RequestDataContext(service, period='5d')
+    context.get(['AAPL', 'MSFT'])
+    result = context.get(['MSFT', 'NVDA', 'nvda'])
+    assert service.calls == [(['AAPL', 'MSFT'], '5d'), (['NVDA'], '5d')]
+    assert sorted(result) == ['MSFT', 'NVDA']
+
+
+def test_concurrent_consumers_share_one_fetch():
+    service = StubService(latency=0.1)
+    context = RequestDataContext(service)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(context.get(['AAPL', 'MSFT']))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(service.calls) == 1
+    assert len(results) == 4 and all(sorted(r) == ['AAPL', 'MSFT'] for r in results)
+
+
+def test_nothing_leaks_between_requests():
+    service = StubService()
+    first = RequestDataContext(service)
+    assert first.get(['AAPL'])['AAPL']['current_price'] == 100.0
+    # The next request sees the new price rather than the last request's copy
+    service.price = 105.0
+    second = RequestDataContext(service)
+    assert second.get(['AAPL'])['AAPL']['current_price'] == 105.0
+    assert first.get(['AAPL'])['AAPL']['current_price'] == 100.0
+    assert len(service.calls) == 2
+
+
+@pytest.fixture
+def market_service(monkeypatch):
+    monkeypatch.setattr(llm_cache, '_llm_cache', LLMResponseCache())
+    service = MarketDataService(finnhub_api_key='test')
+    service.gemini_model = SimpleNamespace(model_name='stub-model', generate_content=lambda prompt, **kwargs:
+                                           SimpleNamespace(text=json.dumps({'overall_sentiment': 'bullish'})))
+    stub = StubService()
+    service.get_multiple_stocks_data = stub.get_multiple_stocks_data
+    service.stub = stub
+    yield service
+    service.close()
+
+
+def test_sentiment_reuses_request_data(market_service):
+    context = RequestDataContext(market_service)
+    context.get(['AAPL', 'MSFT'])
+    sentiment = market_service.get_market_sentiment_analysis(['AAPL', 'MSFT'], context=context)
+    assert sentiment['overall_sentiment'] == 'bullish'
+    assert len(market_service.stub.calls) == 1
+
+    # Without a context the service fetches for itself
+    market_service.get_market_sentiment_analysis(['AAPL', 'MSFT'])
+    assert len(market_service.stub.calls) == 2
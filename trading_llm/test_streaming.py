@@ -0,0 +1,131 @@
+"""
+Tests for the tick store, bar aggregation and feeds (services/streaming.py)
+"""
+
+import json
+import time
+
+import pytest
+
+from services.streaming import FinnhubStreamClient, ReplayFeed, TickStore
+
+T0 = 1_760_000_040.0  # a whole minute
+
+
+def replay(store, trades):
+    return ReplayFeed(store, trades).run()
+
+
+def test_one_second_and_one_minute_bars():
+    store = TickStore()
+    replay(store, [
+        ('AAPL', 100.0, 10, T0 + 0.1),
+        ('AAPL', 101.0, 5, T0 + 0.6),
+        ('AAPL', 99.5, 20, T0 + 0.9),
+        ('AAPL', 100.5, 1, T0 + 1.2),
+        ('AAPL', 102.0, 3, T0 + 61.0),
+    ])
+    seconds = store.get_bars('aapl', '1s', limit=0)
+    assert [bar['time'] for bar in seconds] == [T0, T0 + 1, T0 + 61]
+    assert seconds[0] == {'time': T0, 'open': 100.0, 'high': 101.0, 'low': 99.5, 'close': 99.5,
+                          'volume': 35.0, 'trades': 3}
+
+    minutes = store.get_bars('AAPL', '1m', limit=0)
+    assert [bar['time'] for bar in minutes] == [T0, T0 + 60]
+    assert minutes[0]['open'] == 100.0 and minutes[0]['close'] == 100.5
+    assert minutes[0]['high'] == 101.0 and minutes[0]['low'] == 99.5
+    assert minutes[0]['volume'] == 36.0 and minutes[0]['trades'] == 4
+
+
+def test_last_bar_is_still_forming():
+    store = TickStore()
+    store.add_tick('MSFT', 400.0, 1, T0 + 5)
+    assert store.get_bars('MSFT', '1m')[-1]['close'] == 400.0
+    store.add_tick('MSFT', 402.0, 2, T0 + 30)
+    forming = store.get_bars('MSFT', '1m')[-1]
+    assert len(store.get_bars('MSFT', '1m')) == 1
+    assert forming['close'] == 402.0 and forming['high'] == 402.0 and forming['volume'] == 3.0
+
+
+def test_late_ticks():
+    store = TickStore()
+    store.add_tick('TSLA', 250.0, 1, T0 + 10)
+    store.add_tick('TSLA', 251.0, 1, T0 + 70)
+    # Belongs to the closed first minute: bars ignore it, the tick buffer keeps it
+    store.add_tick('TSLA', 999.0, 1, T0 + 20)
+    bars = store.get_bars('TSLA', '1m')
+    assert [bar['high'] for bar in bars] == [250.0, 251.0]
+    assert list(store.get_ticks('TSLA')['price']) == [250.0, 251.0, 999.0]
+    # An older trade never replaces the last price
+    assert store.last_price('TSLA') == (251.0, T0 + 70)
+
+    # Out of order inside the forming bar still counts toward it
+    store.add_tick('TSLA', 240.0, 4, T0 + 65)
+    forming = store.get_bars('TSLA', '1m')[-1]
+    assert forming['low'] == 240.0 and forming['volume'] == 5.0 and forming['trades'] == 2
+
+
+def test_ring_buffer_wraps():
+    store = TickStore(capacity=4)
+    for i in range(6):
+        store.add_tick('NVDA', 100.0 + i, 1, T0 + i)
+    ticks = store.get_ticks('NVDA')
+    assert list(ticks['price']) == [102.0, 103.0, 104.0, 105.0]
+    assert list(ticks['ts']) == [T0 + 2, T0 + 3, T0 + 4, T0 + 5]
+    assert list(store.get_ticks('NVDA', limit=2)['price']) == [104.0, 105.0]
+    stats = store.get_stats()['symbols']['NVDA']
+    assert stats['ticks_received'] == 6 and stats['ticks_buffered'] == 4
+
+
+def test_completed_bars_are_bounded():
+    store = TickStore(max_bars=3)
+    for i in range(10):
+        store.add_tick('AMZN', 100.0 + i, 1, T0 + i)
+    bars = store.get_bars('AMZN', '1s', limit=0)
+    # Three completed bars plus the forming one
+    assert [bar['close'] for bar in bars] == [106.0, 107.0, 108.0, 109.0]
+
+
+def test_unknown_symbol_and_interval():
+    store = TickStore()
+    assert store.last_price('NONE') is None
+    assert store.get_bars('NONE') == []
+    assert len(store.get_ticks('NONE')['price']) == 0
+    with pytest.raises(ValueError):
+        store.get_bars('NONE', '5m')
+
+
+def test_finnhub_trade_messages():
+    store = TickStore()
+    client = FinnhubStreamClient('key', store)
+    client.handle_message(json.dumps({'type': 'ping'}))
+    client.handle_message(json.dumps({'type': 'trade', 'data': [
+        {'s': 'AAPL', 'p': 190.5, 'v': 100, 't': int(T0 * 1000) + 250},
+        {'s': 'MSFT', 'p': 410.0, 't': int(T0 * 1000) + 500},
+    ]}))
+    assert client.messages == 1
+    assert store.last_price('AAPL') == (190.5, T0 + 0.25)
+    assert store.get_ticks('MSFT')['size'][0] == 0.0
+    assert sorted(store.symbols()) == ['AAPL', 'MSFT']
+
+
+def test_random_walk_replay():
+    store = TickStore()
+    feed = ReplayFeed.random_walk(store, {'AAPL': 190.0, 'MSFT': 410.0}, ticks_per_symbol=50,
+                                  interval=0.5, start=T0, seed=1)
+    assert feed.run() == 100
+    bars = store.get_bars('AAPL', '1s', limit=0)
+    assert len(bars) == 25
+    assert sum(bar['trades'] for bar in bars) == 50
+
+
+def test_paced_replay_stops_early():
+    store = TickStore()
+    # One trade per simulated second at 10x: about 0.1s apart
+    feed = ReplayFeed(store, [('AAPL', 100.0 + i, 1, T0 + i) for i in range(100)], speed=10).start()
+    while store.last_price('AAPL') is None:
+        time.sleep(0.005)
+    feed.stop()
+    stats = feed.get_stats()
+    assert not stats['running']
+    assert 0 < stats['replayed'] < 100
@@ -0,0 +1,81 @@
+"""
+Tests for incremental indicators (utils/streaming_indicators.py) against the vectorized ones
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from utils.indicators import compute_indicators
+from utils.streaming_indicators import IndicatorState
+
+COMPARED = ('ma_20', 'ma_50', 'ma_200', 'rsi', 'macd', 'macd_signal', 'macd_histogram',
+            'bb_upper', 'bb_middle', 'bb_lower', 'avg_volume')
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, 300))
+    volume = rng.uniform(1e5, 1e6, 300)
+    return close, volume
+
+
+def assert_matches(snapshot, expected):
+    for name in COMPARED:
+        if np.isnan(expected[name]):
+            assert snapshot[name] is None, name
+        else:
+            assert snapshot[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+
+def test_seed_matches_compute_indicators(prices):
+    close, volume = prices
+    snapshot = IndicatorState().seed(close, volume)
+    series = compute_indicators(close, volume)
+    assert_matches(snapshot, {name: series[name][-1, 0] for name in COMPARED})
+    assert snapshot['bars'] == len(close)
+
+
+def test_every_bar_matches_while_warming_up(prices):
+    close, volume = prices
+    series = compute_indicators(close, volume)
+    state = IndicatorState()
+    for t in (0, 13, 14, 25, 49, 199, 250):
+        while state.bars <= t:
+            state.update(close[state.bars], volume[state.bars])
+        assert_matches(state.snapshot(), {name: series[name][t, 0] for name in COMPARED})
+
+
+def test_peek_matches_update_without_committing(prices):
+    close, volume = prices
+    state = IndicatorState()
+    state.seed(close[:-1], volume[:-1])
+    preview = state.snapshot(close[-1])
+    assert state.bars == len(close) - 1
+    committed = state.update(close[-1], volume[-1])
+    for name in COMPARED:
+        if name != 'avg_volume':
+            assert preview[name] == pytest.approx(committed[name]), name
+
+
+def test_checkpoint_round_trip(prices):
+    close, volume = prices
+    state = IndicatorState()
+    state.seed(close[:200], volume[:200], np.arange(200) * 86400.0)
+    restored = IndicatorState.restore(json.loads(json.dumps(state.checkpoint())))
+    assert restored.last_bar_time == state.last_bar_time
+    assert restored.recent_closes() == state.recent_closes()
+    for price, vol in zip(close[200:], volume[200:]):
+        state.update(price, vol)
+        restored.update(price, vol)
+    assert restored.snapshot() == state.snapshot()
+
+
+def test_recent_closes_window():
+    state = IndicatorState(history_size=5)
+    state.seed([1, 2, 3, 4, 5, 6, 7])
+    assert state.recent_closes() == [3, 4, 5, 6, 7]
+    assert state.recent_closes(8) == [4, 5, 6, 7, 8]
+    assert state.recent_closes() == [3, 4, 5, 6, 7]
@@ -0,0 +1,126 @@
+"""
+Tests for stale-while-revalidate caching (market_data_service.py)
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import market_data_service
+from market_data_service import MarketDataService
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(market_data_service, 'time', SimpleNamespace(
+        time=lambda: now[0], perf_counter=time.perf_counter, monotonic=time.monotonic, sleep=time.sleep))
+    return now
+
+
+@pytest.fixture
+def service(clock):
+    service = MarketDataService(finnhub_api_key='test', stale_max_age=900)
+    yield service
+    service.close()
+
+
+class StubFetcher:
+    """Stands in for _fetch_finnhub_profile: caches a new profile per call, optionally blocking"""
+
+    def __init__(self, service, block=False):
+        self.service = service
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, symbol, wait=None):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        profile = {'sector': 'Technology', 'version': self.calls}
+        self.service._cache_data(f"finnhub_profile_{symbol.upper()}", profile, ttl=60, max_age=300)
+        return profile
+
+
+def wait_for_refresh(service, cache_key):
+    deadline = time.monotonic() + 5
+    while cache_key in service._refreshing and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_fresh_entry_served_without_fetch(service, clock):
+    fetcher = StubFetcher(service)
+    service._fetch_finnhub_profile = fetcher
+    service._cache_data('finnhub_profile_AAPL', {'sector': 'Technology'}, ttl=60, max_age=300)
+    clock[0] += 59
+    assert service.get_finnhub_profile('AAPL') == {'sector': 'Technology'}
+    assert fetcher.calls == 0
+
+
+def test_stale_entry_served_while_refreshing_once(service, clock):
+    fetcher = StubFetcher(service, block=True)
+    service._fetch_finnhub_profile = fetcher
+    service._cache_data('finnhub_profile_AAPL', {'sector': 'Technology', 'version': 0}, ttl=60, max_age=300)
+    clock[0] += 120
+
+    results = [service.get_finnhub_profile('AAPL') for _ in range(5)]
+    assert fetcher.started.wait(5)
+    for result in results:
+        assert result['version'] == 0
+        assert result['stale'] is True and result['age_seconds'] == 120.0
+    # The cached copy itself is never flagged
+    assert 'stale' not in service.cache['finnhub_profile_AAPL']['data']
+
+    fetcher.release.set()
+    wait_for_refresh(service, 'finnhub_profile_AAPL')
+    # Five stale reads, one upstream call
+    assert fetcher.calls == 1
+    assert service.get_finnhub_profile('AAPL') == {'sector': 'Technology', 'version': 1}
+    assert service.cache_stats.report({})['namespaces']['finnhub_profile']['stale_hits'] == 5
+
+
+def test_refresh_can_run_again_after_failure(service, clock):
+    calls = []
+
+    def failing(symbol, wait=None):
+        calls.append(symbol)
+        raise RuntimeError('upstream down')
+
+    service._fetch_finnhub_profile = failing
+    service._cache_data('finnhub_profile_AAPL', {'sector': 'Technology'}, ttl=60, max_age=300)
+    clock[0] += 120
+    assert service.get_finnhub_profile('AAPL')['stale'] is True
+    wait_for_refresh(service, 'finnhub_profile_AAPL')
+    assert service.get_finnhub_profile('AAPL')['stale'] is True
+    wait_for_refresh(service, 'finnhub_profile_AAPL')
+    assert calls == ['AAPL', 'AAPL']
+
+
+def test_hard_expired_entry_fetched_synchronously(service, clock):
+    fetcher = StubFetcher(service)
+    service._fetch_finnhub_profile = fetcher
+    service._cache_data('finnhub_profile_AAPL', {'sector': 'Technology', 'version': 0}, ttl=60, max_age=300)
+    clock[0] += 300
+
+    assert service._get_cached_or_stale('finnhub_profile_AAPL', fetcher) is None
+    assert 'finnhub_profile_AAPL' not in service.cache
+    assert not service._refreshing
+
+    service._cache_data('finnhub_profile_AAPL', {'sector': 'Technology', 'version': 0}, ttl=60, max_age=300)
+    clock[0] += 300
+    # Through the public getter the caller waits for upstream instead
+    assert service.get_finnhub_profile('AAPL') == {'sector': 'Technology', 'version': 1}
+    assert fetcher.calls == 1
+    counters = service.cache_stats.report({})['namespaces']['finnhub_profile']
+    assert counters['evictions'] == 2 and counters['misses'] == 2
+
+
+def test_max_age_never_below_ttl(service, clock):
+    service._cache_data('finnhub_quote_AAPL', {'current_price': 190.0}, ttl=1200, max_age=60)
+    clock[0] += 1000
+    assert service._get_cached_or_stale('finnhub_quote_AAPL', lambda: None) == {'current_price': 190.0}
@@ -0,0 +1,109 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# Cache key prefixes, longest first so 'alpha_overview' wins over 'alpha'
+CACHE_NAMESPACES = ('finnhub_quote', 'finnhub_profile', 'alpha_overview', 'alpha', 'yf', 'gemini')
+
+
+def split_cache_key(cache_key: str) -> Tuple[str, Optional[str]]:
+    """(namespace, symbol) for a MarketDataService cache key"""
+    for namespace in CACHE_NAMESPACES:
+        prefix = namespace + '_'
+        if cache_key.startswith(prefix):
+            rest = cache_key[len(prefix):]
+            return namespace, rest.split('_', 1)[0].upper() or None
+    return cache_key.split('_', 1)[0], None
+
+
+class CacheStats:
+    """Per-namespace hit/miss/stale/eviction counters for the market data cache.
+
+    "Latency saved" on a hit is what the entry cost to fetch upstream, as
+    measured between the miss and the store that filled it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, Dict] = {}
+        self._key_hits = Counter()
+
+    def _ns(self, cache_key: str) -> Dict:
+        namespace, _ = split_cache_key(cache_key)
+        counters = self._namespaces.get(namespace)
+        if counters is None:
+            counters = self._namespaces[namespace] = {
+                'hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0,
+                'evictions': 0, 'latency_saved': 0.0, 'fetch_latency': 0.0, 'fetches_timed': 0,
+            }
+        return counters
+
+    def record_hit(self, cache_key: str, fetch_latency: float = None, stale: bool = False) -> None:
+        with self._lock:
+            counters = self._ns(cache_key)
+            counters['stale_hits' if stale else 'hits'] += 1
+            if fetch_latency:
+                counters['latency_saved'] += fetch_latency
+            self._key_hits[cache_key] += 1
+
+    def record_miss(self, cache_key: str) -> None:
+        with self._lock:
+            self._ns(cache_key)['misses'] += 1
+
+    def record_store(self, cache_key: str, fetch_latency: float = None) -> None:
+        with self._lock:
+            counters = self._ns(cache_key)
+            counters['stores'] += 1
+            if fetch_latency is not None:
+                counters['fetch_latency'] += fetch_latency
+                counters['fetches_timed'] += 1
+
+    def record_eviction(self, cache_key: str, count: int = 1) -> None:
+        with self._lock:
+            self._ns(cache_key)['evictions'] += count
+
+    def report(self, entries: Dict[str, Dict], top_n: int = 10) -> Dict:
+        """Counters merged with a scan of the current ``entries`` (cache key -> entry)"""
+        sizes: Dict[str, Dict] = {}
+        for cache_key, entry in entries.items():
+            namespace, _ = split_cache_key(cache_key)
+            size = sizes.setdefault(namespace, {'entries': 0, 'bytes': 0})
+            size['entries'] += 1
+            size['bytes'] += entry.get('size_bytes', 0)
+
+        with self._lock:
+            namespaces = {name: dict(c) for name, c in self._namespaces.items()}
+            hottest = self._key_hits.most_common(top_n)
+
+        report = {}
+        for name in sorted(set(namespaces) | set(sizes)):
+            c = namespaces.get(name, {})
+            size = sizes.get(name, {'entries': 0, 'bytes': 0})
+            hits, stale_hits, misses = c.get('hits', 0), c.get('stale_hits', 0), c.get('misses', 0)
+            lookups = hits + stale_hits + misses
+            served = hits + stale_hits
+            report[name] = {
+                'hits': hits,
+                'stale_hits': stale_hits,
+                'misses': misses,
+                'hit_rate': round(served / lookups, 3) if lookups else None,
+                'evictions': c.get('evictions', 0),
+                'entries': size['entries'],
+                'bytes': size['bytes'],
+                'avg_entry_bytes': round(size['bytes'] / size['entries']) if size['entries'] else 0,
+                'avg_latency_saved_ms': round(c['latency_saved'] / served * 1000, 2) if served else 0.0,
+                'total_latency_saved_s': round(c.get('latency_saved', 0.0), 3),
+                'avg_fetch_latency_ms': round(c['fetch_latency'] / c['fetches_timed'] * 1000, 2) if c.get('fetches_timed') else None,
+            }
+        return {
+            'namespaces': report,
+            'total_entries': sum(s['entries'] for s in sizes.values()),
+            'total_bytes': sum(s['bytes'] for s in sizes.values()),
+            'hottest_keys': [{'key': key, 'hits': hits} for key, hits in hottest],
+        }
+
+    def forget_keys(self, keys) -> None:
+        """Drop hottest-key counts for keys that were cleared"""
+        with self._lock:
+            for key in keys:
+                self._key_hits.pop(key, None)
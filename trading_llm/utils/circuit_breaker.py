@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, provider: str, retry_after: float = 0.0):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} circuit open, skipping for {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+
+    Closed: calls flow and outcomes are tracked in a sliding window. The
+    circuit opens after ``failure_threshold`` consecutive failures, or when the
+    window's error rate reaches ``error_rate_threshold`` (once ``min_calls``
+    outcomes are known). Open: calls are rejected immediately until
+    ``cooldown`` seconds pass. Half-open: up to ``half_open_max_calls`` probes
+    are let through; a success closes the circuit, a failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 window_size: int = 20, min_calls: int = 10, cooldown: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._window = deque(maxlen=window_size)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._times_opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def _open(self, now: float) -> None:
+        self._state = self.OPEN
+        self._opened_at = now
+        self._half_open_in_flight = 0
+        self._times_opened += 1
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the provider right now (claims a probe slot when half-open)"""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == self.OPEN:
+                self._rejected += 1
+                return False
+            if self._state == self.HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._window.clear()
+            self._window.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._consecutive_failures += 1
+            self._window.append(False)
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+            elif self._state == self.CLOSED and self._should_trip():
+                self._open(now)
+
+    def _should_trip(self) -> bool:
+        if self._consecutive_failures >= self.failure_threshold:
+            return True
+        if len(self._window) >= self.min_calls:
+            failures = sum(1 for ok in self._window if not ok)
+            return failures / len(self._window) >= self.error_rate_threshold
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit starts probing again"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            calls = len(self._window)
+            failures = sum(1 for ok in self._window if not ok)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'window_calls': calls,
+                'window_error_rate': round(failures / calls, 3) if calls else 0.0,
+                'times_opened': self._times_opened,
+                'rejected_calls': self._rejected,
+            }
@@ -0,0 +1,166 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def _as_panel(values) -> np.ndarray:
+    """Coerce to a float64 (time x symbols) array; 1-D input becomes one column"""
+    panel = np.asarray(values, dtype=np.float64)
+    return panel[:, None] if panel.ndim == 1 else panel
+
+
+def _window(panel: np.ndarray, window: int, clip: bool) -> int:
+    return max(1, min(window, len(panel))) if clip else window
+
+
+def rolling_mean(panel: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average down each column; NaN until a full window of valid values"""
+    out = np.full(panel.shape, np.nan)
+    if window <= len(panel):
+        out[window - 1:] = sliding_window_view(panel, window, axis=0).mean(axis=-1)
+    return out
+
+
+def rolling_std(panel: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    """Rolling sample standard deviation (pandas' default ddof=1)"""
+    out = np.full(panel.shape, np.nan)
+    if window <= len(panel) and window > ddof:
+        out[window - 1:] = sliding_window_view(panel, window, axis=0).std(axis=-1, ddof=ddof)
+    return out
+
+
+def ewm_mean(panel: np.ndarray, span: int) -> np.ndarray:
+    """Exponentially weighted mean matching pandas ``ewm(span=span, adjust=True).mean()``.
+
+    Leading NaNs (symbols with shorter history) stay NaN; a NaN inside the
+    series repeats the previous value while older weights keep decaying.
+    The loop runs over time only, every symbol is updated in one step.
+    """
+    decay = 1.0 - 2.0 / (span + 1.0)
+    out = np.full(panel.shape, np.nan)
+    numerator = np.zeros(panel.shape[1:])
+    denominator = np.zeros(panel.shape[1:])
+    for t in range(len(panel)):
+        row = panel[t]
+        valid = ~np.isnan(row)
+        numerator *= decay
+        denominator *= decay
+        numerator[valid] += row[valid]
+        denominator[valid] += 1.0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[t] = numerator / denominator
+    return out
+
+
+def rsi(panel: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI from simple rolling averages of gains and losses (as the services compute it)"""
+    delta = np.full(panel.shape, np.nan)
+    delta[1:] = np.diff(panel, axis=0)
+    # Like pandas' delta.where(delta > 0, 0): the first diff counts as 0, but
+    # padding before a symbol's history starts stays NaN
+    padding = np.isnan(panel)
+    with np.errstate(invalid='ignore'):
+        gain = np.where(padding, np.nan, np.where(delta > 0, delta, 0.0))
+        loss = np.where(padding, np.nan, np.where(delta < 0, -delta, 0.0))
+    gain = rolling_mean(gain, period)
+    loss = rolling_mean(loss, period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 - 100 / (1 + gain / loss)
+
+
+def compute_indicators(close, volume=None, ma_windows: Iterable[int] = (20, 50, 200), rsi_period: int = 14,
+                       macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                       bb_period: int = 20, bb_width: float = 2.0, volume_window: int = 20,
+                       clip_windows: bool = False) -> Dict[str, np.ndarray]:
+    """Every indicator for a (time x symbols) panel in one vectorized pass.
+
+    Rows are timestamps (oldest first) and columns are symbols; pad shorter
+    histories with leading NaN. Warm-up rows are NaN. With ``clip_windows``
+    a window longer than the history shrinks to the history length.
+    """
+    close = _as_panel(close)
+    out = {}
+    for window in ma_windows:
+        out[f'ma_{window}'] = rolling_mean(close, _window(close, window, clip_windows))
+
+    out['rsi'] = rsi(close, rsi_period)
+
+    macd = ewm_mean(close, macd_fast) - ewm_mean(close, macd_slow)
+    signal = ewm_mean(macd, macd_signal)
+    out['macd'] = macd
+    out['macd_signal'] = signal
+    out['macd_histogram'] = macd - signal
+
+    bb_window = _window(close, bb_period, clip_windows)
+    middle = rolling_mean(close, bb_window)
+    std = rolling_std(close, bb_window)
+    out['bb_upper'] = middle + std * bb_width
+    out['bb_middle'] = middle
+    out['bb_lower'] = middle - std * bb_width
+
+    if volume is not None:
+        volume = _as_panel(volume)
+        avg_volume = rolling_mean(volume, _window(volume, volume_window, clip_windows))
+        out['avg_volume'] = avg_volume
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out['volume_ratio'] = np.where(avg_volume > 0, volume / avg_volume, np.nan)
+    return out
+
+
+def latest_row(series: Dict[str, np.ndarray], column: int = 0) -> Dict[str, Optional[float]]:
+    """Final row of each indicator for one symbol column, None where still warming up"""
+    result = {}
+    for name, values in series.items():
+        value = values[-1, column] if len(values) else np.nan
+        result[name] = None if np.isnan(value) else float(value)
+    return result
+
+
+def last_valid(series: np.ndarray) -> np.ndarray:
+    """Last non-NaN value in each column (NaN if the column has none)"""
+    series = _as_panel(series)
+    valid = ~np.isnan(series)
+    # Index of the last valid row per column; columns with none point at row 0
+    idx = len(series) - 1 - np.argmax(valid[::-1], axis=0)
+    values = series[idx, np.arange(series.shape[1])]
+    return np.where(valid.any(axis=0), values, np.nan)
+
+
+class IndicatorPanel:
+    """Indicators for many symbols at once, aligned on a shared time index"""
+
+    def __init__(self, symbols: List[str], close: np.ndarray, volume: Optional[np.ndarray] = None,
+                 index=None, **params):
+        self.symbols = list(symbols)
+        self.index = index
+        self.close = _as_panel(close)
+        self.volume = _as_panel(volume) if volume is not None else None
+        self.series = compute_indicators(self.close, self.volume, **params)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], **params) -> 'IndicatorPanel':
+        """Build from per-symbol OHLCV frames; missing timestamps become NaN"""
+        frames = {symbol: frame for symbol, frame in frames.items() if frame is not None and len(frame)}
+        close = pd.concat({symbol: frame['Close'] for symbol, frame in frames.items()}, axis=1).sort_index()
+        volume = None
+        if all('Volume' in frame for frame in frames.values()):
+            volume = pd.concat({symbol: frame['Volume'] for symbol, frame in frames.items()}, axis=1)
+            volume = volume.reindex(close.index).to_numpy(dtype=np.float64)
+        return cls(list(close.columns), close.to_numpy(dtype=np.float64), volume, close.index, **params)
+
+    def latest(self, symbol: str = None) -> Dict:
+        """Most recent valid value of every indicator, per symbol (or for one symbol)"""
+        latest_close = last_valid(self.close)
+        columns = {name: last_valid(values) for name, values in self.series.items()}
+        result = {}
+        for i, sym in enumerate(self.symbols):
+            row = {'close': latest_close[i]}
+            row.update({name: values[i] for name, values in columns.items()})
+            result[sym] = {name: (None if np.isnan(value) else float(value)) for name, value in row.items()}
+        return result[symbol] if symbol is not None else result
+
+    def full_series(self, name: str, symbol: str = None):
+        """Whole series for one indicator: a DataFrame, or a Series for one symbol"""
+        frame = pd.DataFrame(self.series[name], index=self.index, columns=self.symbols)
+        return frame[symbol] if symbol is not None else frame
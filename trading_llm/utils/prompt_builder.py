@@ -0,0 +1,224 @@
+import json
+import logging
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Fields the model actually uses; everything else (raw info blobs, history,
+# timestamps, cache metadata) stays out of the prompt
+QUOTE_FIELDS = ('symbol', 'current_price', 'change', 'change_percent', 'volume', 'volume_ratio',
+                'market_cap', 'pe_ratio', 'sector', 'source', 'error', 'stale')
+INDICATOR_FIELDS = ('rsi', 'macd', 'macd_signal', 'ma_20', 'ma_50', 'ma_200', 'bb_upper', 'bb_lower')
+TRADER_FIELDS = ('risk_tolerance', 'investment_horizon', 'trading_style', 'experience_level')
+POSITION_FIELDS = ('symbol', 'quantity', 'avg_price', 'entry_price', 'current_price', 'unrealized_pnl', 'sector')
+TRADE_FIELDS = ('symbol', 'trade_type', 'side', 'quantity', 'price', 'realized_pnl', 'trade_date')
+
+# Token budgets per prompt; PROMPT_BUDGET_<NAME> overrides one
+DEFAULT_BUDGET = 4000
+PROMPT_BUDGETS = {
+    'gemini_market_data': 800,
+    'stock_recommendations': 1500,
+    'batch_recommendations': 4000,
+    'market_sentiment': 1500,
+    'index_sentiment': 1500,
+    'enhanced_analysis': 3000,
+    'personalized_recommendations': 3500,
+    'chat_market': 2500,
+    'chat_general': 2500,
+    # Summary plus recent turns carried into chat prompts
+    'conversation_memory': 800,
+}
+
+# Rough characters per token for English and JSON-ish text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Heuristic token count (Gemini's count_tokens would cost a round trip per prompt)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def get_prompt_budget(name: str) -> int:
+    env_value = os.getenv(f'PROMPT_BUDGET_{name.upper()}')
+    return int(env_value) if env_value else PROMPT_BUDGETS.get(name, DEFAULT_BUDGET)
+
+
+def round_value(value):
+    """Round numbers to what matters in a prompt: 2 decimals, 4 significant digits below 1"""
+    if hasattr(value, 'item'):
+        # numpy scalars
+        value = value.item()
+    if isinstance(value, (bool, int)) or not isinstance(value, float):
+        return value
+    if math.isnan(value) or math.isinf(value):
+        return None
+    if abs(value) >= 1e6:
+        return int(round(value))
+    if abs(value) >= 1 or value == 0:
+        return round(value, 2)
+    return float(f'{value:.4g}')
+
+
+def compact_number(value) -> str:
+    """Large magnitudes as 2.95T / 48.1M"""
+    value = round_value(value)
+    if not isinstance(value, (int, float)):
+        return str(value)
+    for threshold, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= threshold:
+            return f'{value / threshold:.3g}{suffix}'
+    return str(value)
+
+
+def compact_record(record: Dict, fields: Iterable[str]) -> Dict:
+    """Whitelisted, rounded copy of ``record`` without empty values"""
+    result = {}
+    for field in fields:
+        value = record.get(field)
+        if value is None or value == '' or value is False:
+            continue
+        result[field] = round_value(value)
+    return result
+
+
+def compact_quote(data: Dict) -> Dict:
+    """Market data dict flattened to quote fields plus the core indicators"""
+    result = compact_record(data, QUOTE_FIELDS)
+    for field in ('volume', 'market_cap'):
+        if field in result:
+            result[field] = compact_number(result[field])
+    indicators = data.get('technical_indicators') or {}
+    result.update(compact_record(indicators, INDICATOR_FIELDS))
+    return result
+
+
+def compact_json(value) -> str:
+    """JSON without indentation or spaces"""
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def table_rows(records: Iterable[Dict], fields: Iterable[str]) -> List[str]:
+    """Records as a header line plus one ``|``-separated row each; empty columns dropped"""
+    records = [compact_record(record, fields) for record in records]
+    columns = [field for field in fields if any(field in record for record in records)]
+    if not columns:
+        return []
+    rows = ['|'.join(columns)]
+    rows.extend('|'.join('' if record.get(c) is None else str(record[c]) for c in columns) for record in records)
+    return rows
+
+
+_prompt_stats: Dict[str, Dict] = {}
+_prompt_stats_lock = threading.Lock()
+
+
+def _record_prompt(name: str, tokens: int, budget: int, truncated: bool) -> None:
+    with _prompt_stats_lock:
+        stats = _prompt_stats.setdefault(name, {'prompts': 0, 'total_tokens': 0, 'max_tokens': 0,
+                                                'truncated': 0, 'over_budget': 0, 'budget': budget})
+        stats['prompts'] += 1
+        stats['total_tokens'] += tokens
+        stats['max_tokens'] = max(stats['max_tokens'], tokens)
+        stats['truncated'] += int(truncated)
+        stats['over_budget'] += int(tokens > budget)
+        stats['budget'] = budget
+
+
+def get_prompt_stats() -> Dict[str, Dict]:
+    """Per-prompt sizes: count, average and max estimated tokens, truncations"""
+    with _prompt_stats_lock:
+        return {name: {**stats, 'avg_tokens': round(stats['total_tokens'] / stats['prompts'])}
+                for name, stats in _prompt_stats.items()}
+
+
+class PromptBuilder:
+    """Assembles a prompt from named sections within a token budget.
+
+    Sections are lists of lines. ``priority`` 0 marks a section that is never
+    cut; otherwise, while the rendered prompt is over budget, the section
+    with the highest priority number loses its last line (so put the most
+    important lines first), down to its ``min_items``.
+    """
+
+    def __init__(self, name: str, budget: int = None):
+        self.name = name
+        self.budget = budget or get_prompt_budget(name)
+        self.sections: Dict[str, Dict] = {}
+        self.tokens = 0
+        self.dropped: Dict[str, int] = {}
+
+    def add(self, name: str, items, priority: int = 1, min_items: int = 0) -> 'PromptBuilder':
+        items = [items] if isinstance(items, str) else list(items)
+        self.sections[name] = {'items': items, 'priority': priority, 'min_items': min_items, 'dropped': 0}
+        return self
+
+    def add_table(self, name: str, records: Iterable[Dict], fields: Iterable[str], priority: int = 1,
+                  min_items: int = 0) -> 'PromptBuilder':
+        rows = table_rows(records, fields)
+        # The header row always stays with the table
+        return self.add(name, rows, priority, min_items + 1 if rows else 0)
+
+    def add_quotes(self, name: str, market_data: Dict[str, Dict], priority: int = 1,
+                   min_items: int = 0) -> 'PromptBuilder':
+        quotes = [{'symbol': symbol, **compact_quote(data)} for symbol, data in market_data.items()]
+        fields = list(dict.fromkeys(field for quote in quotes for field in quote))
+        return self.add_table(name, quotes, fields, priority, min_items)
+
+    def add_portfolio(self, portfolio: Dict = None, position_priority: int = 2,
+                      trade_priority: int = 3) -> 'PromptBuilder':
+        """'profile', 'positions' and 'trades' sections from a trader portfolio (empty without one)"""
+        portfolio = portfolio or {}
+        profile = compact_record(portfolio.get('trader') or {}, TRADER_FIELDS)
+        self.add('profile', compact_json(profile) if profile else [], priority=0)
+        self.add_table('positions', portfolio.get('positions') or [], POSITION_FIELDS, position_priority)
+        return self.add_table('trades', portfolio.get('trades') or [], TRADE_FIELDS, trade_priority)
+
+    def add_memory(self, memory: Dict = None) -> 'PromptBuilder':
+        """'conversation_summary' and 'recent_turns' sections from ``ConversationMemory.render``
+
+        Never cut here: the memory already fits its own budget.
+        """
+        memory = memory or {}
+        self.add('conversation_summary', memory.get('summary') or [], priority=0)
+        return self.add('recent_turns', memory.get('turns') or [], priority=0)
+
+    def _render_sections(self) -> Dict[str, str]:
+        rendered = {}
+        for name, section in self.sections.items():
+            text = '\n'.join(section['items'])
+            if section['dropped']:
+                text += f"\n(+{section['dropped']} more omitted)"
+            rendered[name] = text
+        return rendered
+
+    def _shrink(self) -> bool:
+        candidates = [(s['priority'], name) for name, s in self.sections.items()
+                      if s['priority'] > 0 and len(s['items']) > s['min_items']]
+        if not candidates:
+            return False
+        _, name = max(candidates)
+        section = self.sections[name]
+        section['items'].pop()
+        section['dropped'] += 1
+        return True
+
+    def build(self, render: Callable[[Dict[str, str]], str]) -> str:
+        """``render(sections)`` -> prompt text, shrinking sections until it fits the budget"""
+        prompt = render(self._render_sections())
+        self.tokens = estimate_tokens(prompt)
+        while self.tokens > self.budget and self._shrink():
+            prompt = render(self._render_sections())
+            self.tokens = estimate_tokens(prompt)
+
+        self.dropped = {name: s['dropped'] for name, s in self.sections.items() if s['dropped']}
+        truncated = bool(self.dropped)
+        _record_prompt(self.name, self.tokens, self.budget, truncated)
+        if self.tokens > self.budget:
+            logger.warning(f"Prompt {self.name} is {self.tokens} tokens, over its {self.budget} budget")
+        else:
+            logger.info(f"Prompt {self.name}: ~{self.tokens} tokens (budget {self.budget})"
+                        + (f", truncated {self.dropped}" if truncated else ""))
+        return prompt
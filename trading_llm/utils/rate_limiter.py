@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when a provider has no request budget left within the caller's deadline"""
+
+    def __init__(self, provider: str, retry_after: float = 0.0, message: str = None):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(message or f"{provider} rate limited, retry after {retry_after:.1f}s")
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Tokens refill continuously at ``rate`` per second up to ``burst``. Callers
+    either take a token immediately (``try_acquire``) or wait for one up to a
+    deadline (``acquire``); a caller is never parked longer than its deadline,
+    and is told straight away when the next token cannot arrive in time.
+    """
+
+    def __init__(self, rate: float, burst: int, name: str = ''):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.name = name
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._granted = 0
+        self._rejected = 0
+        self._waited = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Take tokens if available right now, without waiting"""
+        return self.acquire(tokens, timeout=0)
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """Take tokens, waiting at most ``timeout`` seconds (None waits indefinitely)"""
+        if tokens > self.burst:
+            # The bucket never holds that many, so waiting could not end
+            raise ValueError(f"Cannot take {tokens} tokens from {self.name or 'a'} bucket with burst {self.burst}")
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._granted += 1
+                    self._waited += now - start
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    self._rejected += 1
+                    return False
+                self._cond.wait(wait)
+
+    def configure(self, rate: float, burst: int) -> None:
+        """Change the refill rate and burst in place; waiters re-check against the new limits"""
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            self.burst = int(burst)
+            self._tokens = min(self._tokens, self.burst)
+            self._cond.notify_all()
+
+    def time_until_available(self, tokens: int = 1) -> float:
+        """Seconds until ``tokens`` could be granted"""
+        with self._cond:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the upstream answered 429"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = 0.0
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_minute': round(self.rate * 60, 2),
+                'burst': self.burst,
+                'tokens_available': round(self._tokens, 2),
+                'granted': self._granted,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._waited / self._granted * 1000, 2) if self._granted else 0.0,
+            }
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, per_minute: float, burst: int) -> TokenBucket:
+    """Process-wide limiter for a provider, shared by every service instance and thread.
+
+    The bucket is created once; a later call with different limits
+    reconfigures it in place, so the most recent configuration applies to
+    every holder.
+    """
+    rate = per_minute / 60.0
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = TokenBucket(rate, burst, name=provider)
+            _limiters[provider] = limiter
+        elif limiter.rate != rate or limiter.burst != burst:
+            logger.info(f"Rate limiter {provider} reconfigured: {limiter.rate * 60:g}/min burst {limiter.burst} "
+                        f"-> {per_minute:g}/min burst {burst}")
+            limiter.configure(rate, burst)
+        return limiter
@@ -0,0 +1,326 @@
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class EMA:
+    """Exponential moving average with O(1) updates.
+
+    Uses the bias-corrected (pandas ``adjust=True``) form, so after the same
+    inputs it equals ``Series.ewm(span=span).mean()``.
+    """
+
+    def __init__(self, span: int):
+        self.span = span
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.numerator = 0.0
+        self.denominator = 0.0
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.numerator / self.denominator if self.denominator else None
+
+    def update(self, x: float) -> float:
+        self.numerator = self.numerator * self.decay + x
+        self.denominator = self.denominator * self.decay + 1.0
+        return self.value
+
+    def peek(self, x: float) -> float:
+        """Value ``update(x)`` would give, without changing state"""
+        return (self.numerator * self.decay + x) / (self.denominator * self.decay + 1.0)
+
+    def get_state(self) -> Dict:
+        return {'numerator': self.numerator, 'denominator': self.denominator}
+
+    def set_state(self, state: Dict) -> None:
+        self.numerator = state['numerator']
+        self.denominator = state['denominator']
+
+
+class MACD:
+    """MACD line, signal line and histogram from three incremental EMAs"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    @property
+    def value(self) -> Optional[Dict]:
+        if self.signal.value is None:
+            return None
+        macd = self.fast.value - self.slow.value
+        return {'macd': macd, 'signal': self.signal.value, 'histogram': macd - self.signal.value}
+
+    def update(self, x: float) -> Dict:
+        macd = self.fast.update(x) - self.slow.update(x)
+        self.signal.update(macd)
+        return self.value
+
+    def peek(self, x: float) -> Dict:
+        macd = self.fast.peek(x) - self.slow.peek(x)
+        signal = self.signal.peek(macd)
+        return {'macd': macd, 'signal': signal, 'histogram': macd - signal}
+
+    def get_state(self) -> Dict:
+        return {'fast': self.fast.get_state(), 'slow': self.slow.get_state(), 'signal': self.signal.get_state()}
+
+    def set_state(self, state: Dict) -> None:
+        self.fast.set_state(state['fast'])
+        self.slow.set_state(state['slow'])
+        self.signal.set_state(state['signal'])
+
+
+class RollingStats:
+    """Windowed mean and sample standard deviation with O(1) updates.
+
+    Keeps the window's values plus a running mean and sum of squared
+    deviations (Welford, with removal), which stays accurate for price-sized
+    inputs where a sum-of-squares formula would cancel badly.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _next(self, x: float):
+        n, mean, m2 = len(self.values), self.mean, self.m2
+        if n == self.window:
+            oldest = self.values[0]
+            if n == 1:
+                return 1, x, 0.0
+            # Remove the value falling out of the window
+            old_mean = (mean * n - oldest) / (n - 1)
+            m2 -= (oldest - mean) * (oldest - old_mean)
+            mean, n = old_mean, n - 1
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        return n, mean, max(m2, 0.0)
+
+    @staticmethod
+    def _result(n: int, mean: float, m2: float, window: int) -> Optional[Dict]:
+        if n < window:
+            return None
+        return {'mean': mean, 'std': math.sqrt(m2 / (n - 1)) if n > 1 else 0.0}
+
+    @property
+    def value(self) -> Optional[Dict]:
+        return self._result(len(self.values), self.mean, self.m2, self.window)
+
+    def update(self, x: float) -> Optional[Dict]:
+        _, self.mean, self.m2 = self._next(x)
+        self.values.append(x)
+        return self.value
+
+    def peek(self, x: float) -> Optional[Dict]:
+        return self._result(*self._next(x), self.window)
+
+    def get_state(self) -> Dict:
+        return {'values': list(self.values), 'mean': self.mean, 'm2': self.m2}
+
+    def set_state(self, state: Dict) -> None:
+        self.values = deque(state['values'], maxlen=self.window)
+        self.mean = state['mean']
+        self.m2 = state['m2']
+
+
+class BollingerBands:
+    """Bollinger bands (mean +/- ``width`` sample std) over a rolling window"""
+
+    def __init__(self, window: int = 20, width: float = 2.0):
+        self.width = width
+        self.stats = RollingStats(window)
+
+    def _bands(self, stats: Optional[Dict]) -> Optional[Dict]:
+        if stats is None:
+            return None
+        return {'upper': stats['mean'] + self.width * stats['std'], 'middle': stats['mean'],
+                'lower': stats['mean'] - self.width * stats['std']}
+
+    @property
+    def value(self) -> Optional[Dict]:
+        return self._bands(self.stats.value)
+
+    def update(self, x: float) -> Optional[Dict]:
+        return self._bands(self.stats.update(x))
+
+    def peek(self, x: float) -> Optional[Dict]:
+        return self._bands(self.stats.peek(x))
+
+    def get_state(self) -> Dict:
+        return self.stats.get_state()
+
+    def set_state(self, state: Dict) -> None:
+        self.stats.set_state(state)
+
+
+class RollingRSI:
+    """Relative Strength Index from simple rolling averages of gains and losses.
+
+    Same definition as ``utils.indicators.rsi`` (and pandas' rolling mean):
+    the first bar counts as an unchanged price, and the value is ready once
+    ``period`` bars are in.
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous = None
+        self.gains = RollingStats(period)
+        self.losses = RollingStats(period)
+
+    @staticmethod
+    def _rsi(gains: Optional[Dict], losses: Optional[Dict]) -> Optional[float]:
+        if gains is None:
+            return None
+        avg_gain, avg_loss = gains['mean'], losses['mean']
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def _change(self, x: float) -> float:
+        return 0.0 if self.previous is None else x - self.previous
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._rsi(self.gains.value, self.losses.value)
+
+    def update(self, x: float) -> Optional[float]:
+        change = self._change(x)
+        self.gains.update(max(change, 0.0))
+        self.losses.update(max(-change, 0.0))
+        self.previous = x
+        return self.value
+
+    def peek(self, x: float) -> Optional[float]:
+        change = self._change(x)
+        return self._rsi(self.gains.peek(max(change, 0.0)), self.losses.peek(max(-change, 0.0)))
+
+    def get_state(self) -> Dict:
+        return {'previous': self.previous, 'gains': self.gains.get_state(), 'losses': self.losses.get_state()}
+
+    def set_state(self, state: Dict) -> None:
+        self.previous = state['previous']
+        self.gains.set_state(state['gains'])
+        self.losses.set_state(state['losses'])
+
+
+class IndicatorState:
+    """Every live indicator for one symbol, advanced one bar at a time.
+
+    ``update`` commits a closed bar; ``snapshot(price)`` shows the values as
+    if the forming bar closed at ``price`` without committing it. State can
+    be checkpointed to a plain dict and restored, or seeded from history.
+    The last ``history_size`` closes are kept for window-based measures such
+    as trend slope.
+    """
+
+    def __init__(self, ma_windows: Iterable[int] = (20, 50, 200), rsi_period: int = 14,
+                 bb_period: int = 20, volume_window: int = 20, history_size: int = 20):
+        self.ma = {window: RollingStats(window) for window in ma_windows}
+        self.rsi = RollingRSI(rsi_period)
+        self.macd = MACD()
+        self.bollinger = BollingerBands(bb_period)
+        self.volume = RollingStats(volume_window)
+        self.closes = deque(maxlen=history_size)
+        self.bars = 0
+        self.last_close = None
+        self.last_bar_time = None
+
+    def update(self, close: float, volume: float = None, bar_time: float = None) -> Dict:
+        close = float(close)
+        for stats in self.ma.values():
+            stats.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        if volume is not None:
+            self.volume.update(float(volume))
+        self.closes.append(close)
+        self.bars += 1
+        self.last_close = close
+        if bar_time is not None:
+            self.last_bar_time = bar_time
+        return self.snapshot()
+
+    def seed(self, closes: Iterable[float], volumes: Iterable[float] = None, bar_times: Iterable[float] = None) -> Dict:
+        """Replay historical bars (oldest first) to warm every indicator up"""
+        closes = list(closes)
+        volumes = list(volumes) if volumes is not None else [None] * len(closes)
+        bar_times = list(bar_times) if bar_times is not None else [None] * len(closes)
+        for close, volume, bar_time in zip(closes, volumes, bar_times):
+            if close is not None and not math.isnan(close):
+                self.update(close, None if volume is None or math.isnan(volume) else volume, bar_time)
+        return self.snapshot()
+
+    def snapshot(self, price: float = None) -> Dict:
+        """Current values (None while warming up); with ``price``, as if a bar closed there"""
+        if price is None:
+            ma = {window: stats.value for window, stats in self.ma.items()}
+            rsi, macd, bands = self.rsi.value, self.macd.value, self.bollinger.value
+        else:
+            price = float(price)
+            ma = {window: stats.peek(price) for window, stats in self.ma.items()}
+            rsi, macd, bands = self.rsi.peek(price), self.macd.peek(price), self.bollinger.peek(price)
+        volume = self.volume.value
+        result = {f'ma_{window}': (stats['mean'] if stats else None) for window, stats in ma.items()}
+        result.update({
+            'rsi': rsi,
+            'macd': macd['macd'] if macd else None,
+            'macd_signal': macd['signal'] if macd else None,
+            'macd_histogram': macd['histogram'] if macd else None,
+            'bb_upper': bands['upper'] if bands else None,
+            'bb_middle': bands['middle'] if bands else None,
+            'bb_lower': bands['lower'] if bands else None,
+            'avg_volume': volume['mean'] if volume else None,
+            'bars': self.bars,
+        })
+        return result
+
+    def recent_closes(self, price: float = None) -> List[float]:
+        """Last ``history_size`` closes, oldest first; with ``price``, as if a bar closed there"""
+        closes = list(self.closes)
+        if price is not None:
+            closes = closes[1:] if len(closes) == self.closes.maxlen else closes
+            closes.append(float(price))
+        return closes
+
+    def checkpoint(self) -> Dict:
+        """JSON-serialisable state"""
+        return {
+            'rsi_period': self.rsi.period,
+            'bb_period': self.bollinger.stats.window,
+            'volume_window': self.volume.window,
+            'ma': {str(window): stats.get_state() for window, stats in self.ma.items()},
+            'rsi': self.rsi.get_state(),
+            'macd': self.macd.get_state(),
+            'bollinger': self.bollinger.get_state(),
+            'volume': self.volume.get_state(),
+            'history_size': self.closes.maxlen,
+            'closes': list(self.closes),
+            'bars': self.bars,
+            'last_close': self.last_close,
+            'last_bar_time': self.last_bar_time,
+        }
+
+    @classmethod
+    def restore(cls, checkpoint: Dict) -> 'IndicatorState':
+        state = cls(ma_windows=[int(window) for window in checkpoint['ma']],
+                    rsi_period=checkpoint['rsi_period'], bb_period=checkpoint['bb_period'],
+                    volume_window=checkpoint['volume_window'],
+                    history_size=checkpoint.get('history_size', 20))
+        for window, stats in checkpoint['ma'].items():
+            state.ma[int(window)].set_state(stats)
+        state.rsi.set_state(checkpoint['rsi'])
+        state.macd.set_state(checkpoint['macd'])
+        state.bollinger.set_state(checkpoint['bollinger'])
+        state.volume.set_state(checkpoint['volume'])
+        # Checkpoints written before close history was kept restore with an empty one
+        state.closes.extend(checkpoint.get('closes', []))
+        state.bars = checkpoint['bars']
+        state.last_close = checkpoint['last_close']
+        state.last_bar_time = checkpoint['last_bar_time']
+        return state